@@ -12,7 +12,7 @@ import zPE.GUI.io_encap as io_encap
 #   new_dir(fn_list):           create the dir unless the fn_list corresponding to a directory
 #
 
-from zPE.util import spool_decode_printable
+from zPE.util import spool_unpack_printable
 from zPE.GUI.zComp.z_support import XPM, PIXBUF
 
 from zPE.GUI.zComp.zBase import zTheme
@@ -34,6 +34,7 @@ import gobject
 class zDisplayPanel(gtk.VBox):
     '''A Read-Only Display Panel Used by zEdit Class'''
     _DB_FILE = None # overall db setting; this *will* take precedence if set
+    _JOB_PAGE = 128 # number of jobs loaded into the job panel at a time
 
     def __init__(self, db_file = None, editor = None):
         '''
@@ -61,6 +62,8 @@ class zDisplayPanel(gtk.VBox):
         self.__job_list = [
             # (id, name), (id, name), ...
             ]
+        self.__job_more = False # whether there are jobs not loaded yet
+        self.__db_version = None
         self.__step_list = [
             # (dd, step), (dd, step), ...
             ]
@@ -107,6 +110,7 @@ class zDisplayPanel(gtk.VBox):
         scrolled_job.set_policy(gtk.POLICY_AUTOMATIC, gtk.POLICY_ALWAYS)
         scrolled_job.set_placement(gtk.CORNER_TOP_RIGHT)
         scrolled_job.add(self.job_panel)
+        scrolled_job.get_vadjustment().connect('value-changed', self._sig_job_scrolled)
 
         scrolled_step.set_policy(gtk.POLICY_AUTOMATIC, gtk.POLICY_ALWAYS)
         scrolled_step.set_placement(gtk.CORNER_TOP_RIGHT)
@@ -170,6 +174,13 @@ class zDisplayPanel(gtk.VBox):
         self.update_step_list()
         self.update_content()
 
+    def _sig_job_scrolled(self, adjustment):
+        # load the next page before the last loaded job is scrolled into view
+        if ( self.__job_more  and
+             adjustment.get_value() + adjustment.get_page_size() * 2 >= adjustment.get_upper()
+             ):
+            self.load_job_page()
+
     def _sig_step_selected(self, treeview):
         tree_path = treeview.get_cursor()[0][-1]
         dd_name = self.__step_list[tree_path][0]
@@ -270,6 +281,7 @@ class zDisplayPanel(gtk.VBox):
         self.__c.execute('''PRAGMA foreign_keys = ON''')
 
         # initiate the listing
+        self.__db_version = self.fetch_db_version()
         self.update_job_list()
 
         return self.__conn
@@ -296,32 +308,55 @@ class zDisplayPanel(gtk.VBox):
         self.__c.execute(stmt, (job_pttn,))
         self.__conn.commit()
 
+        # changes of this connection are not reflected by the db version
+        self.update_job_list()
+
 
     def fetch_content(self, job_id, dd_pttn = '%'):
-        stmt = '''SELECT  Content
+        '''generate the content of the matched SPOOLs, piece by piece'''
+        stmt = '''SELECT  Codec, Data
                     FROM  SPOOL
+                    JOIN  SPOOL_CHUNK  ON  Spool_Row_ID = row_id
                    WHERE  Job_ID = ?
                      AND  Spool_key LIKE ?
-                ORDER BY  row_id
+                ORDER BY  row_id, Seq
                '''
-        return ''.join(
-            [ spool_decode_printable(row[0])
-              for row in self.__c.execute(stmt, (job_id, dd_pttn))
-              ])
+        # use a cursor of its own; self.__c may be reused while generating
+        for row in self.__conn.execute(stmt, (job_id, dd_pttn)):
+            for piece in spool_unpack_printable(* row):
+                yield piece
 
     def fetch_dd_list(self, job_id):
         stmt = '''SELECT  Spool_key, Step_Name
                     FROM  SPOOL
-                   WHERE  Job_ID LIKE ?
+                   WHERE  Job_ID = ?
                 ORDER BY  row_id
                '''
         return [ row for row in self.__c.execute(stmt, (job_id,)) ]
 
-    def fetch_job_list(self):
+    def fetch_job_list(self, after = '', limit = -1):
+        '''
+        Return at most `limit` (-1 for no limit) jobs with a job ID greater
+        than `after`, in the order of the job ID
+        '''
         stmt = '''SELECT  Job_ID, Job_Name
                     FROM  JOB
+                   WHERE  Job_ID > ?
+                ORDER BY  Job_ID
+                   LIMIT  ?
                '''
-        return [ row for row in self.__c.execute(stmt) ]
+        return [ row for row in self.__c.execute(stmt, (after, limit)) ]
+
+    def fetch_db_version(self):
+        '''Return a value that changes once others modified the db'''
+        row = self.__c.execute('''PRAGMA data_version''').fetchone()
+        if row:
+            return row[0]
+        # SQLite older than 3.8.4, use a summary of the job queue instead
+        stmt = '''SELECT  COUNT(*), MIN(Job_ID), MAX(Job_ID)
+                    FROM  JOB
+               '''
+        return self.__c.execute(stmt).fetchone()
 
 
     def get_db(self):
@@ -389,28 +424,49 @@ class zDisplayPanel(gtk.VBox):
 
     def update_content(self):
         if self.__active_step:
-            text = self.fetch_content(self.__active_job ,self.__active_step)
+            chunks = self.fetch_content(self.__active_job ,self.__active_step)
         elif self.__active_job:
-            text = self.fetch_content(self.__active_job)
+            chunks = self.fetch_content(self.__active_job)
         else:
-            text = ''
-        self.center.set_text(text, no_scrolling = True)
+            chunks = [ ]
+        self.center.set_text('', no_scrolling = True)
+        for text in chunks:
+            # highlight once at the end, instead of once per chunk
+            self.center.append_text(text, hilite = False)
+        self.center.hilite()
         self.center.place_cursor_at_offset(0)
 
     def clear_job_list(self):
         self.job_panel.model.clear()
         self.__job_list = []
+        self.__job_more = False
+
+    def load_job_page(self):
+        if self.__job_list:
+            after = self.__job_list[-1][0]
+        else:
+            after = ''
+        job_list = self.fetch_job_list(after, zDisplayPanel._JOB_PAGE)
+        self.__job_more = len(job_list) == zDisplayPanel._JOB_PAGE
+
+        # extend the list before the model, which renders from the list
+        self.__job_list.extend(job_list)
+        for (job_id, job_name) in job_list:
+            self.job_panel.model.append([job_id])
 
     def update_job_list(self):
         self.clear_job_list()
 
-        self.__job_list = self.fetch_job_list()
+        # load the jobs up to the active one, so that it can be re-selected
+        self.load_job_page()
+        while ( self.__active_job  and  self.__job_more  and
+                self.__job_list[-1][0] < self.__active_job
+                ):
+            self.load_job_page()
+
         found = None
         for indx in range(len(self.__job_list)):
-            job_id = self.__job_list[indx][0]
-
-            self.job_panel.model.append([job_id])
-            if self.__active_job == job_id:
+            if self.__active_job == self.__job_list[indx][0]:
                 found = indx
 
         if found != None:
@@ -451,9 +507,11 @@ class zDisplayPanel(gtk.VBox):
         if zDisplayPanel._DB_FILE:
             self.set_db(zDisplayPanel._DB_FILE)
 
-        job_list = self.fetch_job_list()
-        if job_list != self.__job_list:
-            self.update_job_list()
+        if self.is_connected_db():
+            db_version = self.fetch_db_version()
+            if db_version != self.__db_version:
+                self.__db_version = db_version
+                self.update_job_list()
 
         return True
     ### end of supporting function
@@ -1918,6 +1918,22 @@ class zTextView(z_ABC, gtk.TextView): # do *NOT* use obj.get_buffer.set_modified
         if not no_scrolling:
             self.place_cursor(self.get_cursor_iter(use_backup = True))
 
+    def append_text(self, text, hilite = True):
+        '''
+        append the text to the end of the buffer; with hilite = False, the
+        highlighting is skipped (call hilite() once done appending)
+        '''
+        buff = self.buff['disp']
+        if not hilite:
+            for handler in self.__buff_watcher['hilite']:
+                buff.handler_block(handler)
+        try:
+            buff.insert(buff.get_end_iter(), text)
+        finally:
+            if not hilite:
+                for handler in self.__buff_watcher['hilite']:
+                    buff.handler_unblock(handler)
+
 
     def get_has_selection(self):
         return self.get_mark() != None
@@ -1,28 +1,40 @@
 # this is the System Level Configuration
 
-from zPE.util import parse_time, parse_region
+from zPE.util import parse_time, parse_region, replace_file
 from zPE.util.global_config import Config, CONFIG_PATH, RC
 
 import os, sys, pickle
 import re
 
 import sqlite3
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 ### Architectural Definition
 JOB_ID_MIN = 10000              # the smallest job ID
 JOB_ID_MAX = 65535              # the largest job ID
 TMP_FILE_ID = 101               # the smallest tmp file identifier
+SPOOL_VERSION = 2               # the schema version of the SPOOL database
+SPOOL_TIMEOUT = 60              # seconds to wait for the other writers
 
 
 ### Configurable Definition
 POSSIBLE_ADDR_MODE = [ 16, 31, 64, ]
+POSSIBLE_EXEC_ENGINE = [ 'interpret', 'block', ]
 
 DEFAULT = {
     'ADDR_MODE' : 31,           # hardware addressing mode: 31 bit
 
     'TIME_LIMIT': 2,            # max cpu time for the entire job: 2 sec
     'MEMORY_SZ' : '16K',        # memory size: 16 KB
+    'EXEC_ENGINE': 'interpret', # loader execution engine: interpreter
+    'INS_PER_SEC': 50000,       # instructions charged per second of TIME;
+                                # about what the interpreter runs per second
+    'OBJMOD_CACHE': 64,         # object modules kept by the assembler cache
+    'SPOOL_COMPRESS': 0,        # zlib level of the SPOOL chunks: no compression
 
     'ICH70001I' : {             # config list for ICH70001I
         'atime' : '00:00:00 ON THURSDAY, JANUARY 18, 2011',
@@ -43,6 +55,18 @@ def init_rc():
                                 # can be altered by "// JOB ,*,REGION=*"
                                 # can be overridden by "// EXEC *,REGION=*"
 
+    Config['exec_engine'] = DEFAULT['EXEC_ENGINE']
+                                # can be overridden by "// EXEC *,PARM=ENGINE=*"
+    Config['ins_per_sec'] = DEFAULT['INS_PER_SEC']
+                                # TIME=(m,s) allows (m*60+s)*ins_per_sec
+                                # instructions to be executed
+    Config['objmod_cache'] = DEFAULT['OBJMOD_CACHE']
+                                # max number of assembled sources cached;
+                                # 0 disables the cache
+    Config['spool_compress'] = DEFAULT['SPOOL_COMPRESS']
+                                # zlib level (1-9) the SPOOLs are compressed
+                                # with; 0 stores them uncompressed
+
 
 def dump_ICH70001I(conf):
     __CK_CONFIG()
@@ -53,6 +77,11 @@ def load_ICH70001I():
     return pickle.load(open(CONFIG_PATH['ICH70001I'], 'rb'))
 
 
+def upgrade_spool():
+    '''create the SPOOL database, or upgrade it to the current schema'''
+    __TOUCH_SPOOL()
+
+
 def fetch_job_id():
     for line in open(CONFIG_PATH['rc'], 'r'):
         (k, v) = re.split('[ \t]*=[ \t]*', line, maxsplit=1)
@@ -74,6 +103,21 @@ def read_rc(dry_run = False):
     init_rc()
     __CK_CONFIG()
 
+    # hold the lock from reading the job ID till writing back the next one,
+    # so that concurrent zsub processes never get the same job ID
+    lock = __LOCK(CONFIG_PATH['rc'])
+    try:
+        __READ_RC(dry_run)
+    finally:
+        __UNLOCK(lock)
+
+def write_rc():
+    __TOUCH_RC()
+
+
+### Supporting Function
+
+def __READ_RC(dry_run):
     for line in open(CONFIG_PATH['rc'], 'r'):
         (k, v) = re.split('[ \t]*=[ \t]*', line[:-1], maxsplit=1)
         ok = False
@@ -131,6 +175,60 @@ def read_rc(dry_run = False):
             if not ok:
                 Config[k] = DEFAULT['MEMORY_SZ']
 
+        elif k == 'exec_engine':
+            if v in POSSIBLE_EXEC_ENGINE:
+                Config[k] = v
+                ok = True
+
+            if not ok:
+                Config[k] = DEFAULT['EXEC_ENGINE']
+                sys.stderr.write(''.join([
+                            'CONFIG WARNING: ', v,
+                            ': Invalid execution engine.\n'
+                            ]))
+        elif k == 'ins_per_sec':
+            try:
+                Config[k] = int(v)
+                if Config[k] > 0:
+                    ok = True
+            except ValueError:
+                pass
+
+            if not ok:
+                Config[k] = DEFAULT['INS_PER_SEC']
+                sys.stderr.write(''.join([
+                            'CONFIG WARNING: ', v,
+                            ': Invalid instruction rate.\n'
+                            ]))
+        elif k == 'objmod_cache':
+            try:
+                Config[k] = int(v)
+                if Config[k] >= 0:
+                    ok = True
+            except ValueError:
+                pass
+
+            if not ok:
+                Config[k] = DEFAULT['OBJMOD_CACHE']
+                sys.stderr.write(''.join([
+                            'CONFIG WARNING: ', v,
+                            ': Invalid object module cache size.\n'
+                            ]))
+        elif k == 'spool_compress':
+            try:
+                Config[k] = int(v)
+                if 0 <= Config[k] and Config[k] <= 9:
+                    ok = True
+            except ValueError:
+                pass
+
+            if not ok:
+                Config[k] = DEFAULT['SPOOL_COMPRESS']
+                sys.stderr.write(''.join([
+                            'CONFIG WARNING: ', v,
+                            ': Invalid SPOOL compression level.\n'
+                            ]))
+
     Config['addr_max'] = 2 ** Config['addr_mode']
 
     if JOB_ID_MAX - Config['job_id'] <= 3 and not dry_run:
@@ -138,25 +236,27 @@ def read_rc(dry_run = False):
                 JOB_ID_MAX - Config['job_id']
                 ))
     elif Config['job_id'] == JOB_ID_MIN and not dry_run:
-        open(CONFIG_PATH['SPOOL'], 'w').close()
-        __TOUCH_SPOOL()
+        __RESET_SPOOL()
         sys.stderr.write('\n  JOB queue cleared!\n\n')
     write_rc()
 
-def write_rc():
-    __TOUCH_RC()
+def __LOCK(path):
+    fp = open(path + '.lock', 'a')
+    if fcntl:                   # not available on Windows
+        fcntl.flock(fp, fcntl.LOCK_EX)
+    return fp
 
+def __UNLOCK(fp):
+    fp.close()                  # the lock is released on closing
 
-### Supporting Function
 
 def __CK_CONFIG():
     if not os.path.isdir(CONFIG_PATH['data']):
         os.makedirs(CONFIG_PATH['data'])
-    if ( not os.path.isfile(CONFIG_PATH['rc']) or
-         not os.path.isfile(CONFIG_PATH['SPOOL'])
-         ):
-        open(CONFIG_PATH['SPOOL'], 'w').close()
-    __TOUCH_SPOOL()
+    if not os.path.isfile(CONFIG_PATH['rc']):
+        __RESET_SPOOL()         # the job IDs restart from JOB_ID_MIN
+    else:
+        __TOUCH_SPOOL()
 
     if not os.path.isfile(CONFIG_PATH['rc']):
         __TOUCH_RC()
@@ -165,10 +265,29 @@ def __CK_CONFIG():
 
 
 def __TOUCH_ICH70001I(conf = DEFAULT['ICH70001I']):
-    pickle.dump(conf, open(CONFIG_PATH['ICH70001I'], 'wb'))
+    # never leave a partial file to a concurrent zsub
+    path = '{0}.{1}'.format(CONFIG_PATH['ICH70001I'], os.getpid())
+    fp = open(path, 'wb')
+    pickle.dump(conf, fp)
+    fp.close()
+    replace_file(path, CONFIG_PATH['ICH70001I'])
+
+def __RESET_SPOOL():
+    # empty the database through sqlite instead of truncating the file; the
+    # WAL files of a connection still open would otherwise be left behind
+    conn = sqlite3.connect(CONFIG_PATH['SPOOL'], timeout = SPOOL_TIMEOUT,
+                           isolation_level = None)
+    conn.execute('''BEGIN IMMEDIATE''')
+    for tbl in ( 'SPOOL_CHUNK', 'SPOOL', 'JOB', ):
+        conn.execute('''DROP TABLE IF EXISTS {0}'''.format(tbl))
+    conn.execute('''PRAGMA user_version = 0''')
+    conn.execute('''COMMIT''')
+    conn.close()
+    __TOUCH_SPOOL()
 
 def __TOUCH_SPOOL():
-    conn = sqlite3.connect(CONFIG_PATH['SPOOL'])
+    conn = sqlite3.connect(CONFIG_PATH['SPOOL'], timeout = SPOOL_TIMEOUT,
+                           isolation_level = None)
     conn.executescript(
 '''
 CREATE TABLE IF NOT EXISTS JOB (
@@ -182,13 +301,68 @@ CREATE TABLE IF NOT EXISTS SPOOL (
         Job_ID          TEXT    NOT NULL,
         Spool_Key       TEXT    NOT NULL,
         Step_Name       TEXT    NOT NULL,
-        Content         TEXT    NOT NULL,
+        Content         TEXT    NOT NULL,       -- unused since version 1
 
         FOREIGN KEY (Job_ID)    REFERENCES JOB (Job_ID)
         ON DELETE CASCADE
 );
+
+CREATE TABLE IF NOT EXISTS SPOOL_CHUNK (
+        Spool_Row_ID    INTEGER NOT NULL,
+        Seq             INTEGER NOT NULL,
+        Data            TEXT    NOT NULL,       -- BLOB if compressed
+                                                -- Codec, Raw_Size: version 2
+        PRIMARY KEY (Spool_Row_ID, Seq),
+        FOREIGN KEY (Spool_Row_ID) REFERENCES SPOOL (row_id)
+        ON DELETE CASCADE
+);
+
+-- JOB (Job_ID) is indexed by its primary key
+CREATE INDEX IF NOT EXISTS JOB_NAME_INDEX    ON JOB   (Job_Name);
+CREATE INDEX IF NOT EXISTS JOB_OWNER_INDEX   ON JOB   (Job_OWNER);
+CREATE INDEX IF NOT EXISTS SPOOL_KEY_INDEX   ON SPOOL (Job_ID, Spool_Key);
+''')
+    # the schema version is kept in `user_version`:
+    #   0 - the content of a SPOOL is kept in SPOOL.Content
+    #   1 - the content of a SPOOL is kept in SPOOL_CHUNK
+    #   2 - the chunks carry their codec (see zPE.util.spool_pack())
+    if conn.execute('''PRAGMA user_version''').fetchone()[0] < SPOOL_VERSION:
+        # upgrade under the write lock, and check the version again, so that
+        # concurrent processes never upgrade the same database twice
+        conn.execute('''BEGIN IMMEDIATE''')
+        version = conn.execute('''PRAGMA user_version''').fetchone()[0]
+        if version < 1:
+            # move the content of each SPOOL into its first chunk
+            conn.execute(
+'''
+INSERT INTO SPOOL_CHUNK (Spool_Row_ID, Seq, Data)
+     SELECT  row_id, 0, Content
+       FROM  SPOOL
+      WHERE  Content != ''
+''')
+            conn.execute(
+'''
+UPDATE  SPOOL
+   SET  Content = ''
+ WHERE  Content != ''
+''')
+        if version < 2:
+            # all existing chunks are uncompressed
+            conn.execute(
+'''
+ALTER TABLE SPOOL_CHUNK ADD COLUMN Codec    INTEGER NOT NULL DEFAULT 0
+''')
+            conn.execute(
+'''
+ALTER TABLE SPOOL_CHUNK ADD COLUMN Raw_Size INTEGER NOT NULL DEFAULT 0
+''')
+            conn.execute(
+'''
+UPDATE  SPOOL_CHUNK
+   SET  Raw_Size = length(CAST(Data AS BLOB))
 ''')
-    conn.commit()
+        conn.execute('''PRAGMA user_version = {0}'''.format(SPOOL_VERSION))
+        conn.execute('''COMMIT''')
     conn.close()
 
 
@@ -202,4 +376,8 @@ def __TOUCH_RC():
                       str(Config['time_limit'] % 60),
                       ')\n']))
     fp.write(''.join(['memory_sz = ', Config['memory_sz'], '\n']))
+    fp.write(''.join(['exec_engine = ', Config['exec_engine'], '\n']))
+    fp.write(''.join(['ins_per_sec = ', str(Config['ins_per_sec']), '\n']))
+    fp.write(''.join(['objmod_cache = ', str(Config['objmod_cache']), '\n']))
+    fp.write(''.join(['spool_compress = ', str(Config['spool_compress']), '\n']))
     fp.close()
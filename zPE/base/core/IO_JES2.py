@@ -1,8 +1,13 @@
 # this is a simplification of the "Job Entry Subsystem - IO Component"
 # it is used to manage the SPOOL files
+#
+# all SPOOLs of a job are written out through one connection, in one
+# transaction (see open_job() / close_job()); the database is in WAL mode,
+# so that several zsub processes can write to it (and zfetch can read from
+# it) at the same time
 
-from zPE.util import spool_encode
-from zPE.util.global_config import CONFIG_PATH, JCL, SP_DEFAULT_OUT_STEP
+from zPE.util import spool_pack, SPOOL_CODEC_TEXT
+from zPE.util.global_config import Config, CONFIG_PATH, JCL, SP_DEFAULT_OUT_STEP
 
 import os
 import re
@@ -10,10 +15,49 @@ import re
 import sqlite3
 
 
+DB_TIMEOUT = 60                 # seconds to wait for the other writers
+
+JOB_DB = {                      # the connection shared by the job
+    'conn' : None,              # see open_job() / close_job()
+    }
+
+def connect_db():
+    '''
+    open a connection to the SPOOL database in WAL mode; the transactions
+    are managed explicitly (no implicit BEGIN / COMMIT)
+    '''
+    conn = sqlite3.connect(CONFIG_PATH['SPOOL'], timeout = DB_TIMEOUT,
+                           isolation_level = None)
+    conn.text_factory = str     # map TEXT to str instead of unicode
+    conn.execute('''PRAGMA journal_mode = WAL''')
+    conn.execute('''PRAGMA synchronous = NORMAL''') # safe in WAL mode
+    return conn
+
+def open_job():
+    '''
+    open the connection shared by all SPOOLs the job writes out, and start
+    the transaction they are written in
+    '''
+    conn = connect_db()
+    # take the write lock up front; a deferred transaction that has read the
+    # database cannot wait for the lock of another writer
+    conn.execute('''BEGIN IMMEDIATE''')
+    JOB_DB['conn'] = conn
+
+def close_job(commit = True):
+    '''commit (or roll back) the transaction of the job, and close it'''
+    conn = JOB_DB['conn']
+    JOB_DB['conn'] = None
+    if commit:
+        conn.execute('''COMMIT''')
+    else:
+        conn.execute('''ROLLBACK''')
+    conn.close()
+
+
 class JES_DB(object):
-    @staticmethod
-    def append(src, dest):
-        return src + dest
+    BATCH = 65536               # bytes buffered before written to the db;
+                                # each batch becomes a row of SPOOL_CHUNK
 
     def __init__(self, job_id, job_name, owner, spool_key):
         self.__job_id = job_id
@@ -21,14 +65,19 @@ class JES_DB(object):
         self.__owner = owner
         self.__spool_key = spool_key
 
-        self.__buffer = ''      # the buffer for output
-
-        # connect db
-        self.__db = sqlite3.connect(CONFIG_PATH['SPOOL'])
-        self.__db.create_function(   # register `append(src, dest)` to SQLite
-            "append", 2, JES_DB.append
-            )
-        self.__db.text_factory = str # map TEXT to str instead of unicode
+        self.__buffer = [ ]     # the buffer for output
+        self.__buffer_sz = 0    # number of bytes in the buffer
+        self.__chunk_seq = 0    # sequence number of the next chunk
+
+        # connect db; use the connection of the job if opened, otherwise
+        # open one for this SPOOL alone (committed on close)
+        if JOB_DB['conn']:
+            self.__db = JOB_DB['conn']
+            self.__db_owned = False
+        else:
+            self.__db = connect_db()
+            self.__db.execute('''BEGIN IMMEDIATE''')
+            self.__db_owned = True
         self.__db_opened = True
 
         self.__c  = self.__db.cursor()
@@ -50,8 +99,7 @@ class JES_DB(object):
             ( self.__job_id, self.__spool_key,
               SP_DEFAULT_OUT_STEP[self.__spool_key], '', )
             )
-
-        self.__db.commit()
+        self.__spool_row_id = self.__c.lastrowid
 
 
     def __del__(self):
@@ -63,33 +111,43 @@ class JES_DB(object):
         self.flush()
 
         self.__c.close()
-        self.__db.close()
+        if self.__db_owned:
+            self.__db.execute('''COMMIT''')
+            self.__db.close()
         self.__db_opened = False
 
 
     def flush(self):
+        self.__write_buffer()   # committed with the job / on close
+
+
+    def write(self, line, force_flush = False):
+        self.__buffer.append(line)
+        self.__buffer_sz += len(line)
+        if force_flush  or  self.__buffer_sz >= JES_DB.BATCH:
+            self.__write_buffer()
+
+
+    def __write_buffer(self):
         if not self.__buffer:
-            return              # no need to flush, early return
+            return              # no need to write, early return
 
+        # append-only; the content written so far is never read back
+        ( codec, data, raw_size, ) = spool_pack(
+            ''.join(self.__buffer), Config.get('spool_compress', 0)
+            )
+        if codec != SPOOL_CODEC_TEXT:
+            data = sqlite3.Binary(data) # compressed data is stored as BLOB
         self.__c.execute(
-            '''
-UPDATE  SPOOL
-   SET  Content = append(Content, ?)
- WHERE  Job_id = ?
-   AND  Spool_key = ?
-''',
-            ( spool_encode(self.__buffer), self.__job_id, self.__spool_key )
+            '''INSERT INTO SPOOL_CHUNK (Spool_Row_ID, Seq, Data, Codec, Raw_Size)
+                    VALUES (?, ?, ?, ?, ?)''',
+            ( self.__spool_row_id, self.__chunk_seq, data, codec, raw_size, )
             )
+        self.__chunk_seq += 1
 
         # clear buffer
-        self.__buffer = ''
-        self.__db.commit()
-
-
-    def write(self, line, force_flush = False):
-        self.__buffer += line
-        if force_flush:
-            self.flush()
+        self.__buffer = [ ]
+        self.__buffer_sz = 0
 
 
 # open the target file in regardless of the existance
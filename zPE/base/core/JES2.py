@@ -8,6 +8,7 @@ import zPE.util.sysmsg as sysmsg
 
 import zPE.util.spool as spool
 import zPE.base.core.SPOOL as core_SPOOL
+import zPE.base.core.IO_JES2 as IO_JES2
 
 import zPE.base.conf
 
@@ -95,6 +96,7 @@ def parse(job):
               '20 characters.\n')
     # parse parameters
     JCL['time']   = Config['time_limit']
+    JCL['ins_cnt'] = 0
     JCL['region'] = Config['memory_sz']
     if len(args) == 3:
         for part in resplit_pp(',', args[2]):
@@ -221,7 +223,8 @@ def parse(job):
             jcl_continue = None
 
             if len(args) == 2:
-                for part in resplit_pp(',', args[1]):
+                # a PARM can be either PARM=(A,B) or PARM='A,B'
+                for part in resplit(',', args[1], "('", ")'"):
                     if jcl_continue: # jcl_continue can only be set by last part
                         abort(9, 'Error: line ', str(JCL['read_cnt']),
                               ': Invalid JCL card\n')
@@ -646,7 +649,15 @@ def finish_job(msg):
             sp.pop(0)
 
     __JES2_STAT(msg, diff)
-    __WRITE_OUT(SP_DEFAULT_OUT) # write out all registered SPOOLs
+
+    # write out all registered SPOOLs, in one transaction
+    IO_JES2.open_job()
+    try:
+        __WRITE_OUT(SP_DEFAULT_OUT)
+    except:
+        IO_JES2.close_job(commit = False)
+        raise
+    IO_JES2.close_job()
 
 
 ### Supporting functions
@@ -680,7 +691,7 @@ def __JES2_STAT(msg, job_time):
     cnt = 0
     for (k, v) in spool.dict():
         if v.mode == 'o':
-            cnt += len(v.spool)
+            cnt += len(v)
     cnt += 4                    # 4 more lines include this line
     sp1.append(ctrl, '{0:>13}'.format(cnt), ' SYSOUT PRINT RECORDS\n')
 
@@ -690,7 +701,7 @@ def __JES2_STAT(msg, job_time):
     cnt = 0
     for (k, v) in spool.dict():
         if v.mode == 'o':
-            for line in v.spool:
+            for line in v.records():
                 cnt = cnt + len(line)
     cnt = (cnt + 72) / 1024 + 1 # 72 more characters include this line
     sp1.append(ctrl, '{0:>13}'.format(cnt), ' SYSOUT SPOOL KBYTES\n')
@@ -10,17 +10,27 @@ import zPE.base.core.IO_JES2 as IO_JES2, zPE.base.core.IO_SMS as IO_SMS
 
 import sys                      # for sys.maxsize
 import re
+import tempfile
+import cPickle as pickle
 
 
 ## Simultaneous Peripheral Operations On-line
 class Spool(object):
+    SPILL_LINES = 4096          # records an output SPOOL extended in bulk
+                                # keeps in memory; see extend() and spill()
+
     def __init__(self, spool, spdid, mode, f_type, virtual_path, real_path):
-        self.spool = spool      # [ line_1,  line_2,  ... ]
-        self.spdid = spdid      # [ ln_id_1, ln_id_2, ... ] // deck id
+        self._line = spool      # [ line_1,  line_2,  ... ]
+        self._did  = spdid      # [ ln_id_1, ln_id_2, ... ] // deck id
                                 # digit (line number) for input SPOOL
                                 # label (tp-label) for expanded input
                                 # none for output SPOOL
         # the above two need to be in sync (if modifiey manually)
+        self._head = 0          # index of the 1st record still in the SPOOL;
+                                # the ones before it are already popped
+        self._spill = None      # backing store of the records spilled out
+                                # of the memory, in front of the above
+        self._spilled = 0       # number of records in the backing store
         self.mode = mode        # one of the SP_MODE keys
         self.f_type = f_type    # one of the JES keys
         self.virtual_path = virtual_path
@@ -30,28 +40,108 @@ class Spool(object):
                                 # path in the actual file system;
                                 # same format as above
 
+    # raw access to the records; the popped ones are dropped first, and the
+    # spilled ones are loaded back (use records() to avoid the latter)
+    @property
+    def spool(self):
+        self.__unspill()
+        return self._line
+
+    @spool.setter
+    def spool(self, spool):
+        self.__unspill()
+        self._line = spool
+
+    @property
+    def spdid(self):
+        self.__unspill()
+        return self._did
+
+    @spdid.setter
+    def spdid(self, spdid):
+        self.__unspill()
+        self._did = spdid
+
+    def records(self):
+        '''generate the records in order, including the spilled ones'''
+        for ( lines, dids, ) in self.__spilled_batches():
+            for line in lines:
+                yield line
+        for indx in range(self._head, len(self._line)):
+            yield self._line[indx]
+
+
     # the following methods are for Spool.spool
     def empty(self):
         return (self.__len__() == 0)
 
 
     def append(self, *phrase, **option):
-        self.insert(sys.maxsize, *phrase, **option)
+        self._line.append(''.join(phrase))
+        self._did.append(option.get('deck_id', None))
+
+    def extend(self, lines, deck_id = None):
+        '''append the lines (each being a complete record) at once'''
+        self._line.extend(lines)
+        self._did.extend([ deck_id ] * len(lines))
+        if ( self.mode == 'o'  and
+             len(self._line) - self._head >= Spool.SPILL_LINES
+             ):
+            self.spill()        # keep the memory flat for a long output
+
+    def spill(self):
+        '''
+        move the records in memory into the backing store (a temporary
+        file); they are written out in order, and counted in len(), but can
+        no longer be accessed by their line numbers
+        '''
+        self.__compact()
+        if not self._line:
+            return              # nothing to spill, early return
+        if not self._spill:
+            self._spill = tempfile.TemporaryFile()
+        self._spill.seek(0, 2)  # append to the end
+        pickle.dump(( self._line, self._did, ), self._spill,
+                    pickle.HIGHEST_PROTOCOL)
+        self._spilled += len(self._line)
+        self._line = [ ]
+        self._did  = [ ]
 
     def insert(self, indx, *phrase, **option):
-        self.spool.insert(indx, ''.join(phrase))
-        if 'deck_id' not in option:
-            option['deck_id'] = None
-        self.spdid.insert(indx, option['deck_id'])
+        self.push( ( ''.join(phrase), option.get('deck_id', None), ), indx )
 
     def pop(self, indx = -1):
-        line = self.spool.pop(indx)
-        did  = self.spdid.pop(indx)
-        return ( line, did, )
+        indx = self.__index(indx)
+        if indx != self._head:
+            return ( self._line.pop(indx), self._did.pop(indx), )
+
+        # pop the head: advance the cursor instead of shifting the records
+        rv = ( self._line[indx], self._did[indx], )
+        self._line[indx] = None
+        self._did[indx]  = None
+        self._head += 1
+        if self._head > len(self._line) / 2:
+            self.__compact()    # amortized O(1) per pop
+        return rv
 
     def push(self, pop_res, indx = sys.maxsize):
-        self.spool.insert(indx, pop_res[0])
-        self.spdid.insert(indx, pop_res[1])
+        size = self.__len__()
+        if indx < 0:
+            indx = max(indx + size, 0)
+        if indx >= size:        # push to the tail
+            self._line.append(pop_res[0])
+            self._did.append(pop_res[1])
+            return
+        indx -= self._spilled   # index into the records in memory
+        if indx < 0:
+            raise IndexError('SPOOL record spilled out of the memory')
+        elif indx == 0  and  self._head:
+            self._head -= 1     # put back in front of the head
+            self._line[self._head] = pop_res[0]
+            self._did[self._head]  = pop_res[1]
+        else:
+            self._line.insert(self._head + indx, pop_res[0])
+            self._did.insert(self._head + indx, pop_res[1])
 
 
     def __str__(self):
@@ -63,33 +153,79 @@ class Spool(object):
                 ])
 
     def __len__(self):
-        return len(self.spool)
+        return self._spilled + len(self._line) - self._head
 
     def __getitem__(self, key):
         if isinstance(key, int):        # key = ln
-            return self.spool[key]
+            return self._line[self.__index(key)]
         else:                           # key = (ln, indx/slice)
-            return self.spool[key[0]][key[1]]
+            return self._line[self.__index(key[0])][key[1]]
 
     def deck_id(self, key):
-        return self.spdid[key]
+        return self._did[self.__index(key)]
 
     def __setitem__(self, key, val):
         if isinstance(key, int):        # key = ln
-            self.spool[key] = val
+            self._line[self.__index(key)] = val
         else:
+            ln = self.__index(key[0])
             if isinstance(key[1], int): # key = (ln, indx)
                 in_s = key[1]
                 while in_s < 0:
-                    in_s += len(self.spool[key[0]])
+                    in_s += len(self._line[ln])
                 in_e = in_s + 1
             else:                       # key = (ln, slice)
-                (in_s, in_e, step) = key[1].indices(len(self.spool[key[0]]))
-            self.spool[key[0]] = '{0}{1}{2}'.format(
-                self.spool[key[0]][:in_s],
+                (in_s, in_e, step) = key[1].indices(len(self._line[ln]))
+            self._line[ln] = '{0}{1}{2}'.format(
+                self._line[ln][:in_s],
                 val,
-                self.spool[key[0]][in_e:]
+                self._line[ln][in_e:]
                 )
+
+
+    def __index(self, ln):
+        '''translate a line number into an index of the record lists'''
+        size = self.__len__()
+        if ln < 0:
+            ln += size
+        if ln < 0  or  ln >= size:
+            raise IndexError('SPOOL index out of range')
+        if ln < self._spilled:
+            raise IndexError('SPOOL record spilled out of the memory')
+        return self._head + ln - self._spilled
+
+    def __compact(self):
+        '''drop the popped records in front of the head'''
+        if self._head:
+            del self._line[:self._head]
+            del self._did[:self._head]
+            self._head = 0
+
+    def __spilled_batches(self):
+        if not self._spill:
+            return
+        self._spill.seek(0)
+        spilled = 0
+        while spilled < self._spilled:
+            batch = pickle.load(self._spill)
+            spilled += len(batch[0])
+            yield batch
+
+    def __unspill(self):
+        '''load the spilled records back into the memory'''
+        self.__compact()
+        if not self._spill:
+            return              # nothing spilled, early return
+        lines = [ ]
+        dids  = [ ]
+        for ( batch_lines, batch_dids, ) in self.__spilled_batches():
+            lines.extend(batch_lines)
+            dids.extend(batch_dids)
+        self._line = lines + self._line
+        self._did  = dids  + self._did
+        self._spill.close()     # the temporary file is deleted on closing
+        self._spill = None
+        self._spilled = 0
 # end of Spool Definition
 
 
@@ -173,14 +309,14 @@ def flush(sp):
         return -1
 
     mode = 'w'
-    for line in sp.spool:
+    for line in sp.records():
         if '\0' in line:        # is binary file
             mode = 'wb'
             break
     fp = open_file(sp.real_path, mode, sp.f_type)
 
     cnt = 0
-    for line in sp.spool:
+    for line in sp.records():
         fp.write(line)
         cnt += 1
     fp.close()
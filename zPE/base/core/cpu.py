@@ -7,7 +7,10 @@ from zPE.util.global_config import *
 
 from zPE.base.core.reg import GPR, SPR, Register, RegisterPair
 from zPE.base.core.mem import Memory
-from zPE.base.core.asm import len_op, X_, P_, F_
+from zPE.base.core.asm import len_op, is_branching, F_
+from zPE.base.core import packed
+
+from binascii import a2b_hex, b2a_hex
 
 
 ### Interface Function Definition
@@ -16,12 +19,36 @@ def fetch(EX_addr = None, EX_reg = None):
     '''
     both EX_addr and EX_reg should not be touched by any regular fetch;
     only an EX instruction should pass those to `fetch()`
+
+    return value
+        a four-tuple ( op_code, arg, handler, raw ), where `op_code` is the
+        integer op-code (1 or 2 bytes), `arg` is the tuple of integer
+        fields decoded by `__ARG_DECODER` (see `prnt_ins()` for the hex
+        view), `handler` is the function from `ins_op` that executes the
+        instruction against `arg`, and `raw` is the byte string of the
+        instruction (as EXecuted, if fetched by EX)
+
+    regular fetches are served from `INS_CACHE` whenever possible; the
+    instruction fetched by an EX instruction is never cached
     '''
-    if EX_reg:
+    if EX_reg != None:
         addr = EX_addr                  # use the address specified by EX
     else:
         addr = SPR['PSW'].Instruct_addr # retrieve address of next instruction
 
+        # try the decoded instruction cache first
+        entry = INS_CACHE.get(addr)
+        if entry and entry[0] is Memory._pool_allocated.get(addr / 4096):
+            INS_CACHE_STAT['hit'] += 1
+        else:
+            INS_CACHE_STAT['miss'] += 1
+            entry = __decode(addr)
+        if entry:
+            SPR['PSW'].ILC = entry[1]
+            SPR['PSW'].Instruct_addr += entry[2]
+            return entry[3]
+        # cannot be decoded cleanly; go through the checks below
+
     # check address alignment
     if addr % 2 != 0:
         raise newSpecificationException()
@@ -35,409 +62,677 @@ def fetch(EX_addr = None, EX_reg = None):
     page = Memory._pool_allocated[pg_i] # get the actual page
 
     # get 1st byte of the op-code
-    op_code = page[addr]
+    op_code = page.buf[page.base + addr]
     addr += 1
-    if EX_reg and op_code == '44':
+    if EX_reg != None and op_code == 0x44:
         # try to EXecute an EX instruction
         raise newSystemException('0C3', 'EXECUTION EXCEPTION')
 
     # test if op-code is more than one byte
-    op_len = len_op([ op_code ]) / 2 # op_code_byte_cnt = num_of_hex_digit / 2
+    op_len = __OP_LEN[op_code]
+    entry = __DISPATCH[op_code]
 
     if op_len == 2:             # 2-byte op-code
-        op_code += page[addr]   # no need to check page, since aligned on hw
-        addr += 1
+        entry = entry[page.buf[page.base + addr]] # secondary table
+        op_code = (op_code << 8) | page.buf[page.base + addr]
+        addr += 1               # no need to check page since aligned on hw
 
-    if not EX_reg:
+    if EX_reg == None:
         # update ILC and Address pointer
         SPR['PSW'].ILC = (op_len + 1) / 2       # num of halfwords
                                                 # (including half-filled one)
         SPR['PSW'].Instruct_addr += op_len
 
     # validate op-code
-    if op_code not in ins_op:
+    if entry == None:
         raise newOperationException()
 
     # fetch the argument(s)
-    byte_cnt = ins_op[op_code][1] # get the byte_cnt of the argument(s)
+    byte_cnt = entry[1]         # get the byte_cnt of the argument(s)
     if addr + byte_cnt > 4096:
-        # retrieve next page, if available
+        # need the next page, if available
         if pg_i + 1 not in Memory._pool_allocated:
             raise newProtectionException()
-        next_page = Memory._pool_allocated[pg_i + 1]
-        arg = page[addr : ] + next_page[ : addr + byte_cnt - 4096]
-    else:
-        arg = page[addr : addr + byte_cnt]
+    # allocated pages are contiguous in the storage; one slice is enough
+    arg = page.buf[page.base + addr : page.base + addr + byte_cnt]
 
-    if EX_reg:
+    if EX_reg != None:
         if debug_mode():
-            print '[ EX instruction ] receives:', op_code, arg
+            print '[ EX instruction ] receives:', prnt_ins(
+                ( op_code, entry[5](arg) )
+                )
 
         # perform OR if needed
-        indx = h2i(EX_reg)
-        if indx:                # not R0
+        if EX_reg:              # not R0
             if debug_mode():
                 print '  ORing with R{0} = ******{1:0>2}'.format(
-                    indx, i2h(GPR[indx][4])
+                    EX_reg, i2h(GPR[EX_reg][4])
                     )
             if op_len == 1:
                 # 1-byte op-code
-                arg = '{0:0>2}{1}'.format(
-                    i2h( GPR[indx][4] | int(arg[0:2],16) ), arg[2:]
-                    ) # perform OR on 2nd byte of instruction (1st arg byte)
+                arg[0] |= GPR[EX_reg][4] # perform OR on 2nd byte of
+                                         # instruction (1st arg byte)
             else:
                 # 2-byte op-code
-                op_code = '{0}{1:0>2}{2}'.format(
-                    op_code[:2],
-                    i2h( GPR[indx][4] | int(op_code[2:],16) )
-                    ) # perform OR on 2nd byte of instruction (2nd op-code byte)
+                op_code |= GPR[EX_reg][4] # perform OR on 2nd byte of
+                                          # instruction (2nd op-code byte)
+                entry = __DISPATCH[op_code >> 8][op_code & 0xFF]
                 # validate op-code
-                if op_code not in ins_op:
+                if entry == None:
                     raise newOperationException()
                 # validate arg length
-                if byte_cnt != ins_op[op_code][1]:
+                if byte_cnt != entry[1]:
                     raise newOperationException()
         else:
             if debug_mode():
                 print '  Register is R0, no instruction unchanged'
-    else:
-        # update ILC and Address pointer
-        SPR['PSW'].ILC += len(arg) / 4  # num of additional halfword(s)
-                                        # (not including half-filled one)
-        SPR['PSW'].Instruct_addr += len(arg) / 2
+        return ( op_code, entry[5](arg), entry[2],
+                 __raw(op_code, op_len, arg)
+                 )
+
+    # update ILC and Address pointer
+    SPR['PSW'].ILC += byte_cnt / 2  # num of additional halfword(s)
+                                    # (not including half-filled one)
+    SPR['PSW'].Instruct_addr += byte_cnt
+
+    return ( op_code, entry[5](arg), entry[2],
+             __raw(op_code, op_len, arg)
+             )
+
 
-    return ( op_code, arg )
+def fetch_block():
+    '''
+    return the translated basic block starting at the current instruction
+    address, or None if the instruction there has to go through `fetch()`
+    and `execute()` (EX, page-crossing / invalid instruction, page whose
+    translated code has been written, etc.)
+
+    a block is a function `block(record)` that executes a run of
+    instructions ending with the first branching one (or the end of the
+    page, or `BLOCK_MAX_INS` instructions); `record(bits, addr, ins, is_br)`
+    is invoked with the PSW bits 32-39 and the address before each
+    instruction is decoded
+    '''
+    addr = SPR['PSW'].Instruct_addr
+    page = Memory._pool_allocated.get(addr / 4096)
+
+    entry = BLOCK_CACHE.get(addr)
+    if entry and entry[0] is page:
+        BLOCK_CACHE_STAT['hit'] += 1
+        return entry[1]
+    BLOCK_CACHE_STAT['miss'] += 1
+
+    if page is None  or  __BLOCK_DIRTY.get(id(page)) is page:
+        return None
+    return __translate(addr, page)
 
 
 def execute(ins):
     if debug_mode():
         print 'Exec: {0}: {1}'.format(
-            ins_op[ins[0]][0],
-            ' '.join(fixed_width_split(4, ''.join(ins)))
+            decode_op(ins[0]),
+            ' '.join(fixed_width_split(4, prnt_ins(ins)))
             )
-    ins_op[ins[0]][2](ins[1]) # execute the instruction against the arguments
+    ins[2](ins[1])              # execute the instruction against the arguments
 
-    if debug_mode() and ins[0] != '44': # skip EX
+    if debug_mode() and ins[0] != 0x44: # skip EX
         print '  '.join([ str(r) for r in GPR[:8] ]), '\t\t', SPR['PSW']
         print '  '.join([ str(r) for r in GPR[8:] ]), '\t\tCC =', SPR['PSW'].CC
         print
     return
 
 
+def prnt_ins(ins):
+    '''
+    return the hex-string view of a fetched instruction;
+    should only be used for tracing / reporting purpose
+    '''
+    ( op_code, arg ) = ins[:2]
+    if op_code > 0xFF:
+        code = [ '{0:0>4X}'.format(op_code) ]
+    else:
+        code = [ '{0:0>2X}'.format(op_code) ]
+    for ( val, width ) in zip(arg, __ARG_FIELD[len(arg)]):
+        code.append('{0:0>{1}X}'.format(val, width))
+    return ''.join(code)
+
+
+def ins_cache_reset():
+    '''
+    drop all decoded instructions and translated blocks, and reset the
+    hit / miss counters
+    '''
+    INS_CACHE.clear()
+    __INS_CACHE_BASE.clear()
+    for key in INS_CACHE_STAT:
+        INS_CACHE_STAT[key] = 0
+
+    BLOCK_CACHE.clear()
+    __BLOCK_OF.clear()
+    __BLOCK_DIRTY.clear()
+    for key in BLOCK_CACHE_STAT:
+        BLOCK_CACHE_STAT[key] = 0
+
+###
+
+
+### Decoded Instruction Cache
+
+INS_CACHE = {
+    # addr : ( Page, ILC, ins_len, ( op_code, arg, handler, raw ) )
+    #   Page    - the page the instruction is decoded from; an entry is only
+    #             valid if the page is still allocated at the same index
+    #   ins_len - the number of bytes of the instruction (incl. op-code)
+    }
+INS_CACHE_STAT = {
+    'hit'  : 0,                 # number of fetches served by the cache
+    'miss' : 0,                 # number of fetches that decode the memory
+    }
+
+__INS_CACHE_BASE = {
+    # id(Page) : addr of the first byte of the page
+    }
+
+def __ins_cache_add(addr, page, ilc, ins_len, ins):
+    INS_CACHE[addr] = ( page, ilc, ins_len, ins )
+    __INS_CACHE_BASE[id(page)] = addr - addr % 4096
+    page.watcher = __ins_cache_invalidate # get notified on any write
+
+def __ins_cache_invalidate(page, pos, length):
+    '''
+    drop every entry that overlaps with [ pos, pos + length ) of the page,
+    together with every translated block containing any of them
+    '''
+    if id(page) not in __INS_CACHE_BASE:
+        return                  # nothing is cached from the page
+    base = __INS_CACHE_BASE[id(page)]
+    # an instruction is at most 6 bytes long, and never crosses a page
+    for addr in range(base + max(pos - 5, 0), base + pos + length):
+        entry = INS_CACHE.get(addr)
+        if entry and addr + entry[2] > base + pos:
+            del INS_CACHE[addr]
+            if addr in __BLOCK_OF:
+                __block_drop(page, __BLOCK_OF.pop(addr))
+
+def __decode(addr):
+    '''
+    decode the instruction at `addr` into `INS_CACHE` without touching
+    the PSW; return the cache entry, or None if the instruction cannot be
+    decoded from within a single page (`fetch()` raises the exception, if
+    any, when it actually gets there)
+    '''
+    page = Memory._pool_allocated.get(addr / 4096)
+    if page is None  or  addr % 2 != 0:
+        return None
+    pos = addr % 4096
+
+    pos += page.base            # position within the storage
+    op_code = page.buf[pos]
+    op_len = __OP_LEN[op_code]
+    entry = __DISPATCH[op_code]
+    if op_len == 2:
+        entry = entry[page.buf[pos + 1]]
+        op_code = (op_code << 8) | page.buf[pos + 1]
+    if entry == None:
+        return None
+
+    ins_len = entry[3]
+    if pos - page.base + ins_len > 4096:
+        return None             # crossing the page boundary
+
+    __ins_cache_add(
+        addr, page, entry[4], ins_len,
+        ( op_code, entry[5](page.buf[pos + op_len : pos + ins_len]), entry[2],
+          str(page.buf[pos : pos + ins_len])
+          )
+        )
+    return INS_CACHE[addr]
+
+def __raw(op_code, op_len, arg):
+    if op_len == 2:
+        return chr(op_code >> 8) + chr(op_code & 0xFF) + str(arg)
+    return chr(op_code) + str(arg)
+
+###
+
+
+### Basic Block Translation
+
+BLOCK_MAX_INS = 32              # max number of instructions in a block
+
+BLOCK_CACHE = {
+    # addr : ( Page, block, alive )
+    #   alive   - [ True ] until the block is invalidated; checked by the
+    #             block after each instruction so that a block that
+    #             overwrites itself stops right after the store
+    }
+BLOCK_CACHE_STAT = {
+    'hit'  : 0,                 # number of blocks served by the cache
+    'miss' : 0,                 # number of lookups that need translation
+    }
+
+__BLOCK_OF = {
+    # addr of an instruction : [ addr of each block containing it ]
+    }
+__BLOCK_DIRTY = {
+    # id(Page) : Page
+    #   pages whose translated code has been written; instructions on them
+    #   always go through the interpreter from then on
+    }
+
+def __translate(addr, page):
+    start = addr
+    body = [ ]                  # [ ( ILC, next_addr, ins, is_br ) ]
+    while len(body) < BLOCK_MAX_INS:
+        entry = INS_CACHE.get(addr)
+        if not entry or entry[0] is not page:
+            entry = __decode(addr)
+        if not entry or entry[3][0] == 0x44:
+            break               # leave it to the interpreter
+        __BLOCK_OF.setdefault(addr, [ ]).append(start)
+
+        addr += entry[2]
+        is_br = __op_entry(entry[3][0])[6]
+        body.append(( entry[1], addr, entry[3], is_br ))
+        if is_br  or  addr % 4096 == 0:
+            break               # end of the basic block
+    if not body:
+        return None
+
+    alive = [ True ]
+    block = __compile_block(tuple(body), alive)
+    BLOCK_CACHE[start] = ( page, block, alive )
+    return block
+
+def __compile_block(body, alive):
+    def block(record):
+        psw = SPR['PSW']
+        for ( ilc, next_addr, ins, is_br ) in body:
+            record(psw.trace_bits(), psw.Instruct_addr, ins, is_br)
+            psw.ILC = ilc
+            psw.Instruct_addr = next_addr
+            ins[2](ins[1])
+            if not alive[0]:
+                break           # the rest of the block has been written
+    return block
+
+def __block_drop(page, starts):
+    for start in starts:
+        if start in BLOCK_CACHE:
+            BLOCK_CACHE.pop(start)[2][0] = False
+    __BLOCK_DIRTY[id(page)] = page
+
+###
+
+
+### Argument Decoding Definition
+
+# byte_cnt : decoder that splits the argument bytes into integer fields
+__ARG_DECODER = {
+    # RR  : R1 R2
+    1 : lambda b : ( b[0] >> 4, b[0] & 0xF ),
+    # RX  : R1 X2 B2 D2
+    # RS  : R1 R3 B2 D2
+    # SI  : I2(hi) I2(lo) B1 D1
+    3 : lambda b : ( b[0] >> 4, b[0] & 0xF,
+                     b[1] >> 4, ((b[1] & 0xF) << 8) | b[2]
+                     ),
+    # SS  : L1 L2 B1 D1 B2 D2    ( or L(hi) L(lo) B1 D1 B2 D2 )
+    5 : lambda b : ( b[0] >> 4, b[0] & 0xF,
+                     b[1] >> 4, ((b[1] & 0xF) << 8) | b[2],
+                     b[3] >> 4, ((b[3] & 0xF) << 8) | b[4]
+                     ),
+    # SSE : B1 D1 L (pseudo-instructions with a 2-byte op-code)
+    4 : lambda b : ( b[0] >> 4, ((b[0] & 0xF) << 8) | b[1],
+                     (b[2] << 8) | b[3]
+                     ),
+    }
+
+# number of fields : width (in hex digits) of each field
+__ARG_FIELD = {
+    2 : ( 1, 1, ),
+    4 : ( 1, 1, 1, 3, ),
+    6 : ( 1, 1, 1, 3, 1, 3, ),
+    3 : ( 1, 3, 4, ),
+    }
+
+# 1st byte of the op-code : number of bytes of the op-code
+__OP_LEN = [ len_op([ '{0:0>2X}'.format(i) ]) / 2 for i in range(256) ]
+
 ###
 
 
 ### Instruction Look-up Tabel
 ins_op = {
-    '05'   : ( 'BALR', 1,
+    0x05   : ( 'BALR', 1,
                lambda s : [ __reg(s[0]).load(h2i(SPR['PSW'].dump_hex(2))),
                             __cnt(Register(0), __addr_reg(s[1]))
                             ] ),
-    '06'   : ( 'BCTR', 1, lambda s : __cnt(__reg(s[0]), __addr_reg(s[1])) ),
-    '07'   : ( 'BCR',  1, lambda s : __br(__mask(s[0]), __reg(s[1]).addr()) ),
-    '10'   : ( 'LPR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).set_abs() ),
-    '11'   : ( 'LNR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).neg_abs() ),
-    '12'   : ( 'LTR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).test() ),
-    '13'   : ( 'LCR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).neg_val() ),
-    '14'   : ( 'NR',   1, lambda s : __reg(s[0]) & __reg(s[1]) ),
-    '15'   : ( 'CLR',  1, lambda s : __reg(s[0]).cmp_lgc(__reg(s[1])) ),
-    '16'   : ( 'OR',   1, lambda s : __reg(s[0]) | __reg(s[1]) ),
-    '17'   : ( 'XR',   1, lambda s : __reg(s[0]) ^ __reg(s[1]) ),
-    '18'   : ( 'LR',   1, lambda s : __reg(s[0]).load(__reg(s[1])) ),
-    '19'   : ( 'CR',   1, lambda s : __reg(s[0]).cmp(__reg(s[1])) ),
-    '1A'   : ( 'AR',   1, lambda s : __reg(s[0])  + __reg(s[1]) ),
-    '1B'   : ( 'SR',   1, lambda s : __reg(s[0])  - __reg(s[1]) ),
-    '1C'   : ( 'MR',   1, lambda s : __pair(s[0]) * __reg(s[1]) ),
-    '1D'   : ( 'DR',   1, lambda s : __pair(s[0]) / __reg(s[1]) ),
-    '1E'   : ( 'ALR',  1, lambda s : __reg(s[0]).add_lgc(__reg(s[1])) ),
-    '1F'   : ( 'SLR',  1, lambda s : __reg(s[0]).sub_lgc(__reg(s[1])) ),
-    '40'   : ( 'STH',  3,
+    0x06   : ( 'BCTR', 1, lambda s : __cnt(__reg(s[0]), __addr_reg(s[1])) ),
+    0x07   : ( 'BCR',  1, lambda s : __br(__mask(s[0]), __reg(s[1]).addr()) ),
+    0x10   : ( 'LPR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).set_abs() ),
+    0x11   : ( 'LNR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).neg_abs() ),
+    0x12   : ( 'LTR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).test() ),
+    0x13   : ( 'LCR',  1, lambda s : __reg(s[0]).load(__reg(s[1])).neg_val() ),
+    0x14   : ( 'NR',   1, lambda s : __reg(s[0]) & __reg(s[1]) ),
+    0x15   : ( 'CLR',  1, lambda s : __reg(s[0]).cmp_lgc(__reg(s[1])) ),
+    0x16   : ( 'OR',   1, lambda s : __reg(s[0]) | __reg(s[1]) ),
+    0x17   : ( 'XR',   1, lambda s : __reg(s[0]) ^ __reg(s[1]) ),
+    0x18   : ( 'LR',   1, lambda s : __reg(s[0]).load(__reg(s[1])) ),
+    0x19   : ( 'CR',   1, lambda s : __reg(s[0]).cmp(__reg(s[1])) ),
+    0x1A   : ( 'AR',   1, lambda s : __reg(s[0])  + __reg(s[1]) ),
+    0x1B   : ( 'SR',   1, lambda s : __reg(s[0])  - __reg(s[1]) ),
+    0x1C   : ( 'MR',   1, lambda s : __pair(s[0]) * __reg(s[1]) ),
+    0x1D   : ( 'DR',   1, lambda s : __pair(s[0]) / __reg(s[1]) ),
+    0x1E   : ( 'ALR',  1, lambda s : __reg(s[0]).add_lgc(__reg(s[1])) ),
+    0x1F   : ( 'SLR',  1, lambda s : __reg(s[0]).sub_lgc(__reg(s[1])) ),
+    0x40   : ( 'STH',  3,
                lambda s : __reg(s[0]).store( hw = True,
-                                             * __page(s[3:6],s[1],s[2],2)
+                                             * __page(s[3],s[1],s[2],2)
                                              ) ),
-    '41'   : ( 'LA',   3,
-               lambda s : __reg(s[0]).load( __addr(s[3:6],s[1],s[2])   )
+    0x41   : ( 'LA',   3,
+               lambda s : __reg(s[0]).load( __addr(s[3],s[1],s[2])   )
                ),
-    '42'   : ( 'STC',  3,
-               lambda s : __reg(s[0]).stc(* __page(s[3:6],s[1],s[2],1) )
+    0x42   : ( 'STC',  3,
+               lambda s : __reg(s[0]).stc(* __page(s[3],s[1],s[2],1) )
                ),
-    '43'   : ( 'IC',   3,
-               lambda s : __reg(s[0]).inc( __deref(s[3:6],s[1],s[2],1) )
+    0x43   : ( 'IC',   3,
+               lambda s : __reg(s[0]).inc( __deref(s[3],s[1],s[2],1) )
                ),
-    '44'   : ( 'EX',   3,
-               lambda s : execute(fetch(__addr(s[3:6],s[1],s[2]), s[0]))
+    0x44   : ( 'EX',   3,
+               lambda s : execute(fetch(__addr(s[3],s[1],s[2]), s[0]))
                ),
-    '45'   : ( 'BAL',  3,
+    0x45   : ( 'BAL',  3,
                lambda s : [ __reg(s[0]).load(h2i(SPR['PSW'].dump_hex(2))),
-                            __cnt(Register(0), __addr(s[3:6],s[1],s[2]))
+                            __cnt(Register(0), __addr(s[3],s[1],s[2]))
                             ] ),
-    '46'   : ( 'BCT',  3, lambda s : __cnt(__reg(s[0]),
-                                           __addr(s[3:6], s[1], s[2])
+    0x46   : ( 'BCT',  3, lambda s : __cnt(__reg(s[0]),
+                                           __addr(s[3], s[1], s[2])
                                            ) ),
-    '47'   : ( 'BC',   3, lambda s : __br(__mask(s[0]),
-                                          __addr(s[3:6], s[1], s[2])
+    0x47   : ( 'BC',   3, lambda s : __br(__mask(s[0]),
+                                          __addr(s[3], s[1], s[2])
                                           ) ),
-    '48'   : ( 'LH',   3,
-               lambda s : __reg(s[0]).load( __deref(s[3:6],s[1],s[2],2),
+    0x48   : ( 'LH',   3,
+               lambda s : __reg(s[0]).load( __deref(s[3],s[1],s[2],2),
                                             hw = True
                                             ) ),
-    '49'   : ( 'CH',   3,
-               lambda s : __reg(s[0]).cmp(__deref(s[3:6],s[1],s[2],2))
+    0x49   : ( 'CH',   3,
+               lambda s : __reg(s[0]).cmp(__deref(s[3],s[1],s[2],2))
                ),
-    '4A'   : ( 'AH',   3, lambda s : __reg(s[0]) + __deref(s[3:6],s[1],s[2],2)
+    0x4A   : ( 'AH',   3, lambda s : __reg(s[0]) + __deref(s[3],s[1],s[2],2)
                ),
-    '4B'   : ( 'SH',   3, lambda s : __reg(s[0]) - __deref(s[3:6],s[1],s[2],2)
+    0x4B   : ( 'SH',   3, lambda s : __reg(s[0]) - __deref(s[3],s[1],s[2],2)
                ),
-    '4C'   : ( 'MH',   3, lambda s : __reg(s[0]) * __deref(s[3:6],s[1],s[2],2)
+    0x4C   : ( 'MH',   3, lambda s : __reg(s[0]) * __deref(s[3],s[1],s[2],2)
                ),
-    '4E'   : ( 'CVD',  3, lambda s : (
-            lambda val_str = '{0:0>16}'.format(i2p(__reg(s[0]).int)),
-            ( page, addr ) = __page(s[3:6],s[1],s[2],8) :
-                page.store(addr,
-                           ( (Register(h2i(val_str[:8])).long << 32) +
-                             (Register(h2i(val_str[8:])).long)
-                             ),
-                           'dw'
-                           )
-            )() ),
-    '4F'   : ( 'CVB',  3, lambda s : __reg(s[0]).load(
-            __chk_dec(__deref(s[3:6],s[1],s[2],8), 8)
+    0x4E   : ( 'CVD',  3, lambda s : __store(
+            s[3], s[1], s[2], packed.to_packed(__reg(s[0]).int, 8), 8
             ) ),
-    '50'   : ( 'ST',   3,
-               lambda s : __reg(s[0]).store(* __page(s[3:6],s[1],s[2]))
+    0x4F   : ( 'CVB',  3, lambda s : __reg(s[0]).load(
+            __chk_dec(__fetch(s[3],s[1],s[2],8,8))
+            ) ),
+    0x50   : ( 'ST',   3,
+               lambda s : __reg(s[0]).store(* __page(s[3],s[1],s[2]))
                ),
-    '54'   : ( 'N',    3, lambda s : __reg(s[0]) & __deref(s[3:6],s[1],s[2]) ),
-    '55'   : ( 'CL',   3,
-               lambda s : __reg(s[0]).cmp_lgc(__deref(s[3:6],s[1],s[2]))
+    0x54   : ( 'N',    3, lambda s : __reg(s[0]) & __deref(s[3],s[1],s[2]) ),
+    0x55   : ( 'CL',   3,
+               lambda s : __reg(s[0]).cmp_lgc(__deref(s[3],s[1],s[2]))
                ),
-    '56'   : ( 'O',    3, lambda s : __reg(s[0]) | __deref(s[3:6],s[1],s[2]) ),
-    '57'   : ( 'X',    3, lambda s : __reg(s[0]) ^ __deref(s[3:6],s[1],s[2]) ),
-    '58'   : ( 'L',    3, lambda s : __reg(s[0]).load(__deref(s[3:6],s[1],s[2]))
+    0x56   : ( 'O',    3, lambda s : __reg(s[0]) | __deref(s[3],s[1],s[2]) ),
+    0x57   : ( 'X',    3, lambda s : __reg(s[0]) ^ __deref(s[3],s[1],s[2]) ),
+    0x58   : ( 'L',    3, lambda s : __reg(s[0]).load(__deref(s[3],s[1],s[2]))
                ),
-    '59'   : ( 'C',    3, lambda s : __reg(s[0]).cmp(__deref(s[3:6],s[1],s[2]))
+    0x59   : ( 'C',    3, lambda s : __reg(s[0]).cmp(__deref(s[3],s[1],s[2]))
                ),
-    '5A'   : ( 'A',    3, lambda s : __reg(s[0])  + __deref(s[3:6],s[1],s[2]) ),
-    '5B'   : ( 'S',    3, lambda s : __reg(s[0])  - __deref(s[3:6],s[1],s[2]) ),
-    '5C'   : ( 'M',    3, lambda s : __pair(s[0]) * __deref(s[3:6],s[1],s[2]) ),
-    '5D'   : ( 'D',    3, lambda s : __pair(s[0]) / __deref(s[3:6],s[1],s[2]) ),
-    '5E'   : ( 'AL',   3,
-               lambda s : __reg(s[0]).add_lgc(__deref(s[3:6],s[1],s[2]))
+    0x5A   : ( 'A',    3, lambda s : __reg(s[0])  + __deref(s[3],s[1],s[2]) ),
+    0x5B   : ( 'S',    3, lambda s : __reg(s[0])  - __deref(s[3],s[1],s[2]) ),
+    0x5C   : ( 'M',    3, lambda s : __pair(s[0]) * __deref(s[3],s[1],s[2]) ),
+    0x5D   : ( 'D',    3, lambda s : __pair(s[0]) / __deref(s[3],s[1],s[2]) ),
+    0x5E   : ( 'AL',   3,
+               lambda s : __reg(s[0]).add_lgc(__deref(s[3],s[1],s[2]))
                ),
-    '5F'   : ( 'SL',   3,
-               lambda s : __reg(s[0]).sub_lgc(__deref(s[3:6],s[1],s[2]))
+    0x5F   : ( 'SL',   3,
+               lambda s : __reg(s[0]).sub_lgc(__deref(s[3],s[1],s[2]))
                ),
-    '86'   : ( 'BXH',  3, lambda s : (
-            lambda R1 = __reg(s[0]), R2_num = h2i(s[1]) : [
+    0x86   : ( 'BXH',  3, lambda s : (
+            lambda R1 = __reg(s[0]), R2_num = s[1] : [
                 R1 + GPR[R2_num],                           # add increment
                 R1.cmp(GPR[R2_num + (R2_num + 1) % 2]),     # cmp limit
-                __br([ 2 ], __addr(s[3:6],'0',s[2])),       # BH  addr
+                __br([ 2 ], __addr(s[3], 0, s[2])),         # BH  addr
                 ]
             )() ),
-    '87'   : ( 'BXLE', 3, lambda s : (
-            lambda R1 = __reg(s[0]), R2_num = h2i(s[1]) : [
+    0x87   : ( 'BXLE', 3, lambda s : (
+            lambda R1 = __reg(s[0]), R2_num = s[1] : [
                 R1 + GPR[R2_num],                           # add increment
                 R1.cmp(GPR[R2_num + (R2_num + 1) % 2]),     # cmp limit
-                __br([ 0, 1 ], __addr(s[3:6],'0',s[2])),    # BNH addr
+                __br([ 0, 1 ], __addr(s[3], 0, s[2])),      # BNH addr
                 ]
             )() ),
-    '88'   : ( 'SRL',  3, lambda s : __reg(s[0])  >> __addr(s[3:6],'0',s[2]) ),
-    '89'   : ( 'SLL',  3, lambda s : __reg(s[0])  << __addr(s[3:6],'0',s[2]) ),
-    '8A'   : ( 'SRA',  3,
-               lambda s : __reg(s[0]).rshft(__addr(s[3:6],'0',s[2]))
+    0x88   : ( 'SRL',  3, lambda s : __reg(s[0])  >> __addr(s[3],0,s[2]) ),
+    0x89   : ( 'SLL',  3, lambda s : __reg(s[0])  << __addr(s[3],0,s[2]) ),
+    0x8A   : ( 'SRA',  3,
+               lambda s : __reg(s[0]).rshft(__addr(s[3],0,s[2]))
                ),
-    '8B'   : ( 'SLA',  3,
-               lambda s : __reg(s[0]).lshft(__addr(s[3:6],'0',s[2]))
+    0x8B   : ( 'SLA',  3,
+               lambda s : __reg(s[0]).lshft(__addr(s[3],0,s[2]))
                ),
-    '8C'   : ( 'SRDL', 3, lambda s : __pair(s[0]) >> __addr(s[3:6],'0',s[2]) ),
-    '8D'   : ( 'SLDL', 3, lambda s : __pair(s[0]) << __addr(s[3:6],'0',s[2]) ),
-    '8E'   : ( 'SRDA', 3,
-               lambda s : __pair(s[0]).rshft(__addr(s[3:6],'0',s[2]))
+    0x8C   : ( 'SRDL', 3, lambda s : __pair(s[0]) >> __addr(s[3],0,s[2]) ),
+    0x8D   : ( 'SLDL', 3, lambda s : __pair(s[0]) << __addr(s[3],0,s[2]) ),
+    0x8E   : ( 'SRDA', 3,
+               lambda s : __pair(s[0]).rshft(__addr(s[3],0,s[2]))
                ),
-    '8F'   : ( 'SLDA', 3,
-               lambda s : __pair(s[0]).lshft(__addr(s[3:6],'0',s[2]))
+    0x8F   : ( 'SLDA', 3,
+               lambda s : __pair(s[0]).lshft(__addr(s[3],0,s[2]))
                ),
-    '90'   : ( 'STM',  3, lambda s : [
-            __reg(s[0], offset).store(* __page(s[3:6],'0',s[2],4,offset))
+    0x90   : ( 'STM',  3, lambda s : [
+            __reg(s[0], offset).store(* __page(s[3],0,s[2],4,offset))
             for offset in (
-                lambda R1 = h2i(s[0]), R2 = h2i(s[1]) :
+                lambda R1 = s[0], R2 = s[1] :
                     range([ R1 + i for i in range(16) ][R2 - R1] - R1 + 1)
                 )() # this handles the case when R1 > R2 using negative index
             ] ),
-    '91'   : ( 'TM',   3, lambda s : __tst_bit(__deref(s[3:6], '0', s[2], 1),
-                                               h2i(s[0:2])
+    0x91   : ( 'TM',   3, lambda s : __tst_bit(__deref(s[3], 0, s[2], 1),
+                                               __byte(s[0], s[1])
                                                ) ),
-    '92'   : ( 'MVI',  3, lambda s : __ref(s[3:6],'0',s[2],s[0:2]) ),
-    '94'   : ( 'NI',   3, lambda s : __refmod(s[3:6],'0',s[2],'N',s[0:2]) ),
-    '95'   : ( 'CLI',  3, lambda s : __cmp_lgc(__deref(s[3:6], '0', s[2], 1),
-                                               h2i(s[0:2])
+    0x92   : ( 'MVI',  3, lambda s : __ref(s[3], 0, s[2], __byte(s[0], s[1]))
+               ),
+    0x94   : ( 'NI',   3,
+               lambda s : __refmod(s[3], 0, s[2], 'N', __byte(s[0], s[1]))
+               ),
+    0x95   : ( 'CLI',  3, lambda s : __cmp_lgc(__deref(s[3], 0, s[2], 1),
+                                               __byte(s[0], s[1])
                                                ) ),
-    '96'   : ( 'OI',   3, lambda s : __refmod(s[3:6],'0',s[2],'O',s[0:2]) ),
-    '97'   : ( 'XI',   3, lambda s : __refmod(s[3:6],'0',s[2],'X',s[0:2]) ),
-    '98'   : ( 'LM',   3, lambda s : [
-            __reg(s[0], offset).load(  __deref(s[3:6],'0',s[2],4,offset))
+    0x96   : ( 'OI',   3,
+               lambda s : __refmod(s[3], 0, s[2], 'O', __byte(s[0], s[1]))
+               ),
+    0x97   : ( 'XI',   3,
+               lambda s : __refmod(s[3], 0, s[2], 'X', __byte(s[0], s[1]))
+               ),
+    0x98   : ( 'LM',   3, lambda s : [
+            __reg(s[0], offset).load(  __deref(s[3],0,s[2],4,offset))
             for offset in (
-                lambda R1 = h2i(s[0]), R2 = h2i(s[1]) :
+                lambda R1 = s[0], R2 = s[1] :
                     range([ R1 + i for i in range(16) ][R2 - R1] - R1 + 1)
                 )() # this handles the case when R1 > R2 using negative index
             ] ),
-    'BE'   : ( 'STCM', 3, lambda s : (
+    0xBE   : ( 'STCM', 3, lambda s : (
             lambda mask = __mask(s[1]) : [
-                __reg(s[0]).stc(* __page(s[3:6], '0', s[2], 1, offset),
+                __reg(s[0]).stc(* __page(s[3], 0, s[2], 1, offset),
                                   pos = mask[offset] # keyword (named) arg
                                   ) # list extension must be last unmaned arg
                 for offset in range(len(mask))
                 ]
             )() ),
-    'BF'   : ( 'ICM',  3, lambda s : (
+    0xBF   : ( 'ICM',  3, lambda s : (
             lambda mask = __mask(s[1]) :
-                __reg(s[0]).inc(__dump(s[3:6],s[2],len(mask)), mask)
+                __reg(s[0]).inc(__dump(s[3],s[2],len(mask)), mask)
             )() ),
-    'D2'   : ( 'MVC',  5, lambda s : [
-            __ref( s[3:6], '0', s[2],                      # d, i, b
-                   __deref(s[7:10], '0', s[6], 1, offset), # value
-                   offset                                  # offset
-                   )
-            for offset in range(__dclen(s[0:2]))
-            ] ),
-    'D4'   : ( 'NC',   5, lambda s : [
-            __refmod( s[3:6], '0', s[2], 'N',                 # d, i, b, AND
-                      __deref(s[7:10], '0', s[6], 1, offset), # value
-                      offset,                                 # offset
-                      offset and SPR['PSW'].CC
-                      )         # skip zero-check if CC is already 1
-            for offset in range(__dclen(s[0:2]))
-            ] ),
-    'D5'   : ( 'CLC',  5, lambda s : [
-            __cmp_lgc(__deref(s[3:6],  '0', s[2], 1, offset),
-                      __deref(s[7:10], '0', s[6], 1, offset),
-                      offset and SPR['PSW'].CC
-                      )     # skip comparison if CC is set to non-zero
-            for offset in range(__dclen(s[0:2]))
-            ] ),
-    'D6'   : ( 'OC',   5, lambda s : [
-            __refmod( s[3:6], '0', s[2], 'O',                 # d, i, b, OR
-                      __deref(s[7:10], '0', s[6], 1, offset), # value
-                      offset,                                 # offset
-                      offset and SPR['PSW'].CC
-                      )         # skip zero-check if CC is already 1
-            for offset in range(__dclen(s[0:2]))
-            ] ),
-    'D7'   : ( 'XC',   5, lambda s : [
-            __refmod( s[3:6], '0', s[2], 'X',                 # d, i, b, XOR
-                      __deref(s[7:10], '0', s[6], 1, offset), # value
-                      offset,                                 # offset
-                      offset and SPR['PSW'].CC
-                      )         # skip zero-check if CC is already 1
-            for offset in range(__dclen(s[0:2]))
-            ] ),
-    'DC'   : ( 'TR',   5, lambda s : (
-            lambda tr_val_gen_func = ( # encapsulate a tr mapping generator
-                lambda tr_index : __deref(s[7:10], '0', s[6], 1, tr_index)
-                ) :
-                [ __refmod( s[3:6], '0', s[2], 'R', # d, i, b, TR
-                            tr_val_gen_func,        # value generator (function)
-                            offset                  # offset
-                            )
-                  for offset in range(__dclen(s[0:2]))
-                  ]
-            )() ),
-    'DD'   : ( 'TRT',  5, lambda s : (
-            lambda tr_val_gen_func = ( # encapsulate a tr mapping generator
-                lambda tr_index : __deref(s[7:10], '0', s[6], 1, tr_index)
-                ) :
-                [ __refmod( s[3:6], '0', s[2], 'T', # d, i, b, TRT
-                            tr_val_gen_func,        # value generator (function)
-                            offset,                 # offset
-                            offset and SPR['PSW'].CC
-                            )   # skip translation if CC is non-zero
-                  for offset in range(__dclen(s[0:2]))
-                  ]
-            )() ),
-    'DE'   : ( 'ED',   5,
-               lambda s : __ed(s[3:6], s[2], __dclen(s[0:2]), s[7:10], s[6])
+    0xD2   : ( 'MVC',  5, lambda s : __mvc(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1]))
+            ) ),
+    0xD4   : ( 'NC',   5, lambda s : __refmod_ss(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1])), 'N'
+            ) ),
+    0xD5   : ( 'CLC',  5, lambda s : __cmp_ss(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1]))
+            ) ),
+    0xD6   : ( 'OC',   5, lambda s : __refmod_ss(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1])), 'O'
+            ) ),
+    0xD7   : ( 'XC',   5, lambda s : __refmod_ss(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1])), 'X'
+            ) ),
+    0xDC   : ( 'TR',   5, lambda s : __tr(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1]))
+            ) ),
+    0xDD   : ( 'TRT',  5, lambda s : __trt(
+            s[3], s[2], s[5], s[4], __dclen(__byte(s[0], s[1]))
+            ) ),
+    0xDE   : ( 'ED',   5,
+               lambda s : __ed(s[3], s[2], __dclen(__byte(s[0], s[1])),
+                               s[5], s[4])
                ),
-    'DF'   : ( 'EDMK', 5,
-               lambda s : __ed(s[3:6], s[2], __dclen(s[0:2]), s[7:10], s[6], 1)
+    0xDF   : ( 'EDMK', 5,
+               lambda s : __ed(s[3], s[2], __dclen(__byte(s[0], s[1])),
+                               s[5], s[4], 1)
                ),
-    'F0'   : ( 'SRP',  5, lambda s : __shft_dec(
-            s[3:6], s[2], __dclen(s[0]),
-            __addr(s[7:10],'0',s[6]), # encoded shift code
-            h2i(s[1])                 # rounding factor
+    0xF0   : ( 'SRP',  5, lambda s : __shft_dec(
+            s[3], s[2], __dclen(s[0]),
+            __addr(s[5], 0, s[4]),    # encoded shift code
+            s[1]                      # rounding factor
             ) ),
-    'F2'   : ( 'PACK', 5, lambda s : (
-            lambda pack_lst = P_.pack(__dump(s[7:10], s[6], __dclen(s[1])),
-                                      __dclen(s[0])) :
-                [ __ref(s[3:6], '0', s[2], pack_lst[offset], offset)
-                  for offset in range(len(pack_lst))
-                  ]
-            )() ),
-    'F3'   : ( 'UNPK', 5, lambda s : (
-            lambda pack_lst = P_.unpk(__dump(s[7:10], s[6], __dclen(s[1])),
-                                      __dclen(s[0])) :
-                [ __ref(s[3:6], '0', s[2], pack_lst[offset], offset)
-                  for offset in range(len(pack_lst))
-                  ]
-            )() ),
-    'F8'   : ( 'ZAP',  5, lambda s : __ref_dec(
-            s[3:6], __dclen(s[0]), s[2],
-            p2i(__dump(s[7:10],s[6],__dclen(s[1]))),
-            cc = True, ex = None # set CC, no exception checking
+    0xF2   : ( 'PACK', 5, lambda s : __store(
+            s[3], 0, s[2],
+            packed.pack(__fetch(s[5], 0, s[4], __dclen(s[1])), __dclen(s[0]))
             ) ),
-    'F9'   : ( 'CP',   5, lambda s : __cmp_dec(
-            p2i( __dump(s[3:6], s[2],__dclen(s[0])) ),
-            p2i( __dump(s[7:10],s[6],__dclen(s[1])) )
+    0xF3   : ( 'UNPK', 5, lambda s : __store(
+            s[3], 0, s[2],
+            packed.unpack(__fetch(s[5], 0, s[4], __dclen(s[1])), __dclen(s[0]))
             ) ),
-    'FA'   : ( 'AP',   5, lambda s : __ref_dec(
-            s[3:6], __dclen(s[0]), s[2],
-            ( p2i( __dump(s[3:6], s[2],__dclen(s[0])) ) +
-              p2i( __dump(s[7:10],s[6],__dclen(s[1])) )
-              ),
-            cc = True, ex = None # set CC, no exception checking
+    0xF8   : ( 'ZAP',  5, lambda s : __ref_dec(
+            s[3], __dclen(s[0]), s[2],
+            __dec(s[5], s[4], __dclen(s[1]))
             ) ),
-    'FB'   : ( 'SP',   5, lambda s : __ref_dec(
-            s[3:6], __dclen(s[0]), s[2],
-            ( p2i( __dump(s[3:6], s[2],__dclen(s[0])) ) -
-              p2i( __dump(s[7:10],s[6],__dclen(s[1])) )
-              ),
-            cc = True, ex = None # set CC, no exception checking
+    0xF9   : ( 'CP',   5, lambda s : __cmp_dec(
+            __dec(s[3], s[2], __dclen(s[0])),
+            __dec(s[5], s[4], __dclen(s[1]))
             ) ),
-    'FC'   : ( 'MP',   5, lambda s : __ref_dec(
-            s[3:6], __dclen(s[0]), s[2],
-            ( p2i( __dump(s[3:6], s[2],__dclen(s[0])) ) *
-              p2i( __dump(s[7:10],s[6],__dclen(s[1])) )
-              ),
-            cc = False, ex = __dclen(s[1])
+    0xFA   : ( 'AP',   5, lambda s : __ref_dec(
+            s[3], __dclen(s[0]), s[2],
+            ( __dec(s[3], s[2], __dclen(s[0])) +
+              __dec(s[5], s[4], __dclen(s[1]))
+              )
             ) ),
-    'FD'   : ( 'DP',   5, lambda s : __ref_dec(
-            s[3:6], __dclen(s[0]), s[2],
-            divmod( p2i( __dump(s[3:6], s[2],__dclen(s[0])) ),
-                    p2i( __dump(s[7:10],s[6],__dclen(s[1])) )
-                    ),
-            cc = False, ex = __dclen(s[1])
+    0xFB   : ( 'SP',   5, lambda s : __ref_dec(
+            s[3], __dclen(s[0]), s[2],
+            ( __dec(s[3], s[2], __dclen(s[0])) -
+              __dec(s[5], s[4], __dclen(s[1]))
+              )
+            ) ),
+    0xFC   : ( 'MP',   5, lambda s : __mul_dec(
+            s[3], __dclen(s[0]), s[2], s[5], __dclen(s[1]), s[4]
+            ) ),
+    0xFD   : ( 'DP',   5, lambda s : __div_dec(
+            s[3], __dclen(s[0]), s[2], s[5], __dclen(s[1]), s[4]
             ) ),
     }
 
-def decode_op(mnem):
-    return ins_op[mnem][0]
+def decode_op(op_code):
+    entry = __op_entry(op_code)
+    if entry == None:
+        raise KeyError('{0:0>2X}: Invalid op-code.'.format(op_code))
+    return entry[0]
+
+def register_op(op_table):
+    '''
+    install the op-codes in `op_table` (of the same format as `ins_op`)
+    into the dispatch tables, overriding any existing ones
+
+    return the entries replaced; pass it to `restore_op()` to uninstall
+    '''
+    saved = { }
+    for ( op_code, op ) in op_table.iteritems():
+        saved[op_code] = __op_entry(op_code)
+        __op_install(op_code, __op_compile(op_code, op))
+    ins_cache_reset()           # decoded instructions may be out-dated
+    return saved
+
+def restore_op(saved):
+    '''uninstall the op-codes installed by `register_op()`'''
+    for ( op_code, entry ) in saved.iteritems():
+        __op_install(op_code, entry)
+    ins_cache_reset()           # decoded instructions may be out-dated
+###
+
+
+### Op-code Dispatch Tables
+
+# 1st byte of the op-code : entry of the 1-byte op-code, or, for a 2-byte
+#                           op-code, a secondary table indexed by the 2nd
+#                           byte of the op-code
+# each entry is precomputed by `__op_compile()` as
+#   ( mnemonic, byte_cnt, handler, ins_len, ILC, decoder, is_br )
+# an unassigned op-code maps to None
+__DISPATCH = [ None ] * 256
+for __i in range(256):
+    if __OP_LEN[__i] == 2:
+        __DISPATCH[__i] = [ None ] * 256
+del __i
+
+def __op_entry(op_code):
+    if op_code > 0xFF:
+        if __OP_LEN[op_code >> 8] != 2:
+            return None
+        return __DISPATCH[op_code >> 8][op_code & 0xFF]
+    if __OP_LEN[op_code] != 1:
+        return None
+    return __DISPATCH[op_code]
+
+def __op_compile(op_code, op):
+    ( mnem, byte_cnt, handler ) = op
+    if op_code > 0xFF:
+        op_len = 2
+    else:
+        op_len = 1
+    if __OP_LEN[op_code >> (op_len - 1) * 8] != op_len:
+        raise ValueError('{0:0>2X}: Invalid op-code length.'.format(op_code))
+    return ( mnem, byte_cnt, handler,
+             op_len + byte_cnt,                  # ins_len
+             (op_len + 1) / 2 + byte_cnt / 2,    # ILC, see `fetch()`
+             __ARG_DECODER[byte_cnt],
+             bool(is_branching(mnem))
+             )
+
+def __op_install(op_code, entry):
+    if op_code > 0xFF:
+        __DISPATCH[op_code >> 8][op_code & 0xFF] = entry
+    else:
+        __DISPATCH[op_code] = entry
+
+for ( __op_code, __op ) in ins_op.iteritems():
+    __op_install(__op_code, __op_compile(__op_code, __op))
+del __op_code, __op
 ###
 
 ### Internal Functions
 
+def __byte(hi, lo):             # combine two 4-bit fields into one byte
+    return (hi << 4) | lo
+
 def __dclen(lc):                # decode length-code to length
-    return h2i(lc) + 1
+    return lc + 1
 
 def __reg(r, offset = 0):       # register retriever
-    return GPR[ h2i(r) + offset - 16 ]
+    return GPR[ r + offset - 16 ]
 
 def __addr_reg(r):              # addressing register retriever
-    reg_num = h2i(r)
-    if reg_num:
-        return GPR[reg_num].addr()
+    if r:
+        return GPR[r].addr()
     else:
         return None
 
 def __pair(r):                  # even-odd pair registers retriever
-    indx = h2i(r)
+    indx = r
     if indx % 2 != 0:
         raise newSpecificationException()
     return RegisterPair(GPR[indx], GPR[indx + 1])
@@ -445,7 +740,7 @@ def __pair(r):                  # even-odd pair registers retriever
 def __addr(d, x, b):            # address retriever
     indx = __addr_reg(x) or 0
     base = __addr_reg(b) or 0
-    return Register(indx + base + h2i(d)).addr()
+    return Register(indx + base + d).addr()
 
 def __page(d, x, b, al = 4, offset = 0): # default to fullword boundary
     addr = __addr(d, x, b) + offset * al
@@ -504,7 +799,7 @@ def __deref(d, x, b, al = 4, offset = 0): # default to fullword boundary
 
 def __dump(d, b, size):
     base = __addr_reg(b) or 0
-    addr_start = h2i(d) + base
+    addr_start = d + base
     addr_end   = addr_start + size
     try:
         val = Memory.deref_storage(addr_start, addr_end)
@@ -512,8 +807,38 @@ def __dump(d, b, size):
         raise newProtectionException()
     return val
 
-def __mask(m):
-    return listify_mask(m)
+def __span(d, x, b, size, al = 1):
+    '''
+    return the position of D(X,B) in the flat storage of Memory, making
+    sure all pages covering [ D(X,B), D(X,B) + size ) are allocated
+    '''
+    addr = __addr(d, x, b)
+    if addr % al != 0:
+        raise newSpecificationException()
+    for pg_i in range(addr / 4096, (addr + size - 1) / 4096 + 1):
+        if pg_i not in Memory._pool_allocated:
+            raise newProtectionException()
+    return addr - Memory._storage_pos
+
+def __fetch(d, x, b, size, al = 1):
+    pos = __span(d, x, b, size, al)
+    return str(Memory._storage[pos : pos + size])
+
+def __store(d, x, b, data, al = 1):
+    pos = __span(d, x, b, len(data), al)
+    addr_s = pos + Memory._storage_pos
+    addr_e = addr_s + len(data)
+    while addr_s < addr_e:      # notify the watcher of each page touched
+        page = Memory._pool_allocated[addr_s / 4096]
+        length = min(addr_e, (addr_s / 4096 + 1) * 4096) - addr_s
+        if page.watcher:
+            page.watcher(page, addr_s % 4096, length)
+        addr_s += length
+    Memory._storage[pos : pos + len(data)] = data
+    return len(data)
+
+def __mask(m):                  # convert a 4-bit mask to an index list
+    return [ i for i in range(4) if m & (0b1000 >> i) ]
 
 
 def __br(mask, addr):
@@ -550,8 +875,127 @@ def __tst_bit(val_l, val_r):
     return SPR['PSW'].CC
 
 
+## storage-to-storage operation
+
+__SS_ACTION_ = {                # bitwise actions of NC / OC / XC
+    'N' : lambda val_l, val_r : val_l & val_r,
+    'O' : lambda val_l, val_r : val_l | val_r,
+    'X' : lambda val_l, val_r : val_l ^ val_r,
+    }
+
+def __mvc(d1, b1, d2, b2, l):
+    pos_1 = __span(d1, 0, b1, l)
+    pos_2 = __span(d2, 0, b2, l)
+    if pos_2 < pos_1 < pos_2 + l:
+        # destructive overlap; moving byte by byte replicates the leading
+        # (pos_1 - pos_2) bytes of the 2nd operand through the 1st operand
+        data = Memory._storage[pos_2 : pos_1] * (l / (pos_1 - pos_2) + 1)
+        data = data[:l]
+    else:
+        data = Memory._storage[pos_2 : pos_2 + l]
+    return __store(d1, 0, b1, data)
+
+def __refmod_ss(d1, b1, d2, b2, l, action):
+    pos_1 = __span(d1, 0, b1, l)
+    pos_2 = __span(d2, 0, b2, l)
+    if pos_2 < pos_1 < pos_2 + l:
+        # destructive overlap; have to go byte by byte
+        func = __SS_ACTION_[action]
+        buff = Memory._storage[pos_2 : pos_1 + l]
+        offset = pos_1 - pos_2
+        for indx in range(l):
+            buff[offset + indx] = func(buff[offset + indx], buff[indx])
+        data = buff[offset:]
+    else:
+        # operate on the whole operands as (big) integers
+        value = __SS_ACTION_[action](
+            int(b2a_hex(Memory._storage[pos_1 : pos_1 + l]), 16),
+            int(b2a_hex(Memory._storage[pos_2 : pos_2 + l]), 16)
+            )
+        data = bytearray(a2b_hex('{0:0>{1}x}'.format(value, l * 2)))
+    __store(d1, 0, b1, data)
+
+    SPR['PSW'].CC = int(any(data))
+    return SPR['PSW'].CC
+
+def __cmp_ss(d1, b1, d2, b2, l):
+    pos_1 = __span(d1, 0, b1, l)
+    pos_2 = __span(d2, 0, b2, l)
+    val_l = Memory._storage[pos_1 : pos_1 + l] # compared as unsigned bytes
+    val_r = Memory._storage[pos_2 : pos_2 + l]
+    if val_l == val_r:
+        SPR['PSW'].CC = 0
+    elif val_l < val_r:
+        SPR['PSW'].CC = 1
+    else:
+        SPR['PSW'].CC = 2
+    return SPR['PSW'].CC
+
+def __tr_table(d, b, field):
+    '''
+    fetch the translation table at D(B) for the bytes in the field; only
+    the part of the table that is actually referenced is accessed
+
+    return None if the referenced part is not entirely available, in
+    which case the caller should go byte by byte for the exact exception
+    '''
+    indx_s = ord(min(field))
+    indx_e = ord(max(field)) + 1
+    try:
+        table = __fetch(d + indx_s, 0, b, indx_e - indx_s)
+    except zPException:
+        return None
+    return '{0}{1}{2}'.format(
+        '\0' * indx_s, table, '\0' * (256 - indx_e)
+        )
+
+def __tr(d1, b1, d2, b2, l):
+    pos_1 = __span(d1, 0, b1, l)
+    pos_2 = __addr(d2, 0, b2) - Memory._storage_pos
+    field = str(Memory._storage[pos_1 : pos_1 + l])
+    table = __tr_table(d2, b2, field)
+    if table == None  or  pos_2 - l < pos_1 < pos_2 + 256:
+        # table not available, or may overlap the field; go byte by byte
+        tr_val_gen_func = lambda tr_index : __deref(d2, 0, b2, 1, tr_index)
+        return [ __refmod(d1, 0, b1, 'R', tr_val_gen_func, offset)
+                 for offset in range(l)
+                 ]
+    return __store(d1, 0, b1, field.translate(table))
+
+def __trt(d1, b1, d2, b2, l):
+    field = __fetch(d1, 0, b1, l)
+    table = __tr_table(d2, b2, field)
+    if table == None:
+        # table not available; go byte by byte for the exact exception
+        tr_val_gen_func = lambda tr_index : __deref(d2, 0, b2, 1, tr_index)
+        return [ __refmod(d1, 0, b1, 'T', tr_val_gen_func, offset,
+                          offset and SPR['PSW'].CC
+                          )     # skip translation if CC is non-zero
+                 for offset in range(l)
+                 ]
+    field = field.translate(table)
+    offset = l - len(field.lstrip('\0')) # offset of the 1st non-zero byte
+    if offset == l:             # all zeros, scan completed
+        SPR['PSW'].CC = 0
+        return SPR['PSW'].CC
+
+    addr = __addr(d1, 0, b1) + offset
+    for i in [ 4, 3, 2 ]:       # load offset into right-most 3 bytes of R1
+        GPR[1][i] = addr & 0xFF
+        addr  >>= 8
+    GPR[2][4] = ord(field[offset]) # insert tr value into right-most byte of R2
+    if offset == l - 1:
+        SPR['PSW'].CC = 2       # non-zero at the end of the scan field
+    else:
+        SPR['PSW'].CC = 1       # stop early
+    return SPR['PSW'].CC
+
+
 ## packed decimal operation
 
+def __dec(d, b, l):
+    return packed.to_int(__fetch(d, 0, b, l))
+
 def __cmp_dec(val_l, val_r):
     if val_l == val_r:
         SPR['PSW'].CC = 0
@@ -561,26 +1005,15 @@ def __cmp_dec(val_l, val_r):
         SPR['PSW'].CC = 2
     return SPR['PSW'].CC
 
-def __ref_dec(d, l, b, value, cc = True, ex = None):
+def __ref_dec(d, l, b, value, cc = True, minus = None):
     '''
-    value: result / (quotient, reminder)
-    cc:    True / False
-    ex:    None / L2 - required if value = (quotient, reminder)
+    value: result to be stored in D(L,B), truncated if overflow occurred
+    cc:    True / False - whether to set CC
+    minus: None / True / False - see `packed.to_packed()`
     '''
-    ex_action = 'M'             # will be ignored if ex == None
-    if isinstance(value, int) or isinstance(value, long):
-        val_str = '{0:0>{1}}'.format(i2p(value), l * 2)
-    elif not ex:
-        abort(-1, 'Error: zPE.base.core.cpu.__ref_dec(): invalid call.\n')
-    else:
-        val_str = '{0:0>{1}}{2:0>{3}}'.format(
-            i2p(value[0]), (l - ex) * 2, # store quotient in D1(L1-L2,B1)
-            i2p(value[1]), ex * 2        # store reminder in D1+L1-L2(L2,B2)
-            )
-        ex_action = 'D'
-    indx_s = len(val_str) / 2 - l
+    overflow = packed.overflow(value, l)
     if cc:                      # condition code is to be set
-        if indx_s:
+        if overflow:
             SPR['PSW'].CC = 3
         elif value > 0:
             SPR['PSW'].CC = 2
@@ -588,163 +1021,101 @@ def __ref_dec(d, l, b, value, cc = True, ex = None):
             SPR['PSW'].CC = 1
         else:
             SPR['PSW'].CC = 0
-    if ex:                      # exception is to be checked
-        if l <= ex:
-            raise newSpecificationException()
-        if ex_action == 'M':
-            if h2i(__dump(d,b,ex)):
-                raise newDataException()
-        if ex_action == 'D':
-            if ex > 8:
-                raise newSpecificationException()
-            if indx_s:
-                raise newDecimalDivideException()
-            
+
     # store back the new value
-    value = X_(val_str).dump()[0]
-    [ __ref(d, '0', b, value[offset], offset - indx_s)
-      for offset in range(indx_s, l)
-      ]
+    __store(d, 0, b, packed.to_packed(value, l, minus))
+
+    if overflow  and  SPR['PSW'].Program_mask & 0b0100 == 0b0100:
+        raise newDecimalOverflowException()
     return SPR['PSW'].CC
 
-def __shft_dec(d, b, l, shft_code, rounding):
-    val_str = __dump(d, b, l)
-    val_digit = val_str[:-1]
-    if not val_digit.isdigit():
+def __mul_dec(d1, l1, b1, d2, l2, b2):
+    if l2 > 8  or  l2 >= l1:
+        raise newSpecificationException()
+    field = __fetch(d1, 0, b1, l1)
+    value = packed.to_int(field) * __dec(d2, b2, l2)
+    if field[:l2].strip('\0'):  # multiplicand needs L2 bytes of leading 0s
         raise newDataException()
-    if val_str[-1] in 'FACE':
-        val_sign = 1
-    else:
-        val_sign = -1
-    val_len = len(val_digit)    # length of the digit string
+    return __ref_dec(d1, l1, b1, value, cc = False)
 
-    # (0 < l < 16)  =>  (0 < byte_cnt < 32)  =>  (0 < digit_cnt < 31)
-    buff = '{0:0>32}{1:0>32}'.format(val_digit, '') # val_32|zero_32
-    buff = buff[shft_code:] + buff[:shft_code]      # spin the circular array
+def __div_dec(d1, l1, b1, d2, l2, b2):
+    if l2 > 8  or  l2 >= l1:
+        raise newSpecificationException()
+    dividend = __dec(d1, b1, l1)
+    divisor  = __dec(d2, b2, l2)
+    if not divisor:
+        raise newDecimalDivideException()
+    # truncate toward zero; the reminder takes the sign of the dividend
+    ( quotient, reminder ) = divmod(abs(dividend), abs(divisor))
+    if packed.overflow(quotient, l1 - l2):
+        raise newDecimalDivideException()
+
+    # store quotient in D1(L1-L2,B1), reminder in D1+L1-L2(L2,B1)
+    __store(d1, 0, b1,
+            packed.to_packed(quotient, l1 - l2, (dividend < 0) != (divisor < 0))
+            + packed.to_packed(reminder, l2, dividend < 0)
+            )
+    return None
+
+def __shft_dec(d, b, l, shft_code, rounding):
+    value = __dec(d, b, l)
+    digit = abs(value)
+    shft_code &= 0x3F           # 6-bit signed shift amount
 
     overflow = False
-    if shft_code > 32:
-        # right shift, add rounding factor
-        val_str = '{0:0>{1}}'.format(int(buff[:33]) + rounding, val_len)[:-1]
-    else:
+    if shft_code < 32:
         # left shift, check overflow
-        val_str = buff[32 - val_len : 32]
-        if int(buff[32:]):      # zero_32 != all_zero, overflow occured
-            overflow = True
-
-    # determine and append sign digit
-    val = int(val_str) * val_sign
-    if val < 0:
-        val_str += 'D'
+        digit *= 10 ** shft_code
+        overflow = packed.overflow(digit, l)
     else:
-        val_str += 'C'
+        # right shift, add rounding factor to the last digit shifted out
+        digit = (digit / 10 ** (63 - shft_code) + rounding) / 10
+
+    # determine the sign; a zero result is positive, unless overflow occurred
+    minus = value < 0  and  ( digit  or  overflow )
+    if minus:
+        value = - digit
+    else:
+        value = digit
 
     # set CC
     if overflow:
         SPR['PSW'].CC = 3
-    elif val > 0:
+    elif value > 0:
         SPR['PSW'].CC = 2
-    elif val < 0:
+    elif value < 0:
         SPR['PSW'].CC = 1
     else:
         SPR['PSW'].CC = 0
 
     # store back the new value
-    value = X_(val_str).dump()[0]
-    [ __ref(d, '0', b, value[offset], offset)
-      for offset in range(l)
-      ]
+    __store(d, 0, b, packed.to_packed(value, l, minus))
+
+    if overflow  and  SPR['PSW'].Program_mask & 0b0100 == 0b0100:
+        raise newDecimalOverflowException()
     return SPR['PSW'].CC
 
 def __ed(pttn_disp, pttn_base, ed_len, src_disp, src_base, mark_reg = None):
-    significance_indicator = False
-    num_sign = 0                # for CC calculation
-
-    fill = __deref(pttn_disp, '0', pttn_base, 1, 0)
-    if fill not in [ 0x20, 0x21 ]:
-        indx_s = 1
+    pttn = bytearray(__fetch(pttn_disp, 0, pttn_base, ed_len))
+    if mark_reg:
+        addr = __addr(pttn_disp, 0, pttn_base)
+        mark = lambda offset: GPR[mark_reg].load(addr + offset)
     else:
-        indx_s = 0
-
-    src_field_swap = {
-        'buff'   : '',          # buffer for src field
-        'offset' : 0,           # offset for src field
-        'digit'  : False,       # whether encountered any digit (digit-check)
-        }
-    def get_next_src_digit(look_ahead = False):
-        if not src_field_swap['buff']:
-            # no buffered src digits, read next byte
-            src_field_swap['buff'] = '{0:0>2}'.format(i2h(__deref(
-                        src_disp, '0', src_base, 1, src_field_swap['offset']
-                        )))
-            src_field_swap['offset'] += 1
-        rv = src_field_swap['buff'][0]
-        if not look_ahead:
-            src_field_swap['buff'] = src_field_swap['buff'][1:] # pop the digit
-            src_field_swap['digit'] = bool(src_field_swap['digit']  or  rv.isdigit())
-        return rv
-
-    for indx in range(indx_s, ed_len):
-        pttn = __deref(pttn_disp, '0', pttn_base, 1, indx)
-
-        if pttn in [ 0x20, 0x21 ]:
-            # digit selector / significance indicator
-
-            # get the next src digit
-            src_digit = get_next_src_digit()
-            if not src_digit.isdigit()  and  src_field_swap['digit']:
-                # end of current field
-                src_field_swap['digit'] = False # reset digit-check
-                significance_indicator  = False
-                num_sign = 0    # reset sign field
-                src_digit = get_next_src_digit()
-            if not src_digit.isdigit(): # still not digit -> invalid format
-                raise newDataException()
-            src_digit = int(src_digit)
-            if src_digit:
-                num_sign = 1    # mark as non-zero
-
-            if significance_indicator  or  src_digit:
-                __ref(pttn_disp, '0', pttn_base, 0xF0 + src_digit, indx)
-                if mark_reg  and  not significance_indicator:
-                    # from off to on, mark it if required
-                    GPR[mark_reg].load(__addr(pttn_disp,'0',pttn_base) + indx)
-                significance_indicator = True
-            else:
-                __ref(pttn_disp, '0', pttn_base, fill, indx)
-                if pttn == 0x21:
-                    significance_indicator = True
-
-            # check sign
-            if src_field_swap['buff'] and src_field_swap['buff'][0] in 'FACE':
-                significance_indicator = False # no sign printing for positive
+        mark = None
 
-        elif pttn == 0x22:
-            # field separator
-            __ref(pttn_disp, '0', pttn_base, fill, indx)
-            # do not reset digit-check
-            significance_indicator = False
-            num_sign = 0        # reset sign field
-
-        else:
-            # message character
-            if not significance_indicator:
-                __ref(pttn_disp, '0', pttn_base, fill, indx)
-
-    # get the next src digit
-    if significance_indicator:
-        num_sign = (- num_sign) # mark negative
-
-    if num_sign == 0:
-        SPR['PSW'].CC = 0
-    elif num_sign < 0:
-        SPR['PSW'].CC = 1
-    else:
-        SPR['PSW'].CC = 2
+    try:
+        SPR['PSW'].CC = packed.edit(
+            pttn,
+            lambda offset: __deref(src_disp, 0, src_base, 1, offset),
+            mark
+            )
+    finally:
+        # store back the edited pattern, even if the edit is interrupted
+        __store(pttn_disp, 0, pttn_base, pttn)
     return SPR['PSW'].CC
 
-def __chk_dec(val, al):
-    val = p2i(i2h(val)) # raise data exception if cannot convert to int
+def __chk_dec(field):
+    val = packed.to_int(field)  # raise data exception if invalid
     try:
         F_(val)         # validate value range
     except:
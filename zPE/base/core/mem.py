@@ -8,7 +8,7 @@ from zPE.util.global_config import *
 from zPE.util.excptn import *
 
 import re
-from ctypes import *            # for Union and C-Style array
+from binascii import a2b_hex, b2a_hex
 from struct import *            # for pack and unpack
 
 
@@ -19,11 +19,10 @@ _CONV_ = {                      # converter for big endian int
     'dw' : Struct('>Q'),        # for double word
     }
 
-class _BYTE_(Union):
-    _fields_ = [
-        ('char', c_char),
-        ('int8', c_ubyte)
-        ]
+_DUMP_CHAR_ = ''.join([         # translation table for the char view of dumps
+        re.sub(r'[^ A-Z0-9]', '.', chr(i).decode('EBCDIC-CP-US')) # hide
+        for i in range(256)                                       # binary
+        ]).encode('ascii')                                        # code
 ### End of Supporting Definition
 
 
@@ -32,24 +31,28 @@ class _BYTE_(Union):
 # IndexError:  invalid index value
 # ValueError:  invalid value
 # SyntaxError: invalid formatter
-class Page(Structure):
+class Page(object):
     '''
-    C-style Structure class
+    a 4K frame of the flat storage of `Memory`
     mainly for internal usage
     '''
-    _fields_ = [                # each page is 4K in size
-        ('bytes', c_ubyte * 4096) # C-style array
-        ]
+    # write watcher; if set, it is called as `watcher(page, pos, length)`
+    # right before [ pos, pos + length ) of the page get modified
+    # (used by zPE.base.core.cpu to invalidate its decoded instructions)
+    watcher = None
+
+    def __init__(self, buf, base):
+        self.buf  = buf         # the flat storage (bytearray) of the page
+        self.base = base        # position of the 1st byte of the page in buf
 
     def __getitem__(self, key):
         if isinstance(key, int) or isinstance(key, long):
-            return '{0:0>2}'.format(i2h(self.bytes[key]))
+            return '{0:0>2}'.format(i2h(self.buf[self.base + key]))
         else: # slice
-            (in_s, in_e, step) = key.indices(len(self.bytes))
-            rv = []
-            for indx in range(in_s, in_e):
-                rv.append('{0:0>2}'.format(i2h(self.bytes[indx])))
-            return ''.join(rv)
+            (in_s, in_e, step) = key.indices(4096)
+            return b2a_hex(
+                memoryview(self.buf)[self.base + in_s : self.base + in_e]
+                ).upper()
 
     def __setitem__(self, key, val):
         if isinstance(key, int) or isinstance(key, long):
@@ -74,11 +77,11 @@ class Page(Structure):
         # otherwise, alignment checking is performed first
         key = self.__range_of(pos, fmt)
 
-        # pack it to big endian, and convert it into a list of int
+        # pack it to big endian, directly into the storage
         val = _CONV_[fmt].pack(val)
-        val_list = self.__to_list(val)
-
-        self.__set_slice(key, val_list)
+        if self.watcher:
+            self.watcher(self, key.start, key.stop - key.start)
+        self.buf[self.base + key.start : self.base + key.stop] = val
 
 
     def retrieve(self, pos, fmt = 'fw'):
@@ -91,14 +94,13 @@ class Page(Structure):
 
         # if retrieving a single byte, no need to bit-reverse
         if fmt == 'bw':
-            return self.__get_char(pos) # early return
+            return self.buf[self.base + pos] # early return
 
         # otherwise, alignment checking is performed first
         key = self.__range_of(pos, fmt)
 
-        # convert the list of int into a packed number, and unpack it
-        val = self.__to_pack(self.__get_slice(key))
-        return _CONV_[fmt].unpack(val)[0]
+        # unpack it directly from the storage
+        return _CONV_[fmt].unpack_from(self.buf, self.base + key.start)[0]
 
 
     def dump(self, pos_s = 0, length = 4096): # default dump all
@@ -116,23 +118,16 @@ class Page(Structure):
 
         rv = []
         while True:
-            char_arr = ''
-            line = '{0:0>6}   '.format(i2h(pos_s))
-
-            for indx in range(0, 4):
-                line += self.__getitem__(slice(pos_s, pos_s + 4)) + ' '
-                char_arr += x2c(self.__getitem__(slice(pos_s, pos_s + 4)))
-                pos_s += 4
-            line += '   '
-            for indx in range(0, 4):
-                line += self.__getitem__(slice(pos_s, pos_s + 4)) + ' '
-                char_arr += x2c(self.__getitem__(slice(pos_s, pos_s + 4)))
-                pos_s += 4
-
-            rv.append('{0}  *{1}*\n'.format(
-                    line,
-                    re.sub(r'[^ A-Z0-9]', '.', char_arr) # hide binary code
+            line = self.buf[self.base + pos_s : self.base + pos_s + 32]
+            word = re.findall(r'.{8}', b2a_hex(line).upper())
+
+            rv.append('{0:0>6}   {1}    {2}   *{3}*\n'.format(
+                    i2h(pos_s),
+                    ' '.join(word[:4]),
+                    ' '.join(word[4:]),
+                    str(line).translate(_DUMP_CHAR_)
                     ))
+            pos_s += 32
 
             if pos_s >= pos_e:
                 return rv
@@ -157,47 +152,11 @@ class Page(Structure):
         return slice(pos, pos + align)
 
     # key:       int
-    # rv / val:  int
-    def __get_char(self, key):
-        return self.bytes[key]
+    # val:       int
     def __set_char(self, key, val):
-        self.bytes[key] = val
-
-    # key:       slice
-    # rv / val:  list of int
-    def __get_slice(self, key):
-        (in_s, in_e, step) = key.indices(len(self.bytes))
-        rv = []
-        for indx in range(in_s, in_e):
-            rv.append(self.bytes[indx])
-        return rv
-    def __set_slice(self, key, val):
-        (in_s, in_e, step) = key.indices(len(self.bytes))
-
-        if len(val) != in_e - in_s:
-            raise ValueError('{0}: Length not match with the key.'.format(val))
-
-        for indx in range(in_s, in_e):
-            self.bytes[indx] = val[indx - in_s]
-
-    # val:       packed int
-    # val_list:  list of int
-    def __to_pack(self, val_list):
-        sz = len(val_list)
-        val = ''
-        byte = _BYTE_()
-        for indx in range(0, sz):
-            byte.int8 = val_list[indx]
-            val += byte.char
-        return val
-    def __to_list(self, val):
-        sz = len(val)
-        val_list = []
-        byte = _BYTE_()
-        for indx in range(0, sz):
-            byte.char = val[indx]
-            val_list.append(byte.int8)
-        return val_list
+        if self.watcher:
+            self.watcher(self, key, 1)
+        self.buf[self.base + key] = val & 0xFF # truncate it like a C ubyte
 # end of Page class definition
 
 
@@ -208,8 +167,9 @@ class Memory(object):
         # ( loc_s, loc_e ) : Memory
         }
 
-    # the following 3 should be manipulated by Memory.[de]ref_page() only
-    _pool_available = [ ]
+    # the following 4 should be manipulated by Memory.[de]ref_page() only
+    _storage = bytearray()      # flat storage backing all allocated pages
+    _storage_pos = 0            # address of the 1st byte of the storage
     _pool_allocated = {
         # Page index : Page
         }
@@ -224,10 +184,8 @@ class Memory(object):
             page = Memory._pool_allocated[indx] # retrieve the allocated page
         else:
             Memory._page_ref_cnt[indx] = 1
-            if Memory._pool_available:
-                page = Memory._pool_available.pop() # get a released page
-            else:
-                page = Page() # allocate a new page
+            Memory.__cover(indx, indx + 1)
+            page = Page(Memory._storage, indx * 4096 - Memory._storage_pos)
             Memory._pool_allocated[indx] = page
         return page
 
@@ -235,9 +193,51 @@ class Memory(object):
     def deref_page(indx):
         Memory._page_ref_cnt[indx] -= 1
         if not Memory._page_ref_cnt[indx]:
-            Memory._pool_available.append(Memory._pool_allocated[indx])
             del Memory._pool_allocated[indx]
             del Memory._page_ref_cnt[indx]
+            # like a real frame, the content is left as it is in the storage
+
+    @staticmethod
+    def view(loc_s, loc_e):
+        '''
+        return a memoryview of [ loc_s, loc_e ) of the flat storage; the
+        range must be within a single allocation
+
+        note: the view is only valid till the next allocation, which may
+              move the storage
+        '''
+        for key in Memory.allocation:
+            if key[0] <= loc_s <= loc_e <= key[1]:
+                return memoryview(Memory._storage)[
+                    loc_s - Memory._storage_pos : loc_e - Memory._storage_pos
+                    ]
+        raise MemoryError('Access denied: specific memory not available.')
+
+    @staticmethod
+    def __cover(page_s, page_e):
+        '''extend the flat storage (if needed) to cover [ page_s, page_e )'''
+        loc_s = page_s * 4096
+        loc_e = page_e * 4096
+        if not Memory._storage:
+            Memory._storage = bytearray(loc_e - loc_s)
+            Memory._storage_pos = loc_s
+            return
+
+        old_s = Memory._storage_pos
+        old_e = Memory._storage_pos + len(Memory._storage)
+        if old_s <= loc_s  and  loc_e <= old_e:
+            return              # already covered
+
+        new_s = min(loc_s, old_s)
+        storage = bytearray(max(loc_e, old_e) - new_s)
+        storage[old_s - new_s : old_e - new_s] = Memory._storage
+        Memory._storage = storage
+        Memory._storage_pos = new_s
+
+        # re-base all allocated pages onto the new storage
+        for (indx, page) in Memory._pool_allocated.iteritems():
+            page.buf  = storage
+            page.base = indx * 4096 - new_s
 
     @staticmethod
     def is_available(loc_start, loc_end):
@@ -282,6 +282,7 @@ class Memory(object):
 
         # allocate the memory
         if Memory.is_available(self.min_pos, self.max_pos):
+            Memory.__cover(self.page_s, self.page_e) # extend storage at once
             self.memory = [ ]
             for i in range(self.page_s, self.page_e):
                 page = Memory.ref_page(i) # increment ref counter of page i
@@ -328,36 +329,46 @@ class Memory(object):
             if not self.l_bound <= addr_e < self.h_bound:
                 raise IndexError('ending address out of boundary!')
 
-        rv_list = self.__access(
-            addr_s,
-            addr_e,
-            with_func = lambda page_indx, pos, length, data:
-                self.memory[page_indx][pos : pos + length],
-            against_data = None
-            )
-        return ''.join(rv_list)
+        if addr_s >= addr_e:
+            return ''           # nothing need to be retrieved
+        # the range is contiguous in the flat storage; convert it at once
+        return b2a_hex(memoryview(Memory._storage)[
+                addr_s - Memory._storage_pos : addr_e - Memory._storage_pos
+                ]).upper()
 
     def __setitem__(self, key, hex_str):
         if not isinstance(key, int) and not isinstance(key, long):
             raise KeyError('{0}: Invalid key.'.format(key))
         if len(hex_str) % 2 != 0:
             raise ValueError('Invalid hex string length.')
-        addr_s = key
+        try:
+            val = a2b_hex(hex_str)
+        except TypeError:
+            raise ValueError('{0}: Invalid hex string.'.format(hex_str))
+        self.write(key, val)
+
+    def write(self, addr_s, val):
+        '''
+        store the raw bytes (a string, bytearray, or memoryview) starting at
+        addr_s, without going through the hex string as `mem[addr_s] = ...`
+        '''
         if addr_s < 0:      # handle negative index
             addr_s += self.h_bound
         if not self.l_bound <= addr_s < self.h_bound:
             raise IndexError('address out of boundary!')
-        addr_e = addr_s + len(hex_str) / 2
-
-        def setter(page_indx, pos, length, data):
-            for i in range(pos, pos + length):
-                self.memory[page_indx][i] = int(data.pop(0), 16)
-        self.__access(
-            addr_s,
-            addr_e,
-            with_func = setter,
-            against_data = [ hex_str[i:i+2] for i in range(0, len(hex_str), 2) ]
-            )
+        addr_e = addr_s + len(val)
+        if addr_e > self.h_bound:
+            raise IndexError('ending address out of boundary!')
+
+        def notify(page_indx, pos, length, data):
+            page = self.memory[page_indx]
+            if page.watcher:
+                page.watcher(page, pos, length)
+        self.__access(addr_s, addr_e, with_func = notify, against_data = None)
+
+        # the range is contiguous in the flat storage; copy it at once
+        pos = addr_s - Memory._storage_pos
+        Memory._storage[pos : pos + len(val)] = val
 
 
     def dump(self, addr_s, length = 32):
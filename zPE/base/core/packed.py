@@ -0,0 +1,165 @@
+# this is the definition and the implementation of Packed Decimals
+#
+# Note: all fields are strings of raw bytes taken directly from the
+#       storage; a field of L bytes holds (2 * L - 1) digits followed by
+#       a sign nibble
+
+from zPE.util.excptn import *
+
+from binascii import a2b_hex, b2a_hex
+
+
+### Supporting Tables
+_SIGN_ = {                      # sign nibble (as in b2a_hex()) -> sign
+    'a' : 1,  'c' : 1,  'e' : 1,  'f' : 1,
+    'b' : -1, 'd' : -1,
+    }
+
+_PLUS_ = (                      # nibble -> whether it is a plus sign
+    False, False, False, False, False, False, False, False,
+    False, False, True,  False, True,  False, True,  True,
+    )
+
+_LIMIT_ = [ 10 ** (2 * l - 1) for l in range(17) ] # field length -> 10^digits
+
+_ZONED_ = [                     # byte -> its two digits in zoned format
+    chr(0xF0 | (i >> 4)) + chr(0xF0 | (i & 0x0F)) for i in range(256)
+    ]
+
+_SWAP_ = [                      # byte -> the byte with its nibbles swapped
+    chr(((i & 0x0F) << 4) | (i >> 4)) for i in range(256)
+    ]
+### End of Supporting Definition
+
+
+def to_int(field):
+    '''
+    decode a packed decimal field into an integer
+
+    raise data exception if any digit or the sign is invalid
+    '''
+    hex_str = b2a_hex(field)
+    if not hex_str[:-1].isdigit()  or  hex_str[-1] not in _SIGN_:
+        raise newDataException()
+    return int(hex_str[:-1]) * _SIGN_[hex_str[-1]]
+
+def to_packed(value, l, minus = None):
+    '''
+    encode an integer into a packed decimal field of `l` bytes
+
+    only the right-most (2 * l - 1) digits are kept if the value does not
+    fit (see `overflow()`); `minus` forces the sign (for negative zeros)
+    '''
+    if minus == None:
+        minus = value < 0
+    if minus:
+        hex_str = '{0}d'.format(abs(value))
+    else:
+        hex_str = '{0}c'.format(abs(value))
+    return a2b_hex('{0:0>{1}}'.format(hex_str, l * 2)[- l * 2 :])
+
+def overflow(value, l):
+    '''test whether the value does not fit in a packed field of `l` bytes'''
+    return abs(value) >= _LIMIT_[l]
+
+
+def pack(field, l):
+    '''convert a zoned field into a packed field of `l` bytes'''
+    hex_str = b2a_hex(field)
+    hex_str = hex_str[1::2] + hex_str[-2] # low digits, then the zone of last
+    return a2b_hex('{0:0>{1}}'.format(hex_str, l * 2)[- l * 2 :])
+
+def unpack(field, l):
+    '''convert a packed field into a zoned field of `l` bytes'''
+    rv = ''.join([ _ZONED_[ord(ch)] for ch in field[:-1] ])
+    rv += _SWAP_[ord(field[-1])]
+    return '{0:\xF0>{1}}'.format(rv, l)[- l :]
+
+
+def edit(pttn, src, mark = None):
+    '''
+    edit the source digits into the pattern, as ED / EDMK do
+
+    pttn:  bytearray of the pattern; it is modified in place into the
+           result (the bytes before a failing digit remain edited)
+    src:   function that returns the byte at the given offset of the
+           source field; the source is read only as far as it is needed
+    mark:  None / function that is called with the offset of the result
+           byte where the significance indicator is turned on by a digit
+
+    return the condition code
+    '''
+    fill = pttn[0]
+    if fill == 0x20  or  fill == 0x21:
+        indx_s = 0              # the fill byte is also a digit selector
+    else:
+        indx_s = 1
+
+    significance = False        # significance indicator
+    non_zero = False            # any non-zero digit in the current field
+    in_field = False            # any digit encountered in the current field
+    src_offset = 0
+    low = None                  # right nibble of the current source byte
+
+    for indx in range(indx_s, len(pttn)):
+        pttn_byte = pttn[indx]
+
+        if pttn_byte == 0x20  or  pttn_byte == 0x21:
+            # digit selector / significance starter
+            if low == None:
+                byte = src(src_offset)
+                src_offset += 1
+                digit = byte >> 4
+                low = byte & 0x0F
+            else:
+                digit = low
+                low = None
+            if digit > 9  and  in_field:
+                # a sign ends the current field; go for the next digit
+                in_field = False
+                significance = False
+                non_zero = False
+                if low == None:
+                    byte = src(src_offset)
+                    src_offset += 1
+                    digit = byte >> 4
+                    low = byte & 0x0F
+                else:
+                    digit = low
+                    low = None
+            if digit > 9:      # still not digit -> invalid format
+                raise newDataException()
+            in_field = True
+            if digit:
+                non_zero = True
+
+            if significance  or  digit:
+                pttn[indx] = 0xF0 | digit
+                if mark  and  not significance:
+                    mark(indx)  # from off to on, mark it if required
+                significance = True
+            else:
+                pttn[indx] = fill
+                if pttn_byte == 0x21:
+                    significance = True
+
+            # check sign
+            if low != None  and  _PLUS_[low]:
+                significance = False # no sign printing for positive
+
+        elif pttn_byte == 0x22:
+            # field separator
+            pttn[indx] = fill
+            significance = False
+            non_zero = False    # do not reset the digit-check
+
+        elif not significance:
+            # message character
+            pttn[indx] = fill
+
+    if not non_zero:
+        return 0
+    elif significance:
+        return 1                # negative
+    else:
+        return 2
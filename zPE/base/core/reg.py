@@ -573,6 +573,15 @@ class PSW(object):
     def __getitem__(self, key):
         return ''.join(self.dump_bin())[key]
 
+    def trace_bits(self):
+        '''
+        return the integer value of bits 32-39 (ILC, CC, program mask in
+        BC mode); the same as `int(self[32:40], 2)`, but much cheaper
+        '''
+        if self.C == PSW_MODE['EC']:
+            return 0
+        return (self.ILC << 6) | (self.CC << 4) | self.Program_mask
+
 
     def set_mode(self, C):
         if C == PSW_MODE['EC']:
@@ -43,10 +43,11 @@ import zPE.base.core.SPOOL
 import zPE.base.core.asm as core_asm
 import zPE.base.core.mem
 
-import re
-from time import localtime, strftime
+import os, re
+import json
+from time import localtime, strftime, time
 from random import randint
-from binascii import a2b_hex
+from binascii import b2a_hex
 
 # relative import resource files
 from asma90_config import *   # read resource file for ASM config + rc
@@ -57,6 +58,9 @@ from asma90_macro_preprocessor import * # read recourse file for macro support
 # read recourse file for objmod specification
 from asma90_objmod_spec import REC_FMT as OBJMOD_REC, deck_id as OBJMOD_SEQ
 
+# read recourse file for objmod cache
+from asma90_objmod_cache import asm_cache_key, asm_cache_load, asm_cache_dump
+
 
 FILE_CHK = [                    # files to be checked
     'SYSIN', 'SYSPRINT', 'SYSLIN', 'SYSUT1',
@@ -76,19 +80,80 @@ def init(step):
     # load the user-supplied PARM and config into the default configuration
     # asm_load_parm({
     #         })
+    asm_parse_parm(step.parm)
     asm_load_config({
             'MEM_POS' : randint(512*128, 4096*128) * 8, # random from 512K to 4M
             'REGION'  : step.region,
             })
 
+    asm_init_stats()
     while not spool.retrieve('SYSIN').empty():
-        rc = max(pass_1(), pass_2())
+        rc = assemble()
 
+        start = time()
         __PARSE_OUT()
+        STATS_TIME('listing', start)
         asm_init_res()          # release resources
 
         if rc >= RC['ERROR']:
-            return rc
+            break
+    if asm_stats():
+        dump_stats(step)
+    return rc
+
+
+def assemble():
+    '''
+    assemble the next source in SYSIN, by running pass 1 and pass 2, or by
+    loading the result of the same source from the Object Module Cache
+
+    return the return code of the assembly
+    '''
+    spi = spool.retrieve('SYSIN')  # input SPOOL
+    spt = spool.retrieve('SYSUT1') # sketch SPOOL
+    spo = spool.retrieve('SYSLIN') # output SPOOL (object module)
+
+    key = asm_cache_key(spi)
+    if key:
+        entry = asm_cache_load(key[0])
+        if entry:
+            for indx in range(key[1]):
+                spi.pop(0)      # consume the source, as pass 1 would
+            asm_init_res()
+            asm_load_res(entry['res'])
+            TOKEN.clear()
+            TOKEN.update(entry['TOKEN'])
+            for rec in entry['SYSUT1']:
+                spt.push(rec)
+                STATEMENT.append(Statement(*rec))
+            for rec in entry['SYSLIN']:
+                spo.push(rec)
+            STATS_COUNT('cache_hit')
+            __COUNT_STATS()
+            return entry['rc']
+
+    TOKEN.clear()
+
+    spt_start = len(spt)
+    spo_start = len(spo)
+    start = time()
+    rc = pass_1()
+    STATS_TIME('pass_1', start)
+    start = time()
+    rc = max(rc, pass_2())
+    STATS_TIME('pass_2', start)
+
+    if key  and  not macro_time_used():
+        asm_cache_dump(key[0], {
+                'rc'     : rc,
+                'res'    : asm_save_res(),
+                'TOKEN'  : TOKEN,
+                'SYSUT1' : [ ( spt[i], spt.deck_id(i), )
+                             for i in range(spt_start, len(spt)) ],
+                'SYSLIN' : [ ( spo[i], spo.deck_id(i), )
+                             for i in range(spo_start, len(spo)) ],
+                })
+    __COUNT_STATS()
     return rc
 
 
@@ -99,12 +164,9 @@ def pass_1():
     if spi.empty():
         raise EOFError('No Assembler Code Offered.')
     asm_init_res()              # initialize resources
-
-# Macro parsing are currently disabled.
-#
-#    macro_init()                # load and init macro engine
-#    macro_parse(spi)            # pre-process macro
-#
+    __CLEAR_CACHE()             # clear the operand caches
+    macro_init()                # load and init macro engine
+    macro_parse(spi)            # pre-process macro
 
     addr = 0                    # program counter
     org_addr = 0                # back-up program counter for ORG
@@ -134,7 +196,8 @@ def pass_1():
         ( line, deck_id ) = spi.pop(0)
         line_num += 1                  # start at line No. 1
 
-        field = resplit_sq(r'\s+', line[:-1], 3)
+        stmt  = Statement(line, deck_id)
+        field = stmt.field
 
         # check Macro definition
         if len(field) > 1 and field[1] == 'MACRO':
@@ -143,24 +206,24 @@ def pass_1():
             # skip all lines until the end flag encountered
             if len(field) > 1 and field[1] == skip_until:
                 skip_until = None
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
             continue
 
         # skip comment, EJECT
         if ( line[0] == '*'  or
              (len(field) > 1 and field[1] in [ 'EJECT', ])
              ):
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
             continue
 
         # check SPACE
         elif len(field) > 1 and field[1] == 'SPACE':
             if len(field) > 2  and  not field[2].isdigit():
-                indx_s = resplit_index(line, field, 2)
+                indx_s = stmt.column(2)
                 __INFO('S', line_num,
                        (180, indx_s, None,)
                        )
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
             continue
 
 
@@ -174,7 +237,7 @@ def pass_1():
             __INFO('E', line_num, ( 142, 9, None, ))
 
             MNEMONIC[line_num] = [ scope.id(), addr, ]          # type 2
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
             continue
         # end of checks
 
@@ -184,19 +247,19 @@ def pass_1():
             if ( len(field[2]) < 3  or # at least 1 char + 2 "'"
                  field[2][0] != "'"    # not start with "'"
                  ):
-                indx_s = resplit_index(line, field, 2)
+                indx_s = stmt.column(2)
                 __INFO('W', line_num,
                        (163, indx_s, None,)
                        )
             elif "'" in field[2][1:-1]: # "'" in the content
-                indx_s = ( resplit_index(line, field, 2) +
+                indx_s = ( stmt.column(2) +
                            field[2][1:-1].index("'") + 1
                            )
                 __INFO('W', line_num,
                        (163, indx_s, None,)
                        )
             elif field[2][-1] != "'":
-                indx_s = resplit_index(line, field, 2) + len(field[2])
+                indx_s = stmt.column(2) + len(field[2])
                 __INFO('W', line_num,
                        (163, indx_s, None,)
                        )
@@ -209,7 +272,7 @@ def pass_1():
                 TITLE.append([ line_num, field[0], field[2][1:-1] ])
 
             MNEMONIC[line_num] = [  ]                           # type 0
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
         # parse CSECT/DSECT
         elif field[1] in [ 'CSECT', 'DSECT', ]:
@@ -226,19 +289,19 @@ def pass_1():
             org_addr = min(addr, org_addr) # update backup
 
             MNEMONIC[line_num] = [ scope.id(), addr, ]          # type 2
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
         # parse USING
         elif field[1] == 'USING':
             # actual parsing in pass 2
             MNEMONIC[line_num] = [ scope.id(), ]                # type 1 **
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
         # parse DROP
         elif field[1] == 'DROP':
             # actual parsing in pass 2
             MNEMONIC[line_num] = [ scope.id(), ]                # type 1
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
         # parse END
         elif field[1] == 'END':
@@ -248,7 +311,7 @@ def pass_1():
             if not eoflag:
                 # first time encounter END
                 eoflag = True
-                spt.push( ( line, deck_id, ) )
+                __SKETCH(spt, stmt)
                 # the scope ID of END is always None, and
                 # the location counter is always 0
                 MNEMONIC[line_num] = [ None, 0, ]               # type 2
@@ -271,6 +334,7 @@ def pass_1():
 
         # parse LTORG
         elif field[1] == 'LTORG':
+            start = time()
             # align boundary
             addr = (addr + 7) / 8 * 8
 
@@ -315,7 +379,8 @@ def pass_1():
                 line_num -= 1   # move back one line (since not LTORG)
             else:
                 MNEMONIC[line_num] = [ scope.id(), addr, ]      # type 2
-                spt.push( ( line, deck_id, ) )
+                __SKETCH(spt, stmt)
+            STATS_TIME('ltorg', start)
 
         # parse ORG
         elif field[1] == 'ORG':
@@ -324,7 +389,7 @@ def pass_1():
                 parsed_arg = __PARSE_ARG(field[2])
                 if isinstance(parsed_arg, int):
                     ( err_num, err_indx ) = __DECODE_ERRCODE(parsed_arg)
-                    indx_e = resplit_index(line, field, 2) + err_indx
+                    indx_e = stmt.column(2) + err_indx
                     __INFO(None, line_num, # let system determine err level
                            ( err_num, indx_e - 1, indx_e, )
                            )
@@ -332,7 +397,7 @@ def pass_1():
                        'eq_constant' in parsed_arg[1]  or  # or =constant
                        'symbol_candidate' in parsed_arg[1] # or undefined symbol
                        ):
-                    indx_s = resplit_index(line, field, 2)
+                    indx_s = stmt.column(2)
                     __INFO('E', line_num,
                            ( 32, indx_s, indx_s + len(field[2]), )
                            )
@@ -350,7 +415,7 @@ def pass_1():
                     addr = __REDUCE_EXP(parsed_arg, scope.id(), from_addr)
                     if addr < 0: # failed to reduce expression
                         addr = from_addr # restore old location counter
-                        indx_s = resplit_index(line, field, 2)
+                        indx_s = stmt.column(2)
                         __INFO('E', line_num,
                                ( 32, indx_s, indx_s + len(field[2]), )
                                )
@@ -361,7 +426,7 @@ def pass_1():
             MNEMONIC[line_num] = [                              # type 5
                 scope.id(), from_addr, None, from_addr, addr
                 ]
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
         # parse EQU
         elif field[1] == 'EQU':
@@ -393,7 +458,7 @@ def pass_1():
                                    None, # need info
                                    equ_addr,
                                    ]
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
         # parse DC/DS/=constant
         elif field[1] in [ 'DC', 'DS' ] or field[1][0] == '=':
@@ -401,7 +466,7 @@ def pass_1():
                 tmp = field[1][1:]
             else:
                 if len(field) < 3  or  not field[2]:
-                    indx_s = ( resplit_index(line, field, 1) +
+                    indx_s = ( stmt.column(1) +
                                len(field[1]) + 1
                                )
                     __INFO('S', line_num,
@@ -410,7 +475,7 @@ def pass_1():
                     MNEMONIC[line_num] = [                      # type 3
                         scope.id(), addr, None,
                         ]
-                    spt.push( ( line, deck_id, ) )
+                    __SKETCH(spt, stmt)
                     continue
                 tmp = field[2]
             try:
@@ -453,7 +518,7 @@ def pass_1():
                 MNEMONIC[line_num] = [                          # type 3
                     scope.id(), addr, None,
                     ]
-                spt.push( ( line, deck_id, ) )
+                __SKETCH(spt, stmt)
                 continue
 
             # align boundary if needed
@@ -465,12 +530,12 @@ def pass_1():
             # check =constant
             if field[1][0] == '=':
                 if not const_left:
-                    indx_s = resplit_index(line, field, 1)
+                    indx_s = stmt.column(1)
                     __INFO('E', line_num,
                            ( 141, indx_s, indx_s + len(field[1]), )
                            )
                     MNEMONIC[line_num] = [ scope.id(), ]        # type 1
-                    spt.push( ( line, deck_id, ) )
+                    __SKETCH(spt, stmt)
                     continue
 
                 if field[1] in SYMBOL_EQ:
@@ -564,7 +629,7 @@ def pass_1():
                 abort(91, 'Error: ', field[2],
                       ': Cannot evaluate the constant.\n')
             MNEMONIC[line_num] = [ scope.id(), addr, sd_info, ] # type 3
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
             # update address
             addr += sd_info[1] * sd_info[3]
@@ -578,12 +643,12 @@ def pass_1():
                 # no argument offered
                 argv = []
                 argc = 0
-                argv_indx = resplit_index(line, field, 1) + len(field[1]) + 1
+                argv_indx = stmt.column(1) + len(field[1]) + 1
             else:
                 # has argument(s), get the count
-                argv = resplit(',', field[2], ['(',"'"], [')',"'"])
+                argv = stmt.args()
                 argc = len(argv)
-                argv_indx = resplit_index(line, field, 2)
+                argv_indx = stmt.column(2)
 
             if core_asm.valid_pseudo(field[1]):
                 op_code = core_asm.get_op_from(field[1], argc)
@@ -704,7 +769,7 @@ def pass_1():
             MNEMONIC[line_num] = [ scope.id(), addr,            # type 5
                                    op_code, op_addr[1], op_addr[2],
                                    ]
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
 
             # update address
             length = 0
@@ -717,14 +782,15 @@ def pass_1():
 
         # parse macro call
         elif field[1] in MACRO_DEF:
-            mark4future('Macro Expansion')
+            # already expanded by macro_parse(); list it like a comment
+            __SKETCH(spt, stmt)
 
         # unrecognized op-code
         else:
-            indx_s = resplit_index(line, field, 1)
+            indx_s = stmt.column(1)
             __INFO('E', line_num, ( 57, indx_s, indx_s + len(field[1]), ))
             MNEMONIC[line_num] = [ scope.id(), ]                # type 1
-            spt.push( ( line, deck_id, ) )
+            __SKETCH(spt, stmt)
     # end of main read loop
 
     # remove left-over DSECT from the ESD-index table
@@ -869,8 +935,6 @@ def pass_1():
 
 
 def pass_2():
-    spi = spool.retrieve('SYSUT1') # sketch SPOOL (main input)
-
     # obtain memory for generating Object Module
     mem = zPE.base.core.mem.Memory(ASM_CONFIG['MEM_POS'], ASM_CONFIG['MEM_LEN'])
 
@@ -885,8 +949,8 @@ def pass_2():
     # append it to ESD records
     __APPEND_ESD([ ESD_ID[1], ESD[ESD_ID[1]][0] ]) # append first ESD entry
 
-    # main read loop
-    for line in spi:
+    # main read loop; the Statement Table mirrors the sketch SPOOL
+    for stmt in STATEMENT:
         line_num += 1
         if line_num not in MNEMONIC  or  len(MNEMONIC[line_num]) == 0:
             # comment, EJECT, SPACE  or      TITLE statement
@@ -912,7 +976,7 @@ def pass_2():
             pos_start  = addr
             pos_end    = None
 
-        field = resplit_sq(r'\s+', line[:-1], 3)
+        field = stmt.field
 
         # skip lines that handled in the first pass
         if len(field) < 2 or len(field[1]) == 0:
@@ -938,12 +1002,12 @@ def pass_2():
             if len(field[0]) != 0:
                 mark4future('Labeled USING')
             if len(field) < 3:
-                indx_s = resplit_index(line, field, 1) + len(field[1]) + 1
+                indx_s = stmt.column(1) + len(field[1]) + 1
                                                                 # +1 for ' '
                 __INFO('S', line_num, ( 40, indx_s, None, ))
             else:
-                args = resplit(',', field[2], ['(',"'"], [')',"'"])
-                args_indx = resplit_index(line, field, 2)
+                args = stmt.args()
+                args_indx = stmt.column(2)
 
                 # check 1st argument
                 sub_args = re.split(',', args[0])
@@ -973,7 +1037,7 @@ def pass_2():
                             abort(92, 'Error: ', args[0],
                                   ': Label or Location Counter Required.\n')
                         elif num_sym + num_loc > 1:
-                            indx_s = args_indx + resplit_index(field[2], args, 0)
+                            indx_s = args_indx + stmt.arg_column(0)
                             __INFO('E', line_num,
                                    ( 32, indx_s, indx_s + len(args[0]), )
                                    )
@@ -998,13 +1062,13 @@ def pass_2():
                             using_scope = SYMBOL[lbl_8].id
                         if not INFO_GE(line_num, 'E') and using_value < 0:
                             # failed to reduce expression
-                            indx_s = args_indx + resplit_index(field[2], args, 0)
+                            indx_s = args_indx + stmt.arg_column(0)
                             __INFO('E', line_num,
                                    ( 32, indx_s, indx_s + len(args[0]), )
                                    )                            
                 else:
                     if len(sub_args) != 2:
-                        indx_s = args_indx + resplit_index(field[2], args, 0)
+                        indx_s = args_indx + stmt.arg_column(0)
                         __INFO('S', line_num, (
                                 178,
                                 indx_s + args[0].index(sub_args[2]),
@@ -1040,14 +1104,14 @@ def pass_2():
                     abs_value = __REDUCE_EXP(parsed_arg, scope_id, addr)
 
                     if not 0 <= abs_value < GPR_NUM:
-                        indx_s = args_indx + resplit_index(field[2], args, indx)
+                        indx_s = args_indx + stmt.arg_column(indx)
                         __INFO('E', line_num,
                                ( 29, indx_s, indx_s + len(args[indx]), )
                                )
                         break
                     if abs_value in arg_list:
                         indx_s = ( args_indx +
-                                   resplit_index(field[2], args, indx-1) +
+                                   stmt.arg_column(indx-1) +
                                    len(args[indx-1]) +
                                    1 # +1 for ','
                                    )
@@ -1076,7 +1140,7 @@ def pass_2():
                     'ORDINARY', using_value, range_limit, using_scope,
                     0, '{0:>5}'.format(''), field[2]
                     )
-                ACTIVE_USING[arg_list[1]] = line_num # start domain of USING
+                ACTIVATE_USING(arg_list[1], line_num) # start domain of USING
 
                 for indx in range(2, len(args)):
                     USING_MAP[line_num, arg_list[indx]] = Using(
@@ -1086,15 +1150,15 @@ def pass_2():
                         range_limit, using.id,
                         0, '{0:>5}'.format(''), ''
                         )
-                    ACTIVE_USING[arg_list[indx]] = line_num
+                    ACTIVATE_USING(arg_list[indx], line_num)
             # "upgrade" USING
             MNEMONIC_LOC[line_num] = using_value  # record USING location
 
         # parse DROP
         elif field[1] == 'DROP':
             # update using map
-            args = resplit(',', field[2], ['(',"'"], [')',"'"])
-            args_indx = resplit_index(line, field, 2)
+            args = stmt.args()
+            args_indx = stmt.column(2)
 
             for indx in range(len(args)):
                 parsed_arg = __PARSE_ARG(args[indx])
@@ -1116,13 +1180,13 @@ def pass_2():
                 abs_value = __REDUCE_EXP(parsed_arg, scope_id, addr)
 
                 if not 0 <= abs_value < GPR_NUM:
-                    indx_s = args_indx + resplit_index(field[2], args, indx)
+                    indx_s = args_indx + stmt.arg_column(indx)
                     __INFO('E', line_num,
                            ( 29, indx_s, indx_s + len(args[indx]), )
                            )
                     continue
                 if abs_value in ACTIVE_USING:
-                    del ACTIVE_USING[abs_value] # end domain of USING
+                    DROP_USING(abs_value) # end domain of USING
                     # check reference
                     lbl_8 = '{0:<8}'.format(args[indx])
                     if lbl_8 in SYMBOL  and  SYMBOL[lbl_8].type == 'U':
@@ -1132,7 +1196,7 @@ def pass_2():
                     else:
                         __REF_SYMBOL_IN(parsed_arg, scope_id, line_num)
                 else:
-                    indx_s = args_indx + resplit_index(field[2], args, indx)
+                    indx_s = args_indx + stmt.arg_column(indx)
                     __INFO('W', line_num,
                            ( 45, indx_s, indx_s + len(args[indx]), )
                            )
@@ -1146,7 +1210,7 @@ def pass_2():
                         '{0:>4}{1}'.format(line_num, '')
                         )
                 else:
-                    indx_s = resplit_index(line, field, 2)
+                    indx_s = stmt.column(2)
                     __INFO('E', line_num,
                            ( 44, indx_s, indx_s + len(field[2]), )
                            )
@@ -1173,10 +1237,10 @@ def pass_2():
 
             if field[1][0] == '=':
                 arg_str  = field[1][1:]
-                arg_indx = resplit_index(line, field, 1) + 1
+                arg_indx = stmt.column(1) + 1
             else:
                 arg_str  = field[2]
-                arg_indx = resplit_index(line, field, 2)
+                arg_indx = stmt.column(2)
             sd_info = core_asm.parse_sd(arg_str)
             # already done once in pass 1, no need for try-catching
 
@@ -1506,11 +1570,11 @@ def pass_2():
             op_args = core_asm.op_arg_indx(op_code)
 
             if op_args:
-                args = resplit(',', field[2], ['(',"'"], [')',"'"])
-                args_indx = resplit_index(line, field, 2)
+                args = stmt.args()
+                args_indx = stmt.column(2)
             else:
                 args = ()       # skip argument parsing
-                args_indx = resplit_index(line, field, 1) + len(field[1]) + 1
+                args_indx = stmt.column(1) + len(field[1]) + 1
             if len(op_args) != len(args):
                 continue        # should be processed in pass 1
 
@@ -1524,7 +1588,7 @@ def pass_2():
 
                 if isinstance(parsed_arg, int):
                     indx_s = ( args_indx +
-                               resplit_index(field[2], args, lbl_i)
+                               stmt.arg_column(lbl_i)
                                )
                     ( err_num, err_indx ) = __DECODE_ERRCODE(parsed_arg)
 
@@ -1542,7 +1606,7 @@ def pass_2():
                 elif 'symbol_candidate' in parsed_arg[1]:
                     err_indx = parsed_arg[1].index('symbol_candidate')
                     indx_s = ( args_indx +
-                               resplit_index(field[2], args, lbl_i) +
+                               stmt.arg_column(lbl_i) +
                                lbl.index(parsed_arg[0][err_indx])
                                )
                     __INFO('E', line_num, (
@@ -1557,7 +1621,7 @@ def pass_2():
                     # absolute address found, check length
                     if not 0x0 <= abs_values[0] <= 0xFFF:
                         indx_s = ( args_indx +
-                                   resplit_index(field[2], args, lbl_i)
+                                   stmt.arg_column(lbl_i)
                                    )
                         indx_e = indx_s + len(''.join(parsed_arg[0][:-1]))
                         __INFO('E', line_num, ( 28, indx_s, indx_e, ))
@@ -1585,7 +1649,7 @@ def pass_2():
                         if len(parsed_arg[0][-1]) > 1:
                             indx_e = (
                                 args_indx +
-                                resplit_index(field[2], args, lbl_i) +
+                                stmt.arg_column(lbl_i) +
                                 len(lbl)
                                 )
                             indx_s = indx_e - len(
@@ -1619,7 +1683,7 @@ def pass_2():
                         if not 0 <= abs_values[i] < GPR_NUM:
                             indx_s = (
                                 args_indx +
-                                resplit_index(field[2], args, lbl_i) +
+                                stmt.arg_column(lbl_i) +
                                 1 # +1 for '('
                                 )
                             __INFO('E', line_num,
@@ -1659,7 +1723,7 @@ def pass_2():
                     else:
                         indx_s = (
                             args_indx +
-                            resplit_index(field[2], args, lbl_i) +
+                            stmt.arg_column(lbl_i) +
                             1 # +1 for '('
                             )
                         __INFO('E', line_num,
@@ -1711,7 +1775,7 @@ def pass_2():
                                 if chk_item[curr_lvl] == 'symbol':
                                     indx_s = (
                                         args_indx +
-                                        resplit_index(field[2], args, lbl_i)
+                                        stmt.arg_column(lbl_i)
                                         )
                                     __INFO('E', line_num,
                                            ( 32, indx_s, indx_s + len(lbl), )
@@ -1817,7 +1881,7 @@ def pass_2():
 
                         if reloc_cnt > 1: # more than one relocatable symbol
                             indx_s = ( args_indx +
-                                       resplit_index(field[2], args, lbl_i)
+                                       stmt.arg_column(lbl_i)
                                        )
                             __INFO('E', line_num,
                                    ( 78, indx_s, indx_s + len(lbl), )
@@ -1922,7 +1986,7 @@ def pass_2():
                                 )
                     else:
                         indx_s = ( args_indx +
-                                   resplit_index(field[2], args, lbl_i)
+                                   stmt.arg_column(lbl_i)
                                    )
                         __INFO('E', line_num,
                                ( 34, indx_s, indx_s + len(lbl), )
@@ -1935,7 +1999,7 @@ def pass_2():
                     disp = __GUESS_DISP(op_code[op_args[lbl_i]])
                     if not op_code[op_args[lbl_i]].is_aligned(disp):
                         indx_s = ( args_indx +
-                                   resplit_index(field[2], args, lbl_i)
+                                   stmt.arg_column(lbl_i)
                                    )
                         if op_code[op_args[lbl_i]].type == 'R':
                             __INFO('E', line_num,
@@ -1967,6 +2031,12 @@ def pass_2():
             pass                # already handled in pass 1
     # end of main read loop
 
+    # append the last contiguous machine code (e.g. the constants allocated
+    # after END) to TXT records
+    __APPEND_TXT(mem, prev_scope, pos_start, pos_end)
+
+    start = time()
+
     # append leftover variable fields to ESD records
     __APPEND_ESD()
     # append data fields to RLD records
@@ -1974,6 +2044,7 @@ def pass_2():
         for entry in RLD[pos_id, rel_id]:
             __APPEND_RLD(pos_id, rel_id, entry)
     __APPEND_RLD()        # append leftover data fields to RLD records
+    STATS_TIME('objmod', start)
 
 
     # check cross references table integrality
@@ -2000,7 +2071,9 @@ def pass_2():
 
     # generate object module if no error occured
     if rc_err <= RC['WARNING']:
+        start = time()
         obj_mod_gen() # write the object module into the corresponding SPOOL
+        STATS_TIME('objmod', start)
 
     mem.release()
     return rc_err
@@ -2012,10 +2085,8 @@ def obj_mod_gen():
     for rec_type in [ 'ESD', 'TXT', 'RLD', 'END', 'SYM' ]:
         deck.extend(OBJMOD[rec_type])
 
-    for rec in deck:
-        spo.append(a2b_hex( # compress object module into binary format
-                rec + OBJMOD_SEQ(TITLE[0], len(spo) + 1)
-                ))
+    for rec in deck:            # fill in the deck ID of each card image
+        spo.append(rec[:-8] + OBJMOD_SEQ(TITLE[0], len(spo) + 1))
 
     if debug_mode():
         obj_dump = zPE.base.core.SPOOL.new(
@@ -2027,69 +2098,111 @@ def obj_mod_gen():
         zPE.base.core.SPOOL.flush(obj_dump)
 
 
+def dump_stats(step):
+    '''
+    summarize the statistics of the assemblies of the step in JESYSMSG, and
+    write them into a JSON file under the stats directory
+    '''
+    sp3 = spool.retrieve('JESYSMSG') # SPOOL No. 03
+    ctrl = ' '
+
+    sp3.append(ctrl, 'ASMA01I {0:<8} PASS 1 {1:.3f}, PASS 2 {2:.3f}'.format(
+            step.name, STATS['time']['pass_1'], STATS['time']['pass_2']
+            ), ', LTORG {0:.3f}, OBJMOD {1:.3f}, LISTING {2:.3f} SEC\n'.format(
+            STATS['time']['ltorg'], STATS['time']['objmod'],
+            STATS['time']['listing']
+            ))
+    sp3.append(ctrl, 'ASMA02I {0:<8} {1} STATEMENTS, {2} SYMBOLS'.format(
+            step.name, STATS['count']['statement'], STATS['count']['symbol']
+            ), ', {0} USINGS, {1} LITERALS, {2} TXT, {3} RLD\n'.format(
+            STATS['count']['using'], STATS['count']['literal'],
+            STATS['count']['txt'], STATS['count']['rld']
+            ))
+
+    rv = {
+        'job'     : JCL['jobid'],
+        'step'    : step.name,
+        'program' : step.pgm,
+        'time'    : STATS['time'],
+        'count'   : STATS['count'],
+        }
+    if not os.path.isdir(CONFIG_PATH['stats']):
+        os.makedirs(CONFIG_PATH['stats'])
+    fp = open(os.path.join(
+            CONFIG_PATH['stats'],
+            '{0}.{1}.json'.format(JCL['jobid'], step.name)
+            ), 'w')
+    json.dump(rv, fp, indent = 2, sort_keys = True)
+    fp.close()
+
+
 ### Supporting Functions
+def __COUNT_STATS():
+    '''add the numbers of the assembly just done to the statistics'''
+    STATS_COUNT('source')
+    STATS_COUNT('statement', len(STATEMENT))
+    STATS_COUNT('symbol',    len(SYMBOL))
+    STATS_COUNT('using',     len(USING_MAP))
+    STATS_COUNT('literal',   sum([ len(v) for v in SYMBOL_EQ.itervalues() ]))
+    STATS_COUNT('txt',       len(OBJMOD['TXT']))
+    STATS_COUNT('rld',       len(OBJMOD['RLD']))
+
+def __SKETCH(spt, stmt):
+    '''write the statement into the sketch SPOOL and the Statement Table'''
+    spt.push( ( stmt.line, stmt.deck_id, ) )
+    STATEMENT.append(stmt)
+
 def __ADDRESSING(lbl, sect_lbl, ex_disp = 0):
     rv = [ 4096, None, -1, ]  # init to least priority USING (non-exsit)
-    eq_const = __HAS_EQ(lbl, ESD[sect_lbl][0].id)
-
-    for (k, v) in ACTIVE_USING.iteritems():
-        if __IS_IN_RANGE(lbl, ex_disp, USING_MAP[v,k], ESD[sect_lbl][0]):
-            if lbl[0] == '*':
-                disp = MNEMONIC[ int( lbl[1:] ) ][1] - USING_MAP[v,k].u_value
-            elif lbl[0] == '=':
-                disp = MNEMONIC[ eq_const.defn  ][1] - USING_MAP[v,k].u_value
-            else:
-                disp = MNEMONIC[SYMBOL[lbl].defn][1] - USING_MAP[v,k].u_value
-            disp += ex_disp
-            if ( ( disp < rv[0] )  or           # minimal displacement rule
-                 ( disp == rv[0] and k > rv[2]) # maximal register rule
-                 ):
-                rv = [ disp, (v, k), k, ]
+
+    k = __FIND_USING(lbl, ESD[sect_lbl][0], ex_disp)
+    if k != None:
+        v = ACTIVE_USING[k]
+        if lbl[0] == '*':
+            disp = MNEMONIC[ int( lbl[1:] ) ][1] - USING_MAP[v,k].u_value
+        elif lbl[0] == '=':
+            eq_const = __HAS_EQ(lbl, ESD[sect_lbl][0].id)
+            disp = MNEMONIC[ eq_const.defn  ][1] - USING_MAP[v,k].u_value
+        else:
+            disp = MNEMONIC[SYMBOL[lbl].defn][1] - USING_MAP[v,k].u_value
+        disp += ex_disp
+        if disp <= rv[0]:       # within the displacement limit
+            rv = [ disp, (v, k), k, ]
     return rv
 
 def __HAS_EQ(lbl, scope_id):
-    if lbl not in SYMBOL_EQ:
-        return None
-    for symbol in SYMBOL_EQ[lbl]:
-        if scope_id > 0  and  scope_id == symbol.id:
-            return symbol
-    return None                 # nor found
+    return SYMBOL_EQ_ID.get( ( lbl, scope_id, ) ) # None if not found
 
 def __IS_ADDRESSABLE(lbl, sect_lbl, ex_disp = 0):
     if (lbl[0] != '*') and (lbl not in SYMBOL) and (lbl not in SYMBOL_EQ):
         return False            # not an *, a symbol, nor a =constant
     if len(ACTIVE_USING) == 0:
         return False            # not in domain of any USING
-    for (k, v) in ACTIVE_USING.iteritems():
-        if __IS_IN_RANGE(lbl, ex_disp, USING_MAP[v,k], ESD[sect_lbl][0]):
-            return True
-    return False                # not in the range of any USING
-
-def __IS_IN_RANGE(lbl, ex_disp, using, csect):
-    u_range = min(
-        using.u_value + using.u_range, # ending addr of the USING
-        csect.addr + csect.length      # ending addr of the CSECT
-        )
-    eq_const = __HAS_EQ(lbl, csect.id)
-
+    return __FIND_USING(lbl, ESD[sect_lbl][0], ex_disp) != None
+
+def __FIND_USING(lbl, csect, ex_disp):
+    '''
+    return the register of the USING that addresses the label with the
+    smallest displacement (and the highest register number if tied), or
+    None if the label is not in the range of any USING
+    '''
     if lbl[0] == '*':
         # is loc_ptr, encoded disp
         disp = int(lbl[1:])
+        scope_id = '*'          # any scope
     elif lbl[0] == '=':
         # is =constant, retrieve definition location
-        disp = MNEMONIC[eq_const.defn][1]
+        disp = MNEMONIC[__HAS_EQ(lbl, csect.id).defn][1]
+        scope_id = '*'          # any scope
     elif SYMBOL[lbl].type != 'U':
         # is symbol, retrieve definition location
-        if using.u_id != MNEMONIC[SYMBOL[lbl].defn][0]:
-            return False
-        disp = MNEMONIC[SYMBOL[lbl].defn][1]
+        ( scope_id, disp ) = MNEMONIC[SYMBOL[lbl].defn][:2]
     else:
-        return False
+        return None
 
-    if using.u_value <= disp + ex_disp < u_range:
-        return True
-    else:
-        return False
+    if disp + ex_disp >= csect.addr + csect.length:
+        return None             # beyond the ending addr of the CSECT
+    return FIND_USING(scope_id, disp + ex_disp)
 
 def __GUESS_DISP(insType):
     if insType.type in 'SLX'  and  insType.valid:
@@ -2120,19 +2233,25 @@ def __ENCODE_ERRCODE(err_num, err_indx):
 def __DECODE_ERRCODE(err_code):
     return divmod(err_code, 100)
 
-# rv: ( [ symbol_1, ... ], [ desc_1, ... ], )
-#     where desc_x is in [
-#         'parenLEVEL', 'operator',
-#         'regular_num', 'inline_const', 'const_symbol',
-#         'eq_constant', 'location_ptr', 'valid_symbol',
-#         'symbol_candidate',
-#         'index_reg',
-#         ]
-# or  error_code  if error occurs (see __DECODE_ERRCODE() for more info)
-def __PARSE_ARG(arg_str, bypass_sym = False):
-    parts = []                  # components of the expression
-    descs = []                  # descriptions of the components
+# caches of the symbol-independent parsing of the operands; the same operand
+# strings show up again and again, in both passes
+SPLIT_CACHE = {
+    # arg_str : ( exp_rmndr, idx_rmndr, )       // see __SPLIT_ARG()
+    }
+LEX_CACHE = {
+    # ( arg_str, level, ) : ( ( part, ... ), ( desc, ... ), ) / error_code
+    }
+EXP_CACHE = {
+    # expression template : code object         // see __REDUCE_EXP()
+    }
+def __CLEAR_CACHE():
+    SPLIT_CACHE.clear()
+    LEX_CACHE.clear()
+    EXP_CACHE.clear()
 
+# used by __PARSE_ARG
+#   split the operand into the expression part and the index part
+def __SPLIT_ARG(arg_str):
     res = re.match(r".*=[AV]\([^()]+\)", arg_str)
     if res:
         exp_rmndr = arg_str[:res.end()]
@@ -2146,6 +2265,24 @@ def __PARSE_ARG(arg_str, bypass_sym = False):
     else:
         exp_rmndr += arg_str
         idx_rmndr = None
+    return ( exp_rmndr, idx_rmndr, )
+
+# rv: ( [ symbol_1, ... ], [ desc_1, ... ], )
+#     where desc_x is in [
+#         'parenLEVEL', 'operator',
+#         'regular_num', 'inline_const', 'const_symbol',
+#         'eq_constant', 'location_ptr', 'valid_symbol',
+#         'symbol_candidate',
+#         'index_reg',
+#         ]
+# or  error_code  if error occurs (see __DECODE_ERRCODE() for more info)
+def __PARSE_ARG(arg_str, bypass_sym = False):
+    parts = []                  # components of the expression
+    descs = []                  # descriptions of the components
+
+    if arg_str not in SPLIT_CACHE:
+        SPLIT_CACHE[arg_str] = __SPLIT_ARG(arg_str)
+    ( exp_rmndr, idx_rmndr ) = SPLIT_CACHE[arg_str]
     exp_len = len(exp_rmndr)
 
     # parse expression part
@@ -2218,6 +2355,37 @@ def __PARSE_ARG(arg_str, bypass_sym = False):
 
 # used by __PARSE_ARG
 def __PARSE_ARG_RECURSIVE(arg_str, level = 0):
+    res = __LEX_ARG(arg_str, level)
+    if isinstance(res, int):
+        return res              # error code
+
+    descs = []
+    for (part, desc) in zip(*res):
+        if desc == 'symbol':    # resolve it against the current SYMBOL
+            lbl_8 = '{0:<8}'.format(part)
+            if lbl_8 not in SYMBOL:
+                desc = 'symbol_candidate'
+            elif SYMBOL[lbl_8].reloc == 'A':
+                desc = 'const_symbol'
+            else:
+                desc = 'valid_symbol'
+        descs.append(desc)
+    return ( list(res[0]), descs, )
+
+# used by __PARSE_ARG_RECURSIVE
+#   same as __PARSE_ARG_RECURSIVE, except that all symbols are described
+#   as 'symbol', so that the result does not depend on the SYMBOL table and
+#   can be cached in LEX_CACHE
+def __LEX_ARG(arg_str, level):
+    key = ( arg_str, level, )
+    if key not in LEX_CACHE:
+        rv = __LEX_ARG_PARSE(arg_str, level)
+        if not isinstance(rv, int):
+            rv = ( tuple(rv[0]), tuple(rv[1]), )
+        LEX_CACHE[key] = rv
+    return LEX_CACHE[key]
+
+def __LEX_ARG_PARSE(arg_str, level):
     rv = ([], [])
     if not arg_str:
         return rv
@@ -2232,13 +2400,13 @@ def __PARSE_ARG_RECURSIVE(arg_str, level = 0):
 
         if part.startswith('('):
             if part.endswith(')'):
-                res = __PARSE_ARG_RECURSIVE(part[1:-1], level + 1)
+                res = __LEX_ARG(part[1:-1], level + 1)
                 if isinstance(res, int):
                     return len(''.join(parts)) + res
                 else:
                     paren_desc = 'paren{0}'.format(level)
-                    parts.extend(['('       ] + res[0] + [       ')'])
-                    descs.extend([paren_desc] + res[1] + [paren_desc])
+                    parts.extend(['('       ] + list(res[0]) + [       ')'])
+                    descs.extend([paren_desc] + list(res[1]) + [paren_desc])
             else:
                 return __ENCODE_ERRCODE(41, len(''.join(parts)) + len(part) - 1)
 
@@ -2285,14 +2453,7 @@ def __PARSE_ARG_RECURSIVE(arg_str, level = 0):
                 return __ENCODE_ERRCODE(150, len(''.join(parts)) + bad_lbl)
             else:
                 parts.append(part)
-                lbl_8 = '{0:<8}'.format(part)
-                if lbl_8 in SYMBOL:
-                    if SYMBOL[lbl_8].reloc == 'A':
-                        descs.append('const_symbol')
-                    else:
-                        descs.append('valid_symbol')
-                else:
-                    descs.append('symbol_candidate')
+                descs.append('symbol') # resolved by __PARSE_ARG_RECURSIVE
    # check location ptr and form rv
     rv_skip = False
     self_defining_cnt = 0
@@ -2385,7 +2546,10 @@ def __REDUCE_EXP(exp, current_scope, current_addr):
     if len(exp_list[0]) == 1:
         val = int(exp_list[0][0])
     else:
-        val = eval(''.join(exp_list[0]))
+        exp_str = ''.join(exp_list[0])
+        if exp_str not in EXP_CACHE:
+            EXP_CACHE[exp_str] = compile(exp_str, '<expression>', 'eval')
+        val = eval(EXP_CACHE[exp_str])
     if not -0x7FFFFFFF <= val <= 0x7FFFFFFF: # relocatable expression
         return None
     if val >= 0:
@@ -2542,15 +2706,18 @@ def __APPEND_TXT(mem, scope, pos_start, pos_end):
          ):
         return                  # no need to append, early return
 
+    start = time()
     p_s = pos_start
     p_e = min(pos_end, p_s + 56) # 56 Byte per TXT
     while p_s < p_e:
-        content = mem[mem.min_pos + p_s : mem.min_pos + p_e]
+        content = mem.view(mem.min_pos + p_s, mem.min_pos + p_e).tobytes()
         if debug_mode():
-            print '** building TXT record (scope', scope, ') with', content
+            print '** building TXT record (scope', scope, ') with', \
+                b2a_hex(content).upper()
         OBJMOD['TXT'].append( OBJMOD_REC['TXT'](scope, p_s, content) )
         p_s = p_e
-        p_e = min(pos_end, p_s + 56 * 2)
+        p_e = min(pos_end, p_s + 56)
+    STATS_TIME('objmod', start)
 
 
 df_list = []
@@ -19,6 +19,7 @@
 #
 # Output:
 #     SYSPRINT  source listing and diagnostic message
+#     SYSPROF   execution profile; only if PARM='PROFILE' or `zsub -p`
 #
 # Return Code:
 #      0        ASSIST executed
@@ -72,6 +73,14 @@ TIME = {
     'exec_end'   : None,
     }
 
+LISTING_BATCH = 256             # lines written into the SPOOL at a time
+
+# record types of the listing; see __LIST_ASM()
+LST_LINE  = 0
+LST_EJECT = 1
+LST_SPACE = 2
+LST_TITLE = 3
+
 
 def init(step):
     # check for file requirement
@@ -80,7 +89,7 @@ def init(step):
 
     # load in all the pseudo instructions
     zPE.base.core.asm.pseudo.update(PSEUDO_INS)
-    zPE.base.core.cpu.ins_op.update(PSEUDO_OP)
+    saved_op = zPE.base.core.cpu.register_op(PSEUDO_OP)
 
     limit = 0 # error tolerance limit; currently hard coded. need info
 
@@ -94,17 +103,21 @@ def init(step):
             'AMODE'     : 24,
             'RMODE'     : 24,
             })
+    asm_parse_parm(step.parm)
     asm_load_config({
             'MEM_POS'   : 0,    # always start at 0x000000 for ASSIST
             'REGION'    : step.region,
             })
 
+    asm_init_stats()
     TIME['asm_start'] = time()
-    zPE.base.pgm.ASMA90.pass_1()
-    zPE.base.pgm.ASMA90.pass_2()
+    zPE.base.pgm.ASMA90.assemble()
     TIME['asm_end'] = time()
 
     err_cnt = __PARSE_OUT_ASM(limit)
+    STATS_TIME('listing', TIME['asm_end'])
+    if asm_stats():
+        zPE.base.pgm.ASMA90.dump_stats(step)
 
     # get instream data, if not specified in DD card
     spo = spool.retrieve('FT05F001')
@@ -136,6 +149,7 @@ def init(step):
         if 'FT05F001' in FILE_MISSING:
             core_SPOOL.remove('FT05F001')
         core_SPOOL.remove('SYSLIN')
+        zPE.base.core.cpu.restore_op(saved_op)
         return RC['NORMAL'] # skip exec, return with "CC = 0"
 
     # invoke HEWLDRGO to link-edit and execute the object module
@@ -150,6 +164,10 @@ def init(step):
             'RMODE'   : 24,
             'PSWKEY'  : 12, # 12 is the key used by ASSIST on "marist"
             })
+    try:
+        ldr_parse_parm(step.parm)
+    except ValueError as e:
+        abort(9, 'Error: ', str(e), '\n')
     ldr_load_config({
             'MEM_POS' : 0,      # always start at 0x000000 for ASSIST
             'MEM_LEN' : required_mem_sz,
@@ -157,6 +175,7 @@ def init(step):
                 JCL['jobstart'] + JCL['time'] - time(), # job limit
                 step.start + step.time - time()         # step limit
                 ),
+            'INS_LIMIT' : ldr_ins_limit(step),
             'REGION'  : step.region,
             })
 
@@ -174,6 +193,8 @@ def init(step):
     core_SPOOL.remove('XREAD')       # unlink XREAD
 
     __PARSE_OUT_LDR(rc)
+    if ldr_profile():
+        zPE.base.pgm.HEWLDRGO.dump_profile(step)
 
     ldr_init_res()              # release resources
 
@@ -182,6 +203,7 @@ def init(step):
     core_SPOOL.remove('XPRNT')       # unlink XPRNT
     core_SPOOL.remove('XSNAPOUT')    # unlink XSNAPOUT
 
+    zPE.base.core.cpu.restore_op(saved_op)
     return RC['NORMAL']
 
 
@@ -220,42 +242,183 @@ def __PARSE_OUT_ASM(limit):
     spi = spool.retrieve('SYSUT1')   # input SPOOL
     spo = spool.retrieve('SYSPRINT') # output SPOOL
 
-    CNT = {
-        'pln'  : 1,         # printed line counter of the current page
-        'page' : 1,         # page counter
-        }
+    pln = 1                     # printed line counter of the current page
 
     ### header portion of the report
     ctrl = '1'
     spo.append(ctrl, '*** ASSIST 4.0/A2-05/15/82  470/V7A/0:OS/VS2  INS=SDFP7/X=BGHO, CHECK/TRC/=1180, OPTS=CDKMPR FROM PENN ST*NIU COMPSCI*LT\n')
-    CNT['pln'] += SPOOL_CTRL_MAP[ctrl]
+    pln += SPOOL_CTRL_MAP[ctrl]
 
     ctrl = '0'
     spo.append(ctrl, '\n')
-    CNT['pln'] += SPOOL_CTRL_MAP[ctrl]
+    pln += SPOOL_CTRL_MAP[ctrl]
 
     ### main read loop, op code portion of the report
     init_line_num = 1           # start at line No. 1
     title = ''                  # default title
     title_indx = 1              # start at first title, if any
 
-    # print first header
+    # check the first header
     if len(TITLE) > title_indx and TITLE[title_indx][0] == init_line_num:
         # line No. 1 is TITLE
         title = TITLE[title_indx][2]
         title_indx += 1         # advance the index to the next potential TITLE
         if not INFO_GE(init_line_num, 'I'):
             init_line_num = 2   # all green with the TITLE line, skip it
-    CNT['pln'] = __PRINT_HEADER(spo, title, CNT['pln'], CNT['page'], ctrl)
-
-    # define mapping function for error printing
-    def print_err_msg(line_num, err_level):
-        for tmp in INFO[err_level][line_num]:
-            ( CNT['pln'], CNT['page'] ) = __PRINT_LINE(
-                spo, title,
-                [ ctrl, gen_msg(err_level, tmp, line) ],
-                CNT['pln'], CNT['page']
+
+    # the listing is formatted lazily, and written in batches
+    __WRITE_LISTING(spo, __PAGINATE(
+            __LIST_ASM(spi, init_line_num, title_indx), title, pln, ctrl
+            ))
+    ### end of main read loop
+
+    ### summary portion of the report
+    cnt_warn = len(INFO['I']) + len(INFO['N']) + len(INFO['W'])
+    cnt_err  = len(INFO['E']) + len(INFO['S'])
+    cnt_all  = cnt_warn + cnt_err
+    def format_cnt(cnt):
+        if cnt:
+            return '{0:>5}'.format(cnt)
+        else:
+            return ' NO  '
+
+    ctrl = '0'
+    spo.append(ctrl, '*** ', format_cnt(cnt_all), ' STATEMENTS FLAGGED - ',
+               format_cnt(cnt_warn), ' WARNINGS, ',
+               format_cnt(cnt_err), ' ERRORS\n')
+    if cnt_err > limit:
+        spo.append(ctrl, '***** NUMBER OF ERRORS EXCEEDS LIMIT OF ',
+                   format_cnt(limit),
+                   ' ERRORS - PROGRAM EXECUTION DELETED *****\n')
+    spo.append(ctrl, '*** DYNAMIC CORE AREA USED: ',
+               ' LOW: {0:>7} HIGH: {1:>7}'.format('###', '###'), # need info
+               ' LEAVING: {0:>7} FREE BYTES.'.format('#######'), # need info
+               ' AVERAGE: {0:>8} BYTES/STMT ***\n'.format('##'))
+               # (LOW + HIGH) / len(spi)
+    diff = TIME['asm_end'] - TIME['asm_start']
+    if diff:
+        stmt_p_sec = int(len(spi) / diff)
+    else:
+        stmt_p_sec = 'INF'
+    spo.append(ctrl, '*** ASSEMBLY TIME = {0:>8.3f} SECS, '.format(diff),
+               '{0:>8} STATEMENT/SEC ***\n'.format(stmt_p_sec))
+
+    if not debug_mode():
+        return cnt_err          # regular process end here
+    #
+    # debugging information
+    #
+    print '\nMnemonic:'
+    for key in sorted(MNEMONIC.iterkeys()):
+        if len(MNEMONIC[key]) == 0: # type 0
+            scope = ' ' * 8
+        else:
+            try:
+                scope = f2x(MNEMONIC[key][0])
+            except:
+                scope = ' ' * 8
+        if len(MNEMONIC[key]) == 0: # type 0
+            loc = ''
+        elif len(MNEMONIC[key]) == 1: # type 1
+            loc = ''
+        elif len(MNEMONIC[key]) == 4: # type 4
+            loc = i2h(MNEMONIC[key][3])
+        else:
+            loc = i2h(MNEMONIC[key][1])
+        tmp_str = ''
+        if ( len(MNEMONIC[key]) == 3  and # type 3
+             zPE.base.core.asm.can_get_sd(MNEMONIC[key][2]) # DC/=const
+             ):
+            for val in zPE.base.core.asm.get_sd(MNEMONIC[key][2]):
+                tmp_str += zPE.base.core.asm.X_.tr(val.dump())
+        elif len(MNEMONIC[key]) == 4: # type 4
+            tmp_str += '{0:<14} {1:0>5} {0:>5}'.format(
+                '', loc
                 )
+        elif len(MNEMONIC[key]) == 5: # type 5
+            if MNEMONIC[key][2]:
+                code = zPE.base.core.asm.prnt_op(MNEMONIC[key][2])
+            else:
+                code = ''
+            if len(code) == 12:
+                field_3 = code[8:12]
+            else:
+                field_3 = ' ' * 4
+            if len(code) >= 8:
+                field_2 = code[4:8]
+            else:
+                field_2 = ' ' * 4
+            if code:
+                field_1 = code[0:4]
+            else:
+                field_1 = ' ' * 4
+            tmp_str = '{0} {1} {2} '.format(
+                field_1, field_2, field_3
+                )
+            if MNEMONIC[key][3] != None:
+                addr_1 = i2h(MNEMONIC[key][3])
+            else:
+                addr_1 = '     '
+            if MNEMONIC[key][4] != None:
+                addr_2 = i2h(MNEMONIC[key][4])
+            else:
+                addr_2 = '     '
+            tmp_str += '{0:0>5} {1:0>5}'.format(
+                addr_1, addr_2
+                )
+        print '{0:>5}: {1} {2:0>6} {3}'.format(
+            key,
+            scope,
+            loc,
+            tmp_str
+            )
+    print '\nMnemonic Location Remapping:'
+    for line_num in MNEMONIC_LOC:
+        if ( len(MNEMONIC[line_num]) < 2  or
+             MNEMONIC[line_num][1] != MNEMONIC_LOC[line_num]
+             ):
+            if len(MNEMONIC[line_num]) < 2:
+                org_loc = ''
+            elif MNEMONIC[line_num][1] == None:
+                org_loc = '[None]'
+            else:
+                org_loc = MNEMONIC[line_num][1]
+            print 'line {0:>4}: {1:0>6} => {2:0>6}'.format(
+                line_num, org_loc,
+                i2h(MNEMONIC_LOC[line_num])
+                )
+
+    from binascii import b2a_hex
+    print '\n\nObject Deck:'
+    for line in spool.retrieve('SYSLIN'):
+        line = b2a_hex(line).upper()
+        print ' '.join(fixed_width_split(8, line[0   :  32])), '  ',
+        print ' '.join(fixed_width_split(8, line[32  :  64])), '  ',
+        print ' '.join(fixed_width_split(8, line[64  :  96]))
+        print '{0:38}'.format(''),
+        print ' '.join(fixed_width_split(8, line[96  : 128])), '  ',
+        print ' '.join(fixed_width_split(8, line[128 : 160]))
+        print
+    print
+    # end of debugging
+    return cnt_err
+
+
+def __LIST_ASM(spi, init_line_num, title_indx):
+    '''
+    generate the records of the op code portion of the listing:
+      ( LST_LINE,  line, )      a line to be printed
+      ( LST_EJECT, None, )      start a new page
+      ( LST_SPACE, n, )         n blank lines, up to the end of the page
+      ( LST_TITLE, title, )     start a new page with the new title
+    '''
+    def err_msg(line_num, line, ctrl):
+        rv = [ ]
+        def print_err_msg(line_num, err_level):
+            for tmp in INFO[err_level][line_num]:
+                rv.append(ctrl + gen_msg(err_level, tmp, line))
+        MAP_INFO_GE(line_num, 'I', print_err_msg)
+        return rv
 
     for line_num in range(init_line_num, len(spi) + 1):
         # loop through line_num (indx + 1)
@@ -266,43 +429,32 @@ def __PARSE_OUT_ASM(limit):
         if line_num not in MNEMONIC:
             if INFO_GE(line_num, 'I'):
                 # process error msg
-                ( CNT['pln'], CNT['page'] ) = __PRINT_LINE(
-                    spo, title,
-                    [ ctrl, '{0:>6} {1:<26} '.format(' ', ' '),
-                      '{0:>5} {1:<72}'.format(line_num, line[:-1]),
-                      '{0:0>4}{1:0>4}'.format(line_did, '----'), # need info
-                      '\n',
-                      ],
-                    CNT['pln'], CNT['page']
-                    )
-                MAP_INFO_GE(line_num, 'I', print_err_msg)
+                yield ( LST_LINE, ''.join([
+                            ctrl, '{0:>6} {1:<26} '.format(' ', ' '),
+                            '{0:>5} {1:<72}'.format(line_num, line[:-1]),
+                            '{0:0>4}{1:0>4}'.format(line_did, '----'), # need info
+                            '\n',
+                            ]), )
+                for msg in err_msg(line_num, line, ctrl):
+                    yield ( LST_LINE, msg, )
                 continue
 
             # comment, EJECT, SPACE, MACRO definition, etc.
-            field = resplit_sq(r'\s+', line[:-1], 3)
+            field = STATEMENT[line_num - 1].field
 
             # check for EJECT and SPACE
             if line.startswith('*')  or  len(field) < 2:
                 pass            # cannot be EJECT / SPACE, pass
 
             elif field[1] == 'EJECT':
-                ( CNT['pln'], CNT['page'] ) = __PRINT_LINE(
-                    spo, title, [ ], CNT['pln'], CNT['page'],
-                    new_page = True, print_none = True
-                    )
+                yield ( LST_EJECT, None, )
                 continue
 
             elif field[1] == 'SPACE':
-                p_line = [ ]
                 if len(field) > 2:
-                    space_n = int(field[2])
+                    yield ( LST_SPACE, int(field[2]), )
                 else:
-                    space_n = 1
-                line_left = ASM_PARM['LN_P_PAGE'] - CNT['pln']
-                for i in range(min(space_n, line_left)):
-                    ( CNT['pln'], CNT['page'] ) = __PRINT_LINE(
-                        spo, title, [ ' \n' ], CNT['pln'], CNT['page']
-                        )
+                    yield ( LST_SPACE, 1, )
                 continue
 
             # not EJECT / SPACE
@@ -330,21 +482,16 @@ def __PARSE_OUT_ASM(limit):
                     '\n',
                     ]
 
-            ( CNT['pln'], CNT['page'] ) = __PRINT_LINE(
-                spo, title, p_line, CNT['pln'], CNT['page']
-                )
+            yield ( LST_LINE, ''.join(p_line), )
             continue
 
-
         # instructions
         if len(MNEMONIC[line_num]) == 0: # type 0, TITLE
             if not INFO_GE(line_num, 'I'):   # TITLE require RC = 0
-                title = TITLE[title_indx][2] # update current TITLE
+                # update current TITLE, which starts a new page
+                yield ( LST_TITLE, TITLE[title_indx][2], )
                 title_indx += 1 # advance the index to the next potential TITLE
 
-                CNT['page'] += 1 # new page
-                CNT['pln']   = __PRINT_HEADER(spo, title, 0, CNT['page'])
-
                 # skip the current iteration if no info need to be printed,
                 # since the TITLE will show anyway
                 continue
@@ -433,205 +580,76 @@ def __PARSE_OUT_ASM(limit):
                 line_did,   # deck ID
                 '\n',
                 ]
-        ( CNT['pln'], CNT['page'] ) = __PRINT_LINE(
-            spo, title, p_line, CNT['pln'], CNT['page']
-            )
+        yield ( LST_LINE, ''.join(p_line), )
 
         # process error msg, if any
-        MAP_INFO_GE(line_num, 'I', print_err_msg)
-    ### end of main read loop
-
-    ### summary portion of the report
-    cnt_warn = len(INFO['I']) + len(INFO['N']) + len(INFO['W'])
-    cnt_err  = len(INFO['E']) + len(INFO['S'])
-    cnt_all  = cnt_warn + cnt_err
-    def format_cnt(cnt):
-        if cnt:
-            return '{0:>5}'.format(cnt)
-        else:
-            return ' NO  '
-
-    ctrl = '0'
-    spo.append(ctrl, '*** ', format_cnt(cnt_all), ' STATEMENTS FLAGGED - ',
-               format_cnt(cnt_warn), ' WARNINGS, ',
-               format_cnt(cnt_err), ' ERRORS\n')
-    if cnt_err > limit:
-        spo.append(ctrl, '***** NUMBER OF ERRORS EXCEEDS LIMIT OF ',
-                   format_cnt(limit),
-                   ' ERRORS - PROGRAM EXECUTION DELETED *****\n')
-    spo.append(ctrl, '*** DYNAMIC CORE AREA USED: ',
-               ' LOW: {0:>7} HIGH: {1:>7}'.format('###', '###'), # need info
-               ' LEAVING: {0:>7} FREE BYTES.'.format('#######'), # need info
-               ' AVERAGE: {0:>8} BYTES/STMT ***\n'.format('##'))
-               # (LOW + HIGH) / len(spi)
-    diff = TIME['asm_end'] - TIME['asm_start']
-    if diff:
-        stmt_p_sec = int(len(spi) / diff)
-    else:
-        stmt_p_sec = 'INF'
-    spo.append(ctrl, '*** ASSEMBLY TIME = {0:>8.3f} SECS, '.format(diff),
-               '{0:>8} STATEMENT/SEC ***\n'.format(stmt_p_sec))
-
-    if not debug_mode():
-        return cnt_err          # regular process end here
-    #
-    # debugging information
-    #
-    print '\nMnemonic:'
-    for key in sorted(MNEMONIC.iterkeys()):
-        if len(MNEMONIC[key]) == 0: # type 0
-            scope = ' ' * 8
-        else:
-            try:
-                scope = f2x(MNEMONIC[key][0])
-            except:
-                scope = ' ' * 8
-        if len(MNEMONIC[key]) == 0: # type 0
-            loc = ''
-        elif len(MNEMONIC[key]) == 1: # type 1
-            loc = ''
-        elif len(MNEMONIC[key]) == 4: # type 4
-            loc = i2h(MNEMONIC[key][3])
-        else:
-            loc = i2h(MNEMONIC[key][1])
-        tmp_str = ''
-        if ( len(MNEMONIC[key]) == 3  and # type 3
-             zPE.base.core.asm.can_get_sd(MNEMONIC[key][2]) # DC/=const
-             ):
-            for val in zPE.base.core.asm.get_sd(MNEMONIC[key][2]):
-                tmp_str += zPE.base.core.asm.X_.tr(val.dump())
-        elif len(MNEMONIC[key]) == 4: # type 4
-            tmp_str += '{0:<14} {1:0>5} {0:>5}'.format(
-                '', loc
-                )
-        elif len(MNEMONIC[key]) == 5: # type 5
-            if MNEMONIC[key][2]:
-                code = zPE.base.core.asm.prnt_op(MNEMONIC[key][2])
-            else:
-                code = ''
-            if len(code) == 12:
-                field_3 = code[8:12]
-            else:
-                field_3 = ' ' * 4
-            if len(code) >= 8:
-                field_2 = code[4:8]
-            else:
-                field_2 = ' ' * 4
-            if code:
-                field_1 = code[0:4]
-            else:
-                field_1 = ' ' * 4
-            tmp_str = '{0} {1} {2} '.format(
-                field_1, field_2, field_3
-                )
-            if MNEMONIC[key][3] != None:
-                addr_1 = i2h(MNEMONIC[key][3])
-            else:
-                addr_1 = '     '
-            if MNEMONIC[key][4] != None:
-                addr_2 = i2h(MNEMONIC[key][4])
-            else:
-                addr_2 = '     '
-            tmp_str += '{0:0>5} {1:0>5}'.format(
-                addr_1, addr_2
-                )
-        print '{0:>5}: {1} {2:0>6} {3}'.format(
-            key,
-            scope,
-            loc,
-            tmp_str
-            )
-    print '\nMnemonic Location Remapping:'
-    for line_num in MNEMONIC_LOC:
-        if ( len(MNEMONIC[line_num]) < 2  or
-             MNEMONIC[line_num][1] != MNEMONIC_LOC[line_num]
-             ):
-            if len(MNEMONIC[line_num]) < 2:
-                org_loc = ''
-            elif MNEMONIC[line_num][1] == None:
-                org_loc = '[None]'
-            else:
-                org_loc = MNEMONIC[line_num][1]
-            print 'line {0:>4}: {1:0>6} => {2:0>6}'.format(
-                line_num, org_loc,
-                i2h(MNEMONIC_LOC[line_num])
-                )
-
-    from binascii import b2a_hex
-    print '\n\nObject Deck:'
-    for line in spool.retrieve('SYSLIN'):
-        line = b2a_hex(line).upper()
-        print ' '.join(fixed_width_split(8, line[0   :  32])), '  ',
-        print ' '.join(fixed_width_split(8, line[32  :  64])), '  ',
-        print ' '.join(fixed_width_split(8, line[64  :  96]))
-        print '{0:38}'.format(''),
-        print ' '.join(fixed_width_split(8, line[96  : 128])), '  ',
-        print ' '.join(fixed_width_split(8, line[128 : 160]))
-        print
-    print
-    # end of debugging
-    return cnt_err
+        for msg in err_msg(line_num, line, ctrl):
+            yield ( LST_LINE, msg, )
 
 
-def __PRINT_LINE(spool_out, title, line_words, line_num, page_num,
-                 new_page = False, print_none = False):
+def __PAGINATE(records, title, line_num, ctrl):
     '''
-    spool_out
-        the spool that the header is written to
+    records
+        the records of the listing, as generated by __LIST_ASM()
     title
-        the current title (in case of page increment)
-    line_words
-        the tuple/list that consist a line
+        the title of the first page
     line_num
         the current line number
-    page_num
-        the current page number
-
-    new_page
-        force the line to be printed on a new page
-    print_none
-        ignore the line to be printed. used with `new_page` to force page switch
-
-    return value
-        a two-tuple containing the new line number
-        and the new page number after the line is
-        inserted
+    ctrl
+        the control char for the first header
+
+    generate the lines of the listing, with the page headers inserted
     '''
-    if new_page or line_num >= ASM_PARM['LN_P_PAGE']:
-        page_num += 1           # new page
-        line_num = __PRINT_HEADER(spool_out, title, 0, page_num)
-    if print_none:
-        ctrl = None
-    else:
-        spool_out.append(* line_words)
-        ctrl = line_words[0][0]
+    page_num = 1
+    for line in __HEADER(title, page_num, ctrl):
+        yield line
+    line_num += SPOOL_CTRL_MAP[ctrl] + SPOOL_CTRL_MAP['0']
+
+    for ( rec_type, rec ) in records:
+        if rec_type == LST_LINE  and  line_num < ASM_PARM['LN_P_PAGE']:
+            yield rec
+            line_num += SPOOL_CTRL_MAP[rec[0]]
+            continue
+
+        elif rec_type == LST_SPACE:
+            line_left = ASM_PARM['LN_P_PAGE'] - line_num
+            for i in range(min(rec, line_left)):
+                yield ' \n'
+                line_num += SPOOL_CTRL_MAP[' ']
+            continue
 
-    return ( line_num + SPOOL_CTRL_MAP[ctrl], page_num )
+        elif rec_type == LST_TITLE:
+            title = rec
 
+        # new page (EJECT, TITLE, or no more room for the line)
+        page_num += 1
+        for line in __HEADER(title, page_num):
+            yield line
+        line_num = SPOOL_CTRL_MAP['1'] + SPOOL_CTRL_MAP['0']
+        if rec_type == LST_LINE:
+            yield rec
+            line_num += SPOOL_CTRL_MAP[rec[0]]
 
-def __PRINT_HEADER(spool_out, title, line_num, page_num, ctrl = '1'):
-    '''
-    spool_out
-        the spool that the header is written to
-    title
-        the title to be printed
-    line_num
-        the current line number
-    page_num
-        the current page number
-    ctrl = '1'
-        the control char for the header
 
-    return value
-        the new line number after header is inserted
-    '''
-    spool_out.append(
-        ctrl, '{0:<8} {1:<102}PAGE {2:>4}\n'.format(TITLE[0], title, page_num)
-        )
-    spool_out.append(
-        '0',  '  LOC  OBJECT CODE    ADDR1 ADDR2  STMT   SOURCE STATEMENT\n'
-        )
-    return line_num + SPOOL_CTRL_MAP[ctrl] + SPOOL_CTRL_MAP['0']
+def __HEADER(title, page_num, ctrl = '1'):
+    '''the lines of the page header'''
+    return [
+        '{0}{1:<8} {2:<102}PAGE {3:>4}\n'.format(
+            ctrl, TITLE[0], title, page_num
+            ),
+        '0  LOC  OBJECT CODE    ADDR1 ADDR2  STMT   SOURCE STATEMENT\n',
+        ]
+
+
+def __WRITE_LISTING(spool_out, lines):
+    '''write the lines into the SPOOL, LISTING_BATCH lines at a time'''
+    batch = [ ]
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= LISTING_BATCH:
+            spool_out.extend(batch)
+            batch = [ ]
+    spool_out.extend(batch)
 
 
 def __PARSE_OUT_LDR(rc):
@@ -652,11 +670,11 @@ def __PARSE_OUT_LDR(rc):
 
     diff = TIME['exec_end'] - TIME['exec_start']
     if diff:
-        ins_p_sec = int(len(INSTRUCTION) / diff)
+        ins_p_sec = int(INSTRUCTION.count / diff)
     else:
         ins_p_sec = 'INF'
     spo.append(ctrl, '*** EXECUTION TIME = {0:>8.3f} SECS. '.format(diff),
-               '{0:>9} INSTRUCTIONS EXECUTED - '.format(len(INSTRUCTION)),
+               '{0:>9} INSTRUCTIONS EXECUTED - '.format(INSTRUCTION.count),
                '{0:>8} INSTRUCTIONS/SEC ***\n'.format(ins_p_sec))
     if rc >= RC['WARNING']:
         msg = 'ABNORMAL'
@@ -671,21 +689,19 @@ def __PARSE_OUT_LDR(rc):
         spo.append(ctrl, '  IM LOCATION    INSTRUCTION :  IM = PSW BITS 32-39(ILC,CC,MASK) BEFORE INSTRUCTION EXECUTED AT PROGRAM LOCATION SHOWN\n')
 
         code = [ ' ' * 4 ] * 3
-        for ins in INSTRUCTION[-10 : ]: # only show last 10 instructions
-            if len(ins[1]) == 12:
-                code[2] = ins[1][8:12]
+        for ( bits, addr, ins ) in INSTRUCTION.last(10): # only show last 10
+            if len(ins) == 12:
+                code[2] = ins[8:12]
             else:
                 code[2] = ' ' * 4
-            if len(ins[1]) >= 8:
-                code[1] = ins[1][4:8]
+            if len(ins) >= 8:
+                code[1] = ins[4:8]
             else:
                 code[1] = ' ' * 4
-            code[0] = ins[1][0:4]
+            code[0] = ins[0:4]
             spo.append(
-                ctrl, '  ', b2x(ins[0][32:39]),
-                '  {0:0>6}     {1} {2} {3}\n'.format(
-                    i2h(ins[0].Instruct_addr), * code
-                    )
+                ctrl, '  ', b2x(bits),
+                '  {0:0>6}     {1} {2} {3}\n'.format(i2h(addr), * code)
                 )
         # append the following words to the end of the last instruction
         spo[-1, -1] = '  <-- LAST INSTRUCTION DONE - PROBABLE CAUSE OF TERMINATION\n'
@@ -695,15 +711,14 @@ def __PARSE_OUT_LDR(rc):
         spo.append('-', '** TRACE OF LAST 10 BRANCH INSTRUCTIONS EXECUTED: PSW BITS SHOWN ARE THOSE BEFORE CORRESPONDING INSTRUCTION DECODED ***\n')
         spo.append(ctrl, '  IM LOCATION    INSTRUCTION :  IM = PSW BITS 32-39(ILC,CC,MASK) BEFORE INSTRUCTION EXECUTED AT PROGRAM LOCATION SHOWN\n')
 
-        for ins in BRANCHING[-10 : ]: # only show last 10 branches
-            if len(ins[1]) == 8:
-                code = ' '.join([ ins[1][:4], ins[1][4:] ])
+        for ( bits, addr, ins ) in BRANCHING.last(10): # only show last 10
+            if len(ins) == 8:
+                code = ' '.join([ ins[:4], ins[4:] ])
             else:
-                code = ins[1]
+                code = ins
             spo.append(
-                ctrl, '  ', b2x(ins[0][32:39]),
-                '  {0:0>6}     {1}\n'.format(
-                    i2h(ins[0].Instruct_addr), code))
+                ctrl, '  ', b2x(bits),
+                '  {0:0>6}     {1}\n'.format(i2h(addr), code))
 
         # register dump
         spo.append(ctrl, ' REGS 0-7      ',
@@ -19,6 +19,7 @@
 #     SYSLOUT   loader information and diagnostic message
 #     XPRNT     output for XPRNT
 #     XSNAPOUT  output for XDUMP and XSNAP
+#     SYSPROF   execution profile; only if PARM='PROFILE' or `zsub -p`
 #     [ ... ]   user-defined output for the module to be executed
 #
 # Return Code:
@@ -38,18 +39,20 @@ from zPE.util.excptn import *
 from zPE.util.global_config import *
 
 import zPE.util.spool as spool
+import zPE.base.core.SPOOL as core_SPOOL
 
-import sys
+import os, sys
+import json
 from time import strftime, time
 from random import randint
-from binascii import b2a_hex
-from threading import Timer
 
 import zPE.base.core.cpu
 import zPE.base.core.mem
 
 # relative import resource file
 from hewldrgo_config import * # read resource file for LDR config + rc
+from asma90_objmod_spec import REC_ID as OBJMOD_REC_ID, rec_type as OBJMOD_TYPE
+from asma90_objmod_spec import REC_PARSE as OBJMOD_PARSE
 
 
 FILE_CHK = [                    # files to be checked
@@ -75,6 +78,10 @@ def init(step):
     # load the user-supplied PARM and config into the default configuration
     # ldr_load_parm({
     #         })
+    try:
+        ldr_parse_parm(step.parm)
+    except ValueError as e:
+        abort(9, 'Error: ', str(e), '\n')
     ldr_load_local_conf({
             'MEM_POS' : randint(512*128, 4096*128) * 8, # random from 512K to 4M
             'MEM_LEN' : region_max_sz(step.region),
@@ -84,6 +91,7 @@ def init(step):
                 JCL['jobstart'] + JCL['time'] - time(), # job limit
                 step.time                               # step limit
                 ),
+            'INS_LIMIT' : ldr_ins_limit(step),
             'REGION'  : step.region,
             })
 
@@ -91,6 +99,8 @@ def init(step):
     rc = go(load())
 
     __PARSE_OUT(rc)
+    if ldr_profile():
+        dump_profile(step)
 
     ldr_init_res()              # release resources
 
@@ -107,30 +117,22 @@ def load():
     mem = zPE.base.core.mem.Memory(LDR_CONFIG['MEM_POS'], LDR_CONFIG['MEM_LEN'])
     LDR_CONFIG['EXIT_PT'] = mem.h_bound
 
-    rec_tp = { # need to be all lowercase since b2a_hex() returns all lowercase
-        'ESD' : c2x('ESD').lower(),
-        'TXT' : c2x('TXT').lower(),
-        'RLD' : c2x('RLD').lower(),
-        'END' : c2x('END').lower(),
-        'SYM' : c2x('SYM').lower(),
-        }
     rec_order = {
         # current type : expected type(s)
-        rec_tp['ESD']  : [ rec_tp['ESD'], rec_tp['TXT'], ],
-        rec_tp['TXT']  : [ rec_tp['TXT'], rec_tp['RLD'], rec_tp['END'], ],
-        rec_tp['RLD']  : [ rec_tp['RLD'], rec_tp['END'], ],
-        rec_tp['END']  : [ rec_tp['ESD'], None, ], # None <==> EoF
-#        rec_tp['SYM']  : [  ],
+        'ESD'  : [ 'ESD', 'TXT', ],
+        'TXT'  : [ 'TXT', 'RLD', 'END', ],
+        'RLD'  : [ 'RLD', 'END', ],
+        'END'  : [ 'ESD', None, ], # None <==> EoF
+#        'SYM'  : [  ],
         }
-    expect_type = [ rec_tp['ESD'] ]     # next expected record type
+    expect_type = [ 'ESD' ]     # next expected record type
 
     obj_id = 1            # 1st OBJECT MODULE
     mem_loc = mem.min_pos # starting memory location for each OBJMOD (RF)
 
     esd_id_next = 1             # next available ESD ID
-    for r in spi.spool:
-        rec = b2a_hex(r)
-        if rec[:2] != '02':     # control statement
+    for rec in spi.spool:
+        if rec[:1] != OBJMOD_REC_ID: # control statement
             field = resplit_sq(r'\s+', rec, 3)
             if len(field) < 3  or  field[0] != '':
                 abort(13, "Error: ", rec,
@@ -151,41 +153,30 @@ def load():
             continue
 
         # check record type
-        if rec[2:8] not in expect_type:
+        rec_type = OBJMOD_TYPE(rec) # byte 2-4
+        if rec_type not in expect_type:
             sys.stderr.write(
                 'Error: Loader: Invalid OBJECT MODULE record encountered.\n'
                 )
             return RC['ERROR']  # OBJECT module format error
         else:
-            expect_type = rec_order[rec[2:8]]
+            expect_type = rec_order[rec_type]
 
         # parse ESD record
-        if rec[2:8] == rec_tp['ESD']: # byte 2-4
-            byte_cnt = int(rec[20:24], 16) # byte 11-12: byte count
-            esd_id = rec[28:32]            # byte 15-16: ESD ID / blank
-            if esd_id == c2x('  '):        # 2 spaces
+        if rec_type == 'ESD':
+            ( esd_id, vf_list ) = OBJMOD_PARSE['ESD'](rec)
+            if esd_id == None:
                 # blank => 'LD'
-                esd_id = None   # no advancing in ESD ID
+                pass            # no advancing in ESD ID
             else:
-                # non-blank, parse it to int
-                esd_id = int(esd_id, 16)
                 esd_id_next = esd_id + 1
-            for i in [ 32 + j * 32                   # vf indx -> start pos
-                       for j in range(byte_cnt / 16) # number of vf
-                       ]:
-                vf = rec[i : i+32] # each vf is 16 bytes long
-                addr = int(vf[18:24], 16) # vf byte 10-12: address
-                length = vf[26:32]        # vf byte 14-16: length / blank
-                if length == c2x('   '):  # 3 spaces
-                    length = None
-                else:
-                    length = int(length, 16)
+            for ( name, type_code, addr, length ) in vf_list:
                 esd = ExternalSymbol(
                     None, esd_id, addr, length,
                     None, LDR_PARM['AMODE'], LDR_PARM['RMODE'], None
                     )
-                esd.load_type(vf[16:18])  # vf byte 9: ESD type code
-                esd_name = x2c(vf[0:16])  # vf byte 1-8: ESD Name
+                esd.load_type(type_code)  # vf byte 9: ESD type code
+                esd_name = name.decode('EBCDIC-CP-US') # vf byte 1-8: ESD Name
                 if esd.type in [ 'SD', 'PC', ]:
                     CSECT[obj_id, esd.id] = ( mem_loc, esd, esd_name )
                     SCOPE[mem_loc, esd.addr, esd.length] = ( obj_id, esd.id )
@@ -202,10 +193,8 @@ def load():
                 esd_id_next = esd_id + 1
 
         # parse TXT record
-        elif rec[2:8] == rec_tp['TXT']: # byte 2-4
-            addr = int(rec[10:16], 16)     # byte 6-8: starting address
-            byte_cnt = int(rec[20:24], 16) # byte 11-12: byte count
-            scope = int(rec[28:32], 16)    # byte 15-16: scope id
+        elif rec_type == 'TXT':
+            ( addr, scope, data ) = OBJMOD_PARSE['TXT'](rec)
 
             if ( obj_id, scope ) not in CSECT:
                 abort(13, 'Error: ', str(scope),
@@ -215,29 +204,12 @@ def load():
             loc = ( CSECT[obj_id, scope][0] +      # start of OBJMOD
                     addr                           # addr into OBJMOD
                     )
-            mem[loc] = rec[32 : 32 + byte_cnt * 2]
+            mem.write(loc, data) # copy the data stream as a single slice
 
         # parse RLD record
-        elif rec[2:8] == rec_tp['RLD']: # byte 2-4
-            byte_cnt = int(rec[20:24], 16) # byte 11-12: byte count
-            remainder = rec[32 : 32 + byte_cnt * 2]
-            df_same = False     # not the same ESDID
-            while remainder:
-                if not df_same: # update ESDID if needed
-                    rel_id = int(remainder[  : 4], 16)
-                    pos_id = int(remainder[4 : 8], 16)
-                    remainder = remainder[8:]
-                # parsing flags
-                df_vcon = (remainder[0] == '1') # 1st hex-digit: v-con flag
-                df_flag = int(remainder[1], 16) # 2nd hex-digit: flags
-                df_len  = (df_flag >> 2) + 1    # 2.1 - 2.2: length - 1
-                df_neg  = bool(df_flag & 0b10)  # 2.3: negative flag
-                df_same = bool(df_flag & 0b01)  # 2.4: same ESDID flag
-
-                # retrieving address
-                df_addr = int(remainder[2:8], 16)
-                remainder = remainder[8:]
-
+        elif rec_type == 'RLD':
+            for ( rel_id, pos_id, df_vcon, df_len, df_neg, df_addr
+                  ) in OBJMOD_PARSE['RLD'](rec):
                 df_addr += mem_loc # re-mapping the memory address
                 if df_neg:
                     reloc_offset = - mem_loc
@@ -268,17 +240,14 @@ def load():
                     )
 
         # parse END record
-        elif rec[2:8] == rec_tp['END']: # byte 2-4
+        elif rec_type == 'END':
             # setup ENTRY POINT, if not offered by the user
             if LDR_CONFIG['ENTRY_PT'] == None:
                 # no ENTRY POINT offered, nor setup by a previous OBJMOD
-                entry = rec[10:16] # byte 6-8: entry point
-                if entry == c2x('   '): # 3 spaces
+                ( loc, scope ) = OBJMOD_PARSE['END'](rec) # byte 6-8, 15-16
+                if loc == None: # blank
                     scope = 1   # no ENTRY POINT in END, use 1st CSECT
                     loc = CSECT[obj_id, scope][1].addr
-                else:
-                    scope = int(rec[28:32], 16) # byte 15-16: ESD ID for EP
-                    loc = int(entry, 16)
                 loc += CSECT[obj_id, scope][0] # add the offset of the OBJMOD
                 LDR_CONFIG['ENTRY_PT'] = loc
             elif isinstance(LDR_CONFIG['ENTRY_PT'], str):
@@ -350,23 +319,78 @@ def go(mem):
     psw.M = 1                   # turn on "Machine check"
     psw.W = 0                   # content switch to the program
 
+    zPE.base.core.cpu.ins_cache_reset() # start with an empty decoded cache
+    INSTRUCTION.reset(LDR_CONFIG['TRACE_DEPTH']) # and empty histories
+    BRANCHING.reset(LDR_CONFIG['TRACE_DEPTH'])
+
     # main execution loop
-    timeouted = [ ]
-    def timeout():
-        timeouted.append(True)
-    t = Timer(LDR_CONFIG['TIME'], timeout)
+    ins_limit = LDR_CONFIG['INS_LIMIT']
+    wall_clock = [
+        time() + LDR_CONFIG['TIME'] * WALL_CLOCK_FACTOR, # deadline
+        WALL_CLOCK_CHECK,                                # next check point
+        ]
+    def time_exceeded():
+        '''check the instruction budget; the wall clock once in a while'''
+        if INSTRUCTION.count >= ins_limit:
+            return True
+        if INSTRUCTION.count >= wall_clock[1]:
+            wall_clock[1] = INSTRUCTION.count + WALL_CLOCK_CHECK
+            return time() > wall_clock[0]
+        return False
+
+    timeouted = False
     try:
-        t.start()               # start the timer
-        RECORD_BR(psw.snapshot(), ['00', '00']) # branch into the module
-        while not timeouted  and  psw.Instruct_addr != LDR_CONFIG['EXIT_PT']:
-            zPE.base.core.cpu.execute(
-                RECORD_INS(psw.snapshot(), zPE.base.core.cpu.fetch())
-                )
-        t.cancel()              # stop the timer
+        RECORD_BR(psw.trace_bits(), psw.Instruct_addr,
+                  ( 0x00, ( 0, 0 ), None, '\x00\x00' ) # branch into the module
+                  )
+        if ldr_profile():
+            # time each instruction; always interpreted, one by one
+            while psw.Instruct_addr != LDR_CONFIG['EXIT_PT']:
+                if time_exceeded():
+                    timeouted = True
+                    break
+                addr = psw.Instruct_addr
+                ins = RECORD_INS(psw.trace_bits(), addr,
+                                 zPE.base.core.cpu.fetch()
+                                 )
+                start = time()
+                try:
+                    zPE.base.core.cpu.execute(ins)
+                finally:
+                    PROFILE.add(ins[0], addr, time() - start)
+        elif ldr_engine() == 'block'  and  not debug_mode():
+            # blocks never run past the end of a page, and the exit point is
+            # always on a page boundary; so checking between blocks suffices
+            while psw.Instruct_addr != LDR_CONFIG['EXIT_PT']:
+                if time_exceeded():
+                    timeouted = True
+                    break
+                if ( INSTRUCTION.count + zPE.base.core.cpu.BLOCK_MAX_INS <=
+                     ins_limit
+                     ):
+                    block = zPE.base.core.cpu.fetch_block()
+                else:
+                    block = None # run out the budget one by one, to stop
+                                 # at the same instruction as the interpreter
+                if block:
+                    block(RECORD_INS)
+                else:           # EX, written page, etc.
+                    zPE.base.core.cpu.execute(RECORD_INS(
+                            psw.trace_bits(), psw.Instruct_addr,
+                            zPE.base.core.cpu.fetch()
+                            ))
+        else:
+            while psw.Instruct_addr != LDR_CONFIG['EXIT_PT']:
+                if time_exceeded():
+                    timeouted = True
+                    break
+                zPE.base.core.cpu.execute(RECORD_INS(
+                        psw.trace_bits(), psw.Instruct_addr,
+                        zPE.base.core.cpu.fetch()
+                        ))
         rc = RC['NORMAL']
     except Exception as e:
         # ABEND CODE; need info
-        t.cancel()              # stop the timer
         if isinstance(e, zPException):
             e_push(e)
         else:
@@ -390,15 +414,89 @@ def go(mem):
 
     psw.W = 1                   # content switch back to the loader
     psw.PSW_key = old_key       # restore PSW key
+    JCL['ins_cnt'] += INSTRUCTION.count # charged against the JOB's TIME
 
     mem.release()
     ldr_mem.release()
 
     if debug_mode():
+        print 'Decoded Instruction Cache: {0} hit(s), {1} miss(es)'.format(
+            zPE.base.core.cpu.INS_CACHE_STAT['hit'],
+            zPE.base.core.cpu.INS_CACHE_STAT['miss']
+            )
+        print 'Translated Block Cache: {0} hit(s), {1} miss(es)'.format(
+            zPE.base.core.cpu.BLOCK_CACHE_STAT['hit'],
+            zPE.base.core.cpu.BLOCK_CACHE_STAT['miss']
+            )
         sys.stderr.write(e_dump())
     return rc
 # end of go()
 
+def dump_profile(step):
+    '''
+    write the execution profile of the step into the SYSPROF SPOOL (which
+    is allocated if not specified), and into a JSON file under the
+    profile directory
+    '''
+    if 'SYSPROF' not in spool.list():
+        core_SPOOL.new('SYSPROF', 'o', 'outstream', [], [ 'SYSPROF' ])
+    core_SPOOL.register_write('SYSPROF', step.name)
+    spo = spool.retrieve('SYSPROF')
+
+    by_op = PROFILE.by_op()
+    total_cnt  = len(PROFILE)
+    total_time = sum([ stat[2] for stat in by_op ]) or 1 # avoid div by 0
+    rv = {
+        'job'          : JCL['jobid'],
+        'step'         : step.name,
+        'program'      : step.pgm,
+        'instructions' : total_cnt,
+        'op'           : [ ],
+        'hot_addr'     : [ ],
+        }
+
+    spo.append('1', 'EXECUTION PROFILE OF STEP {0:<8}'.format(step.name),
+               ' - {0} INSTRUCTIONS EXECUTED\n'.format(total_cnt))
+    spo.append('0', 'MNEMONIC        COUNT   TOTAL (SEC)   MEAN (USEC)',
+               '   TIME (%)\n')
+    for ( mnem, cnt, total, mean ) in by_op:
+        spo.append(' ', '{0:<8}{1:>12}{2:>14.6f}{3:>14.3f}{4:>11.2f}'.format(
+                mnem, cnt, total, mean * 1000000, total * 100 / total_time
+                ), '\n')
+        rv['op'].append({
+                'mnemonic' : mnem,
+                'count'    : cnt,
+                'total'    : total,
+                'mean'     : mean,
+                })
+
+    spo.append('0', 'ADDRESS   CSECT      OFFSET         COUNT\n')
+    for ( addr, cnt ) in PROFILE.hot_addr(PROFILE_HOT_ADDR):
+        ( csect, offset ) = ldr_locate(addr)
+        if csect == None:
+            spo.append(' ', '{0:0>6}    {1:<8}   {2:<6}{3:>14}\n'.format(
+                    i2h(addr), '?', '', cnt
+                    ))
+        else:
+            spo.append(' ', '{0:0>6}    {1:<8}   {2:0>6}{3:>14}\n'.format(
+                    i2h(addr), csect.strip(), i2h(offset), cnt
+                    ))
+        rv['hot_addr'].append({
+                'addr'   : addr,
+                'csect'  : csect and csect.strip(),
+                'offset' : offset,
+                'count'  : cnt,
+                })
+
+    if not os.path.isdir(CONFIG_PATH['profile']):
+        os.makedirs(CONFIG_PATH['profile'])
+    fp = open(os.path.join(
+            CONFIG_PATH['profile'],
+            '{0}.{1}.json'.format(JCL['jobid'], step.name)
+            ), 'w')
+    json.dump(rv, fp, indent = 2, sort_keys = True)
+    fp.close()
+
 
 ### Supporting Functions
 def __MISSED_FILE(step):
@@ -2,6 +2,10 @@ from zPE.util import *
 from zPE.util.conv import *
 from zPE.util.global_config import *
 
+import re
+import bisect
+from time import time
+
 ### High-Level Assembler config definition
 
 ASM_PARM = {
@@ -9,6 +13,7 @@ ASM_PARM = {
     'RMODE'     : 31,
     'ENTRY'     : '',           # need info
     'LN_P_PAGE' : 60,           # line per page for output
+    'STATS'     : False,        # report the statistics; see `asm_stats()`
 }
 def asm_load_parm(parm_dic):
     for key in parm_dic:
@@ -17,6 +22,21 @@ def asm_load_parm(parm_dic):
         else:
             raise KeyError('{0}: Invalid PARM key.'.format(key))
 
+def asm_parse_parm(parm_str):
+    '''
+    pick up the options meant for the assembler from the PARM of the step;
+    anything else is left to the program
+    '''
+    parm_dic = { 'STATS' : False, }
+    for opt in re.split(',', parm_str.strip("'()")):
+        if opt == 'STATS':
+            parm_dic['STATS'] = True
+    asm_load_parm(parm_dic)
+
+def asm_stats():
+    '''whether the statistics are reported, by the PARM or by `zsub -p`'''
+    return ASM_PARM['STATS']  or  profile_mode()
+
 ASM_CONFIG = {
     'MEM_POS'   : None,         # required; first available memory location
     'MEM_LEN'   : None,         # required; length of memory required
@@ -30,6 +50,40 @@ def asm_load_config(conf_dic):
             raise KeyError('{0}: Invalid configuration key.'.format(key))
 
 
+### High-Level Assembler statistics definition
+
+STATS = { # see asm_init_stats() for the phases and the items
+    # 'time'  : { phase : seconds spent },
+    # 'count' : { item  : number of items },
+    }
+def STATS_TIME(phase, start):
+    '''add the time elapsed since `start` to the phase'''
+    STATS['time'][phase] += time() - start
+
+def STATS_COUNT(item, cnt = 1):
+    STATS['count'][item] += cnt
+
+def asm_init_stats():
+    STATS['time'] = {
+        'pass_1'    : 0.0,      # pass 1, including the macro expansion
+        'pass_2'    : 0.0,      # pass 2
+        'ltorg'     : 0.0,      # literal pool processing (within pass 1)
+        'objmod'    : 0.0,      # object module generation (within pass 2)
+        'listing'   : 0.0,      # listing generation
+        }
+    STATS['count'] = {
+        'source'    : 0,        # number of sources assembled
+        'cache_hit' : 0,        # ... of which loaded from the objmod cache
+        'statement' : 0,        # statements (after the macro expansion)
+        'symbol'    : 0,        # symbols defined
+        'using'     : 0,        # USING statements
+        'literal'   : 0,        # literals (=constants) allocated
+        'txt'       : 0,        # TXT records produced
+        'rld'       : 0,        # RLD records produced
+        }
+asm_init_stats()
+
+
 ### High-Level Assembler resource definition
 
 INFO = { # see asm_init_res() for possible message levels
@@ -105,6 +159,49 @@ RELOCATE_OFFSET = {
     # scope_id : offset
     }
 
+TOKEN = {               # Token Table; shared by the lines of the same text
+    # line : [ field, args, ]   // args is None until split
+    }
+
+class Statement(object):
+    '''a source statement, tokenized once in pass 1'''
+    __slots__ = [ 'line', 'deck_id', 'field', '__col', '__tok', '__arg_col' ]
+
+    def __init__(self, line, deck_id):
+        self.line    = line     # the line as in the sketch SPOOL
+        self.deck_id = deck_id
+        if line not in TOKEN:
+            TOKEN[line] = [ resplit_sq(r'\s+', line[:-1], 3), None, ]
+        self.__tok   = TOKEN[line]
+        self.field   = self.__tok[0]
+                                # [ label, op-code, operands, remarks ]
+                                # shared through TOKEN; do not modify
+        self.__col     = { }    # field index -> column offset in the line
+        self.__arg_col = { }    # arg index -> column offset in the operands
+
+    def column(self, indx):
+        '''the column offset of the indicated field within the line'''
+        if indx not in self.__col:
+            self.__col[indx] = resplit_index(self.line, self.field, indx)
+        return self.__col[indx]
+
+    def args(self):
+        '''the operand field, split on the commas; do not modify'''
+        if self.__tok[1] == None:
+            self.__tok[1] = resplit(',', self.field[2], ['(',"'"], [')',"'"])
+        return self.__tok[1]
+
+    def arg_column(self, indx):
+        '''the column offset of the indicated operand within the operands'''
+        if indx not in self.__arg_col:
+            self.__arg_col[indx] = resplit_index(
+                self.field[2], self.args(), indx
+                )
+        return self.__arg_col[indx]
+STATEMENT = [           # Statement Table; build during pass 1
+    # Statement(line_1), Statement(line_2), ...     // index = line_num - 1
+    ]
+
 OBJMOD = { # see asm_init_res() for possible record types
     # 'record type' : [ lines ]
     }
@@ -215,8 +312,13 @@ SYMBOL_V = {            # Cross Reference ER Sub-Table
 SYMBOL_EQ = {           # Cross Reference =Const Sub-Table
     # 'Symbol  ' : [ Symbol(), ... ]
     }
+SYMBOL_EQ_ID = {        # Scope Index of the =Const Sub-Table
+    # ( 'Symbol  ', scope_id, ) : Symbol()  // the 1st one of a CSECT
+    }
 def ALLOC_EQ_SYMBOL(lbl, symbol):
     dic_append_list(SYMBOL_EQ, lbl, symbol) # mark =const as allocable
+    if symbol.id > 0:
+        SYMBOL_EQ_ID.setdefault( ( lbl, symbol.id, ), symbol )
 INVALID_SYMBOL = []     # non-defined symbol
 NON_REF_SYMBOL = []     # non-referenced symbol
 
@@ -355,6 +457,47 @@ USING_MAP = {           # Using Map
 ACTIVE_USING = {
     # reg : Stmt
     }
+USING_INDEX = {         # Index of the active USINGs
+    # scope_id : [ ( u_value, reg, ), ... ]   // sorted; of the scope
+    # '*'      : [ ( u_value, reg, ), ... ]   // sorted; of all scopes
+    }
+def ACTIVATE_USING(reg, stmt):
+    '''start the domain of the USING of the statement on the register'''
+    if reg in ACTIVE_USING:
+        DROP_USING(reg)
+    ACTIVE_USING[reg] = stmt
+    using = USING_MAP[stmt, reg]
+    for key in ( '*', using.u_id, ):
+        if key not in USING_INDEX:
+            USING_INDEX[key] = [ ]
+        bisect.insort(USING_INDEX[key], ( using.u_value, reg, ))
+
+def DROP_USING(reg):
+    '''end the domain of the active USING on the register'''
+    using = USING_MAP[ACTIVE_USING.pop(reg), reg]
+    for key in ( '*', using.u_id, ):
+        USING_INDEX[key].remove( ( using.u_value, reg, ) )
+
+def FIND_USING(scope_id, pos):
+    '''
+    return the register of the active USING that covers the position with
+    the smallest displacement (and the highest register number if tied),
+    or None if not covered by any of them
+
+    scope_id
+        the scope of the position, or '*' if not to be checked
+    '''
+    index = USING_INDEX.get(scope_id)
+    if not index:
+        return None
+    # the last entry with u_value <= pos; ties are sorted by register number
+    indx = bisect.bisect_right(index, ( pos, GPR_NUM, )) - 1
+    if indx < 0:
+        return None
+    ( u_value, reg ) = index[indx]
+    if pos < u_value + USING_MAP[ACTIVE_USING[reg], reg].u_range:
+        return reg              # all USINGs have the same range
+    return None
 
 
 def asm_init_res():
@@ -368,6 +511,7 @@ def asm_init_res():
     TITLE.append('')            # add back the DECK NAME
 
     MNEMONIC.clear()            # clear the MNEMONIC dictionary
+    del STATEMENT[:]            # clear the Statement Table
 
     RELOCATE_OFFSET[1] = 0      # the main scope always start at 0x000000
 
@@ -383,6 +527,7 @@ def asm_init_res():
     SYMBOL.clear()
     SYMBOL_V.clear()
     SYMBOL_EQ.clear()
+    SYMBOL_EQ_ID.clear()
     del INVALID_SYMBOL[:]
     del NON_REF_SYMBOL[:]
 
@@ -392,3 +537,26 @@ def asm_init_res():
 
     USING_MAP.clear()
     ACTIVE_USING.clear()
+    USING_INDEX.clear()
+
+
+ASM_RES = [                     # resources built by pass 1 and pass 2
+                                # (STATEMENT can be rebuilt from SYSUT1)
+    'INFO', 'TITLE', 'MNEMONIC', 'MNEMONIC_LOC', 'RELOCATE_OFFSET',
+    'OBJMOD', 'ESD', 'ESD_ID',
+    'SYMBOL', 'SYMBOL_V', 'SYMBOL_EQ', 'SYMBOL_EQ_ID',
+    'INVALID_SYMBOL', 'NON_REF_SYMBOL',
+    'DSECT_CR', 'RLD', 'USING_MAP', 'ACTIVE_USING', 'USING_INDEX',
+    ]
+def asm_save_res():
+    '''return a snapshot of the resources; see asm_load_res()'''
+    return dict([ (k, globals()[k]) for k in ASM_RES ])
+
+def asm_load_res(res):
+    '''load back the resources from the snapshot of asm_save_res()'''
+    for k in ASM_RES:
+        if isinstance(globals()[k], dict):
+            globals()[k].clear()
+            globals()[k].update(res[k])
+        else:
+            globals()[k][:] = res[k]
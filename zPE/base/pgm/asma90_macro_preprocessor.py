@@ -1,21 +1,42 @@
 # this contains everything about Macro parsing
+#
+# a macro definition (from MACRO to MEND) is compiled once into an expansion
+# template, which is plain data (so that it can be kept on the disk); the
+# conditional assembly expressions in it are translated into Python
+# expressions, which are compiled into code objects on first use
+#
+# the macros in SYS1.MACLIB are compiled as a whole library; the compiled
+# library is kept on the disk (see asm_lib_load() / asm_lib_dump()), keyed
+# by the source of the macros, so that it is not compiled for every job
+#
+# the expansion of a macro call is memoized on the macro and the operands of
+# the call, if the expansion depends on nothing else (&SYSNDX is put in
+# afterwards; macros using global variables, or using &SYSNDX in conditional
+# assembly, are always expanded)
 
 from zPE.util import *
 from zPE.util.global_config import *
 
 import zPE.base.core.asm
 
+import re
+import hashlib
+
 # relative import resource file
 from asma90_macro_sys1_maclib import MACRO_DEF as MACRO_DEF_SYS1
+from asma90_objmod_cache import asm_lib_load, asm_lib_dump
 
 from time import strftime
 
 
 MACRO_DEF = {
-    # Macro_Name : generation_function(macro_arguments)
+    # Macro_Name : expansion_template (see __COMPILE())
+    }
+MACRO_LIB = {
+    # Macro_Name : expansion_template; the compiled SYS1.MACLIB
     }
-MACRO_ERR = {
-    # SYSNDX : error_msg
+MACRO_MEMO = {
+    # ( template_key, label, operands, sysect, ) : [ generated_line, ... ]
     }
 
 SYS_VAR_SYMBOL = {
@@ -27,91 +48,750 @@ SYS_VAR_SYMBOL = {
     '&SYSPARM' : None, # need info
     }
 
-VAR_SYMBOL = {
-    # local_symbol : value
+GBL_VAR_SYMBOL = {
+    # global_symbol : value
     }
 
-SEQ_SYMBOL = {
-    # sequence_symbol : line_num
+SYS_VAR_USED = {
+    # system_symbol : True; the clock-dependent ones referenced so far
+    }
+
+CODE_CACHE = {
+    # python_expression : code_object
+    }
+PART_CACHE = {
+    # character_string : [ literal / ( var_symbol, subscript, ), ... ]
     }
 
 
+### Supporting Definition
+ACTR = 4096                     # max number of branches in one expansion
+NEST = 255                      # max level of nested macro calls
+
+SYSNDX_MARK = '\0' * 4          # placeholder of &SYSNDX in generated lines
+
+VAR_RE = re.compile(r'&[A-Z@#$_][A-Z0-9@#$_]*')
+SEQ_RE = re.compile(r'\.[A-Z@#$_][A-Z0-9@#$_]*$')
+ATTR_RE = re.compile(r"([NKT])'(&[A-Z@#$_][A-Z0-9@#$_]*)")
+SDT_RE = re.compile(r"([XCB])'((?:[^']|'')*)'")
+WORD_RE = re.compile(r'[A-Z]+')
+OP_RE = re.compile(r'(\S*)\s+(\S+)')
+
+OP_SCAN = [ 'MACRO', 'CSECT', 'DSECT', 'START', 'END', ] # see macro_parse()
+
+OPERATOR = {
+    'EQ' : '==', 'NE' : '!=',
+    'LT' : '<',  'GT' : '>',
+    'LE' : '<=', 'GE' : '>=',
+    'AND' : 'and', 'OR' : 'or', 'NOT' : 'not',
+    }
+### End of Supporting Definition
+
+
 def macro_init():
     SYS_VAR_SYMBOL['&SYSDATE'] = strftime('%m/%d/%Y')
     SYS_VAR_SYMBOL['&SYSTIME'] = strftime('%H.%M')
+    SYS_VAR_SYMBOL['&SYSNDX']  = 0
+    SYS_VAR_SYMBOL['&SYSECT']  = ''
 
+    if not MACRO_LIB:
+        src = ''.join([ '{0}\0{1}'.format(k, MACRO_DEF_SYS1[k])
+                        for k in sorted(MACRO_DEF_SYS1)
+                        ])
+        lib = asm_lib_load(src)
+        if not lib:
+            lib = dict([ ( k, __COMPILE(v.splitlines()), )
+                         for (k, v) in MACRO_DEF_SYS1.iteritems()
+                         ])
+            asm_lib_dump(src, lib)
+        MACRO_LIB.update(lib)
 
-def macro_parse(spi):
-    if not spi.empty():
-        __scanning(spi)
+    MACRO_DEF.clear()
+    MACRO_DEF.update(MACRO_LIB)
+    MACRO_MEMO.clear()
+    GBL_VAR_SYMBOL.clear()
+    SYS_VAR_USED.clear()
 
-def __scanning(spi, line_num = 0):
-    # MACRO definition section
-    while line_num < len(spi):
-        line_num += 1           # start at line No. 1
-        line = spi[line_num - 1]
 
-        field = resplit_sq(r'\s+', line[:-1], 3)
+def macro_time_used():
+    '''
+    return True if any expansion since macro_init() referenced &SYSTIME
 
-        # non-instruction stuff
-        if len(field) < 2:
-            continue
+    (&SYSDATE is not counted, since it does not change within a day)
+    '''
+    return '&SYSTIME' in SYS_VAR_USED
 
-        # starting point of macro definition
-        elif field[1] == 'MACRO':
-            line_num = __defining(spi, line_num + 1)
 
-        # first non-macro-def statement -> end of the current section
-        else:
-            line_num -= 1       # put back the line just read
-            break               # goto the next section
-
-    # ASM section
+def macro_parse(spi):
+    '''
+    expand the macro calls in the input SPOOL (up to the END statement)
+
+    the generated lines are inserted right after the call, with the nesting
+    level and the name of the macro as their deck ID
+    '''
+    if spi.empty():
+        return
+
+    new_line = [ ]
+    new_did  = [ ]
+    def emit(line, deck_id):
+        new_line.append(line)
+        new_did.append(deck_id)
+
+    macro = None                # lines of the macro being defined
+    line_num = 0
     while line_num < len(spi):
-        line_num += 1           # start at line No. 1
-        line = spi[line_num - 1]
-
+        line = spi[line_num]
+        deck_id = spi.deck_id(line_num)
+        line_num += 1
+        emit(line, deck_id)
+
+        if line[0] == '*'  or  line.startswith('.*'):
+            continue            # comment
+        res = OP_RE.match(line)
+        if ( macro == None  and  res  and  "'" not in res.group()  and
+             res.group(2) not in MACRO_DEF  and  res.group(2) not in OP_SCAN
+             ):
+            continue            # cannot be a macro call; skip tokenizing
         field = resplit_sq(r'\s+', line[:-1], 3)
-
-        # non-instruction stuff
         if len(field) < 2:
             continue
 
-        # machine instruction
-        elif zPE.base.core.asm.valid_op(field[1]):
+        # in-line macro definition
+        if field[1] == 'MACRO':
+            if macro != None:
+                mark4future('Nested Macro Definition')
+            macro = [ ]
+        if macro != None:
+            macro.append(line[:-1])
+            if field[1] == 'MEND':
+                __DEFINE(macro)
+                macro = None
             continue
 
-        # ASM instruction
-        elif zPE.base.core.asm.valid_ins(field[1]):
-            continue
+        __SCAN(field, 0, emit)
+        if field[1] == 'END':
+            break
 
-        # in-line macro
-        elif field[1] in MACRO_DEF:
-            pass                # expend here
+    spi.spool = new_line + spi.spool[line_num:]
+    spi.spdid = new_did  + spi.spdid[line_num:]
 
-        # lib macro
-        elif field[1] in MACRO_DEF_SYS1:
-            pass                # expend here
 
+### Supporting Functions
+def __SCAN(field, level, emit):
+    '''expand the statement if it is a macro call; rescan generated lines'''
+    if field[1] in [ 'CSECT', 'DSECT', 'START', ]:
+        SYS_VAR_SYMBOL['&SYSECT'] = field[0]
+        return
 
-def __defining(spi, line_num):
-    while line_num < len(spi):
-        line_num += 1           # start at line No. 1
-        line = spi[line_num - 1]
+    if ( zPE.base.core.asm.valid_op(field[1])   or
+         zPE.base.core.asm.valid_ins(field[1])  or
+         field[1] not in MACRO_DEF
+         ):
+        return                  # not a macro call
 
-        field = resplit_sq(r'\s+', line[:-1], 3)
-# try parsing .labels and &labels
-#        var_lbl = zPE.bad_(field[0])
+    if level >= NEST:
+        abort(90, 'Error: ', field[1], ': Macro calls nested too deep.\n')
+    deck_id = '{0:<8}'.format('{0:0>2}-{1}'.format(level + 1, field[1]))[:8]
 
-        # comment
-        if field[0].startswith('.*'):
+    for line in __EXPAND(MACRO_DEF[field[1]], field[0], field[2:3]):
+        emit(line, deck_id)
+        if line[0] == '*':
+            continue
+        gen_field = resplit_sq(r'\s+', line[:-1], 3)
+        if len(gen_field) > 1:
+            __SCAN(gen_field, level + 1, emit)
+
+
+def __DEFINE(lines):
+    '''compile an in-line macro definition and add it to MACRO_DEF'''
+    src = '\n'.join(lines)
+    defn = asm_lib_load(src)
+    if not defn:
+        defn = __COMPILE(lines)
+        asm_lib_dump(src, defn)
+    MACRO_DEF[defn['name']] = defn
+
+
+## macro compiler
+def __COMPILE(lines):
+    '''
+    compile the macro definition into an expansion template:
+      { 'key'    : hash of the definition,
+        'name'   : name of the macro,
+        'label'  : name parameter (the label of the prototype) or None,
+        'pos'    : [ positional_parameter, ... ],
+        'kwd'    : [ ( keyword_parameter, default_value, ), ... ],
+        'body'   : [ ( op, ... ), ... ],  // see below
+        'seq'    : { sequence_symbol : index_in_body },
+        'sysect' : whether &SYSECT is used,
+        'memo'   : whether the expansion can be memoized,
+        }
+    body statement:
+      ( 'MODEL', label_part, op_part, operand_part, remark, )
+      ( 'LCLx' / 'GBLx', [ ( var_symbol, dimensioned, ), ... ], )
+      ( 'SETA' / 'SETB' / 'SETC', var_symbol, subscript, expression, )
+      ( 'AIF', expression, sequence_symbol, )
+      ( 'AGO', sequence_symbol, )
+      ( 'ANOP', )
+      ( 'MEXIT', )
+      ( 'MNOTE', operand_part, )
+    where expressions are Python expressions (see __TRANSLATE()), and parts
+    are character strings broken down by __PARTS()
+    '''
+    lines = [ line[:72].rstrip() for line in lines
+              if line.strip()  and  not line.startswith('.*')
+              ]
+    if ( len(lines) < 3  or
+         __SPLIT_STMT(lines[0])[1] != 'MACRO'  or
+         __SPLIT_STMT(lines[-1])[1] != 'MEND'
+         ):
+        abort(90, 'Error: Invalid macro definition.\n')
+
+    # parse the prototype
+    ( lbl, name, operand, remark ) = __SPLIT_STMT(lines[1])
+    if not name  or  name[0] in '&.':
+        abort(90, 'Error: ', lines[1], ': Invalid macro prototype.\n')
+    defn = {
+        'key'    : hashlib.sha1('\n'.join(lines)).hexdigest(),
+        'name'   : name,
+        'label'  : lbl or None,
+        'pos'    : [ ],
+        'kwd'    : [ ],
+        'body'   : [ ],
+        'seq'    : { },
+        'sysect' : False,
+        'memo'   : True,
+        }
+    if lbl  and  not VAR_RE.match(lbl):
+        abort(90, 'Error: ', lines[1], ': Invalid name parameter.\n')
+    for parm in __SPLIT_LIST(operand):
+        if '=' in parm:
+            ( parm, dflt ) = parm.split('=', 1)
+            defn['kwd'].append( ( parm, dflt, ) )
+        else:
+            defn['pos'].append(parm)
+        if not VAR_RE.match(parm)  or  VAR_RE.match(parm).end() != len(parm):
+            abort(90, 'Error: ', lines[1], ': Invalid macro parameter.\n')
+
+    # parse the body
+    body = defn['body']
+    for line in lines[2:-1]:
+        if line[0] == '*':      # comment to be generated
+            body.append( ( 'MODEL', None, None, None, line, ) )
             continue
 
-        # check instruction
-        if len(field) < 2:
-            abort(90, 'Error: ', line[:-1], ': Invalid macro statement.\n')
-
-        # ending point of macro definition
-        elif field[1] == 'MEND':
-            return line_num
+        ( lbl, op, operand, remark ) = __SPLIT_STMT(line)
+        if SEQ_RE.match(lbl):
+            if lbl in defn['seq']:
+                abort(90, 'Error: ', line, ': Duplicate sequence symbol.\n')
+            defn['seq'][lbl] = len(body)
+            lbl = ''
+        if op in [ 'LCLA', 'LCLB', 'LCLC', 'GBLA', 'GBLB', 'GBLC', ]:
+            var = [ ]
+            for sym in __SPLIT_LIST(operand):
+                dim = sym.endswith(')')
+                if dim:
+                    sym = sym[:sym.index('(')]
+                if not VAR_RE.match(sym):
+                    abort(90, 'Error: ', line, ': Invalid variable symbol.\n')
+                var.append( ( sym, dim, ) )
+            body.append( ( op, var, ) )
+            if op[:3] == 'GBL':
+                defn['memo'] = False
+        elif op in [ 'SETA', 'SETB', 'SETC', ]:
+            res = VAR_RE.match(lbl)
+            if not res:
+                abort(90, 'Error: ', line, ': Invalid SET symbol.\n')
+            if res.end() < len(lbl):
+                if lbl[res.end()] != '(' or lbl[-1] != ')':
+                    abort(90, 'Error: ', line, ': Invalid SET symbol.\n')
+                sub = __TRANSLATE(lbl[res.end() + 1 : -1], line)
+            else:
+                sub = None
+            body.append( ( op, res.group(), sub,
+                           __TRANSLATE(operand, line), ) )
+        elif op == 'AIF':
+            indx = __CLOSE_PAREN(operand, 0)
+            if not operand.startswith('(')  or  indx < 0:
+                abort(90, 'Error: ', line, ': Invalid AIF operand.\n')
+            body.append( ( 'AIF', __TRANSLATE(operand[:indx + 1], line),
+                           operand[indx + 1 :], ) )
+        elif op == 'AGO':
+            body.append( ( 'AGO', operand, ) )
+        elif op == 'ANOP':
+            body.append( ( 'ANOP', ) )
+        elif op == 'MEXIT':
+            body.append( ( 'MEXIT', ) )
+        elif op == 'MNOTE':
+            if operand.startswith("'")  and  operand.endswith("'"):
+                operand = operand[1:-1].replace("''", "'")
+            body.append( ( 'MNOTE', __PARTS(operand, line), ) )
+        elif op in [ 'MACRO', 'MEND', ]:
+            mark4future('Nested Macro Definition')
+        elif not op:
+            abort(90, 'Error: ', line, ': Invalid macro statement.\n')
+        else:                   # model statement
+            body.append( ( 'MODEL', __PARTS(lbl, line), __PARTS(op, line),
+                           __PARTS(operand, line), remark, ) )
+
+        if '&SYSECT' in line:
+            defn['sysect'] = True
+        if '&SYSNDX' in line  and  body[-1][0] not in [ 'MODEL', 'MNOTE', ]:
+            defn['memo'] = False
+
+    # check the sequence symbols
+    for stmt in body:
+        if stmt[0] in [ 'AIF', 'AGO', ]  and  stmt[-1] not in defn['seq']:
+            abort(90, 'Error: ', name, ' ', stmt[-1],
+                  ': Undefined sequence symbol.\n')
+    return defn
+
+
+def __TRANSLATE(expr, line):
+    '''translate a conditional assembly expression into a Python expression'''
+    rv = [ ]
+    indx = 0
+    while indx < len(expr):
+        ch = expr[indx]
+        prev_alnum = indx > 0  and  expr[indx - 1].isalnum()
+
+        if ch.isspace():
+            indx += 1
+
+        elif ch == "'":         # character string (w/ optional substring)
+            end = __CLOSE_QUOTE(expr, indx)
+            if end < 0:
+                abort(90, 'Error: ', line, ': Unmatched quote.\n')
+            item = 'S({0!r})'.format(expr[indx + 1 : end].replace("''", "'"))
+            indx = end + 1
+            if indx < len(expr)  and  expr[indx] == '(':
+                end = __CLOSE_PAREN(expr, indx)
+                sub = __SPLIT_LIST(expr[indx + 1 : end])
+                if end < 0  or  len(sub) != 2:
+                    abort(90, 'Error: ', line, ': Invalid substring.\n')
+                item = 'SUB({0}, {1}, {2})'.format(
+                    item, __TRANSLATE(sub[0], line), __TRANSLATE(sub[1], line)
+                    )
+                indx = end + 1
+            rv.append(item)
+
+        elif ch == '&':         # variable symbol (w/ optional subscript)
+            res = VAR_RE.match(expr, indx)
+            if not res:
+                abort(90, 'Error: ', line, ': Invalid variable symbol.\n')
+            indx = res.end()
+            if indx < len(expr)  and  expr[indx] == '(':
+                end = __CLOSE_PAREN(expr, indx)
+                if end < 0:
+                    abort(90, 'Error: ', line, ': Unmatched parenthesis.\n')
+                rv.append('A(V({0!r}, {1}))'.format(
+                        res.group(), __TRANSLATE(expr[indx + 1 : end], line)
+                        ))
+                indx = end + 1
+            else:
+                rv.append('A(V({0!r}))'.format(res.group()))
+
+        elif not prev_alnum  and  ATTR_RE.match(expr, indx):
+            res = ATTR_RE.match(expr, indx)
+            rv.append('{0}({1!r})'.format(res.group(1), res.group(2)))
+            indx = res.end()
+
+        elif not prev_alnum  and  SDT_RE.match(expr, indx):
+            res = SDT_RE.match(expr, indx)
+            rv.append(str(__SELF_DEF(res.group(), line)))
+            indx = res.end()
+
+        elif ch.isdigit():
+            res = re.match(r'\d+', expr[indx:])
+            rv.append(str(int(res.group())))
+            indx += len(res.group())
+
+        elif ch.isalpha():
+            res = WORD_RE.match(expr, indx)
+            if res.group() not in OPERATOR:
+                abort(90, 'Error: ', line, ': Invalid operator ',
+                      res.group(), '.\n')
+            rv.append(OPERATOR[res.group()])
+            indx = res.end()
+
+        elif ch in '+-*(),':
+            rv.append(ch)
+            indx += 1
+        elif ch == '/':
+            rv.append('//')     # integer division
+            indx += 1
+        elif ch == '.':
+            rv.append('+')      # concatenation of character strings
+            indx += 1
+        else:
+            abort(90, 'Error: ', line, ': Invalid expression.\n')
+
+    rv = ' '.join(rv)
+    try:
+        __CODE(rv)
+    except SyntaxError:
+        abort(90, 'Error: ', line, ': Invalid expression.\n')
+    return rv
+
+
+def __PARTS(text, line = None):
+    '''
+    break down the character string into literals and variable symbols:
+      [ literal / ( var_symbol, subscript, ), ... ]
+    where subscript is None or a Python expression
+    '''
+    if text in PART_CACHE:
+        return PART_CACHE[text]
+
+    rv = [ ]
+    indx = 0
+    while True:
+        amp = text.find('&', indx)
+        if amp < 0:
+            rv.append(text[indx:])
+            break
+        if text[amp + 1 : amp + 2] == '&':
+            rv.append(text[indx : amp + 2]) # '&&' is not substituted
+            indx = amp + 2
+            continue
 
+        rv.append(text[indx : amp])
+        res = VAR_RE.match(text, amp)
+        if not res:
+            abort(90, 'Error: ', line or text, ': Invalid variable symbol.\n')
+        indx = res.end()
+        sub = None
+        if indx < len(text)  and  text[indx] == '(':
+            end = __CLOSE_PAREN(text, indx)
+            if end < 0:
+                abort(90, 'Error: ', line or text, ': Unmatched parenthesis.\n')
+            sub = __TRANSLATE(text[indx + 1 : end], line or text)
+            indx = end + 1
+        if indx < len(text)  and  text[indx] == '.':
+            indx += 1           # concatenation mark
+        rv.append( ( res.group(), sub, ) )
+
+    rv = [ part for part in rv if part != '' ]
+    PART_CACHE[text] = rv
+    return rv
+
+
+## macro expander
+def __EXPAND(defn, label, operand):
+    '''expand the macro call, and return the generated lines'''
+    SYS_VAR_SYMBOL['&SYSNDX'] += 1
+    sysndx = '{0:0>4}'.format(SYS_VAR_SYMBOL['&SYSNDX'])
+
+    if operand:
+        operand = operand[0]
+    else:
+        operand = ''
+    if defn['memo']:
+        key = ( defn['key'], label, operand,
+                defn['sysect'] and SYS_VAR_SYMBOL['&SYSECT'] or None,
+                )
+        if key not in MACRO_MEMO:
+            MACRO_MEMO[key] = __GENERATE(defn, label, operand, SYSNDX_MARK)
+        lines = MACRO_MEMO[key]
+    else:
+        lines = __GENERATE(defn, label, operand, sysndx)
+    return [ line.replace(SYSNDX_MARK, sysndx) for line in lines ]
+
+
+def __GENERATE(defn, label, operand, sysndx):
+    name = defn['name']
+
+    # bind the parameters
+    parm = { }
+    syslist = [ label ]
+    if defn['label']:
+        parm[defn['label']] = label
+    kwd = dict(defn['kwd'])
+    pos = [ ]
+    for arg in __SPLIT_LIST(operand):
+        res = re.match(r'([A-Z@#$_][A-Z0-9@#$_]*)=', arg)
+        if res  and  '&' + res.group(1) in kwd:
+            kwd['&' + res.group(1)] = arg[res.end():]
+        else:
+            pos.append(arg)
+    syslist.extend(pos)
+    parm.update(kwd)
+    for indx in range(len(defn['pos'])):
+        if indx < len(pos):
+            parm[defn['pos'][indx]] = pos[indx]
+        else:
+            parm[defn['pos'][indx]] = ''
+
+    local = { }                 # local SET symbols
+    glbl  = set()               # global SET symbols declared
+
+    def lookup(sym):
+        if sym in glbl:
+            return GBL_VAR_SYMBOL
+        if sym in local:
+            return local
+        return None
+
+    def V(sym, sub = None, model = False):
+        if sym in parm:
+            if sub == None:
+                return parm[sym]
+            return __ELEMENT(__SUBLIST(parm[sym]), sub)
+        if sym == '&SYSLIST':
+            if sub == None:
+                abort(90, 'Error: ', name, ': &SYSLIST needs a subscript.\n')
+            return __ELEMENT(syslist, sub + 1)
+        if sym == '&SYSNDX':
+            return sysndx
+        if sym in SYS_VAR_SYMBOL:
+            if sym == '&SYSTIME':
+                SYS_VAR_USED[sym] = True
+            return SYS_VAR_SYMBOL[sym] or ''
+        table = lookup(sym)
+        if table == None:
+            abort(90, 'Error: ', name, ' ', sym, ': Undefined variable symbol.\n')
+        val = table[sym]
+        if isinstance(val, dict):
+            if sub == None:
+                abort(90, 'Error: ', name, ' ', sym, ': Subscript required.\n')
+            return val.get(sub, val[None])
+        return val
+
+    def A(val):                 # arithmetic / boolean value
+        if isinstance(val, (int, long, bool)):
+            return int(val)
+        if val.isdigit():
+            return int(val)
+        if SDT_RE.match(val)  and  SDT_RE.match(val).end() == len(val):
+            return __SELF_DEF(val, name)
+        return val              # character value (in comparisons)
+
+    def S(text):                # character string
+        return subst(__PARTS(text))
+
+    def N(sym):
+        if sym in parm:
+            return len(__SUBLIST(parm[sym]))
+        if sym == '&SYSLIST':
+            return len(syslist) - 1
+        val = V(sym)
+        if isinstance(val, dict):
+            return max([ k for k in val if k != None ] or [ 0 ])
+        return 1
+
+    def K(sym):
+        return len(str(V(sym)))
+
+    def T(sym):
+        val = str(V(sym))
+        if not val:
+            return 'O'          # omitted
+        if val.isdigit():
+            return 'N'          # self-defining term
+        return 'U'              # undefined
+
+    def SUB(val, start, length):
+        if start < 1  or  length < 0:
+            abort(90, 'Error: ', name, ': Invalid substring.\n')
+        return val[start - 1 : start - 1 + length]
+
+    env = { '__builtins__' : { },
+            'V' : V, 'A' : A, 'S' : S, 'N' : N, 'K' : K, 'T' : T, 'SUB' : SUB,
+            }
+    def evaluate(expr):
+        try:
+            return eval(__CODE(expr), env)
+        except (TypeError, ValueError, ZeroDivisionError):
+            abort(90, 'Error: ', name, ': Invalid expression value.\n')
+
+    def subst(parts):
+        rv = [ ]
+        for part in parts:
+            if isinstance(part, str):
+                rv.append(part)
+            elif part[1] == None:
+                rv.append(str(V(part[0])))
+            else:
+                rv.append(str(V(part[0], evaluate(part[1]))))
+        return ''.join(rv)
+
+    # run the body
+    body = defn['body']
+    lines = [ ]
+    actr = ACTR
+    indx = 0
+    while indx < len(body):
+        stmt = body[indx]
+        indx += 1
+        op = stmt[0]
+
+        if op == 'MODEL':
+            if stmt[1] == None:         # comment
+                lines.append(stmt[4] + '\n')
+                continue
+            line = '{0:<8} {1:<5} {2}'.format(
+                subst(stmt[1]), subst(stmt[2]), subst(stmt[3])
+                ).rstrip()
+            if stmt[4]:
+                line = '{0} {1}'.format(line, stmt[4])
+            lines.append(line + '\n')
+
+        elif op in [ 'LCLA', 'LCLB', 'LCLC', 'GBLA', 'GBLB', 'GBLC', ]:
+            if op[3] == 'C':
+                init = ''
+            else:
+                init = 0
+            for (sym, dim) in stmt[1]:
+                if op[:3] == 'GBL':
+                    glbl.add(sym)
+                    table = GBL_VAR_SYMBOL
+                    if sym in table:
+                        continue        # keep the global value
+                else:
+                    table = local
+                if dim:
+                    table[sym] = { None : init }
+                else:
+                    table[sym] = init
+
+        elif op in [ 'SETA', 'SETB', 'SETC', ]:
+            val = evaluate(stmt[3])
+            if op == 'SETA':
+                val = A(val)
+                if not isinstance(val, (int, long)):
+                    abort(90, 'Error: ', name, ' ', stmt[1],
+                          ': Invalid arithmetic value.\n')
+            elif op == 'SETB':
+                val = int(bool(val))
+            else:
+                val = str(val)
+            table = lookup(stmt[1])
+            if table == None:
+                table = local   # implicitly declared local SET symbol
+                if stmt[2] != None:
+                    table[stmt[1]] = { None : val.__class__() }
+            if stmt[2] == None:
+                table[stmt[1]] = val
+            else:
+                table[stmt[1]][evaluate(stmt[2])] = val
+
+        elif op in [ 'AIF', 'AGO', ]:
+            if op == 'AGO'  or  evaluate(stmt[1]):
+                actr -= 1
+                if actr < 0:
+                    abort(90, 'Error: ', name,
+                          ': ACTR limit exceeded in macro expansion.\n')
+                indx = defn['seq'][stmt[-1]]
+
+        elif op == 'MNOTE':
+            lines.append('* {0}\n'.format(subst(stmt[1])))
+
+        elif op == 'MEXIT':
+            break
+
+    return lines
+
+
+def __CODE(expr):
+    if expr not in CODE_CACHE:
+        CODE_CACHE[expr] = compile(expr or 'None', '<macro>', 'eval')
+    return CODE_CACHE[expr]
+
+def __SELF_DEF(term, line):
+    '''evaluate a self-defining term: X'..', C'..', or B'..' '''
+    try:
+        if term[0] == 'X':
+            return int(term[2:-1], 16)
+        if term[0] == 'B':
+            return int(term[2:-1], 2)
+        val = 0
+        for ch in term[2:-1].replace("''", "'").replace('&&', '&'):
+            val = val * 256 + ord(ch.encode('EBCDIC-CP-US'))
+        return val
+    except (ValueError, UnicodeError):
+        abort(90, 'Error: ', line, ': Invalid self-defining term.\n')
+
+
+def __SUBLIST(val):
+    if val.startswith('(')  and  __CLOSE_PAREN(val, 0) == len(val) - 1:
+        return __SPLIT_LIST(val[1:-1])
+    if val:
+        return [ val ]
+    return [ ]
+
+def __ELEMENT(sublist, sub):
+    if not isinstance(sub, int)  or  sub < 1:
+        abort(90, 'Error: ', str(sub), ': Invalid subscript.\n')
+    if sub > len(sublist):
+        return ''
+    return sublist[sub - 1]
+
+
+def __SPLIT_STMT(line):
+    '''
+    split the statement into ( label, op, operand, remark, ); the operand
+    ends at the first space that is not quoted nor parenthesized
+    '''
+    res = re.match(r'(\S*)\s*(\S*)\s*', line)
+    ( lbl, op ) = res.groups()
+    indx = res.end()
+    end = __SCAN_OPERAND(line, indx, ' ')
+    return ( lbl, op, line[indx:end], line[end:].strip(), )
+
+def __SPLIT_LIST(text):
+    '''split the operand on the commas that are not quoted nor parenthesized'''
+    rv = [ ]
+    indx = 0
+    while indx <= len(text)  and  text:
+        end = __SCAN_OPERAND(text, indx, ',')
+        rv.append(text[indx:end])
+        indx = end + 1
+    return rv
+
+def __SCAN_OPERAND(text, indx, dlm):
+    '''return the index of the first dlm not quoted nor parenthesized'''
+    depth = 0
+    quoted = False
+    while indx < len(text):
+        ch = text[indx]
+        if ch == "'":
+            if not quoted  and  __IS_ATTR(text, indx):
+                pass            # attribute reference, e.g. N'&X
+            else:
+                quoted = not quoted
+        elif quoted:
+            pass
+        elif ch == dlm  and  depth <= 0:
+            break
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        indx += 1
+    return indx
+
+def __IS_ATTR(text, indx):
+    return ( indx > 0  and  text[indx - 1] in 'LNKTDISO'  and
+             ( indx < 2  or  not text[indx - 2].isalnum() )  and
+             text[indx + 1 : indx + 2] not in [ '', "'", ]  and
+             ( text[indx + 1] == '&'  or  text[indx + 1].isalpha() )
+             )
+
+def __CLOSE_QUOTE(text, indx):
+    '''return the index of the quote closing the one at indx, or -1'''
+    indx += 1
+    while indx < len(text):
+        if text[indx] == "'":
+            if text[indx + 1 : indx + 2] != "'":
+                return indx
+            indx += 1           # skip the '' pair
+        indx += 1
+    return -1
+
+def __CLOSE_PAREN(text, indx):
+    '''return the index of the parenthesis closing the one at indx, or -1'''
+    end = __SCAN_OPERAND(text, indx + 1, ')')
+    if end < len(text):
+        return end
+    return -1
@@ -1,27 +1,62 @@
-MACRO_DEF = {
-    # X-Macros
-    'XDUMP'  : lambda args: [
-        ],
-
-    # IBM Structured Macros
-    'IF'     : lambda args: [
-        ],
-    'ELSEIF' : lambda args: [
-        ],
-    'ELSE'   : lambda: [
-        ],
-    'ENDIF'  : lambda: [
-        ],
+# this is the source of the macros in SYS1.MACLIB
+#
+# the macros are written in the macro language, and are compiled by
+# asma90_macro_preprocessor on first use (the compiled library is kept on
+# the disk; see macro_init())
 
-    'SELECT' : lambda args: [
-        ],
-    'WHEN'   : lambda args: [
-        ],
-    'ENDSEL' : lambda: [
-        ],
+MACRO_DEF = {
+    # Macro_Name : macro_definition (from MACRO to MEND)
+    'SAVE'   : '''\
+         MACRO
+&NAME    SAVE  &REGS,&T,&ID
+         LCLA  &R1,&R2,&OFF
+&R1      SETA  &REGS(1)
+&R2      SETA  &R1
+         AIF   (N'&REGS LT 2).ONE
+&R2      SETA  &REGS(2)
+.ONE     ANOP
+&OFF     SETA  &R1*4+20
+         AIF   (&R1 LT 14).OFFOK
+&OFF     SETA  &R1*4-44
+.OFFOK   AIF   (&R1 EQ &R2).SINGLE
+&NAME    STM   &R1,&R2,&OFF.(13)
+         MEXIT
+.SINGLE  ANOP
+&NAME    ST    &R1,&OFF.(13)
+         MEND
+''',
 
-    'DO'     : lambda args: [
-        ],
-    'ENDDO'  : lambda: [
-        ],
+    'RETURN' : '''\
+         MACRO
+&NAME    RETURN &REGS,&T,&RC=
+         LCLA  &R1,&R2,&OFF
+         AIF   ('&REGS' NE '').REGS
+&NAME    DS    0H
+         AGO   .FLAG
+.REGS    ANOP
+&R1      SETA  &REGS(1)
+&R2      SETA  &R1
+         AIF   (N'&REGS LT 2).ONE
+&R2      SETA  &REGS(2)
+.ONE     ANOP
+&OFF     SETA  &R1*4+20
+         AIF   (&R1 LT 14).OFFOK
+&OFF     SETA  &R1*4-44
+.OFFOK   AIF   ('&RC' NE '(15)' OR &R1 NE 14 OR &R2 GT 12).LOAD
+&NAME    L     14,12(13)
+         LM    0,&R2,20(13)
+         AGO   .FLAG
+.LOAD    AIF   (&R1 EQ &R2).SINGLE
+&NAME    LM    &R1,&R2,&OFF.(13)
+         AGO   .FLAG
+.SINGLE  ANOP
+&NAME    L     &R1,&OFF.(13)
+.FLAG    AIF   ('&T' NE 'T').CODE
+         MVI   12(13),X'FF'
+.CODE    AIF   ('&RC' EQ '' OR '&RC' EQ '(15)').EXIT
+         LA    15,&RC
+.EXIT    ANOP
+         BR    14
+         MEND
+''',
     }
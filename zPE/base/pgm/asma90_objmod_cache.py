@@ -0,0 +1,210 @@
+# this is the definition of the Object Module Cache
+#
+# the result of an assembly (the sketch file, the object module, and the
+# resources needed to reproduce the listing) is kept on the disk, keyed by
+# the source statements, the assembler options, the assembler itself, and
+# the date of the assembly (which goes into the END record and &SYSDATE);
+# a source that is submitted again can then skip pass 1 and pass 2
+#
+# an assembly whose macro expansions referenced &SYSTIME is not cached,
+# since its result changes every minute
+#
+# the compiled macro definitions (see asma90_macro_preprocessor) are kept
+# in the same place, keyed by the source of the macros
+#
+# the assembler is fingerprinted by the version of the simulator and the
+# sources of the modules in ASM_SRC; the cache is disabled if the sources
+# cannot be read (e.g. on a .pyc-only or zipped install)
+#
+# the cache is capped at Config['objmod_cache'] object modules (and
+# MACLIB_PER_OBJMOD times of that number of macro libraries);
+# the least recently used entries are evicted first
+
+from zPE import pkg_info
+from zPE.util import *
+from zPE.util.global_config import *
+
+import zPE.base.core.asm as core_asm
+
+import os, re
+import hashlib
+import cPickle as pickle
+from time import strftime
+
+from asma90_config import *
+
+
+### Supporting Definition
+ASM_SRC = [                     # modules whose code affect the assembly
+    os.path.join('base', 'pgm', 'ASMA90.py'),
+    os.path.join('base', 'pgm', 'asma90_config.py'),
+    os.path.join('base', 'pgm', 'asma90_err_code_rc.py'),
+    os.path.join('base', 'pgm', 'asma90_macro_preprocessor.py'),
+    os.path.join('base', 'pgm', 'asma90_macro_sys1_maclib.py'),
+    os.path.join('base', 'pgm', 'asma90_objmod_spec.py'),
+    os.path.join('base', 'pgm', 'assist_pseudo_ins.py'),
+    os.path.join('base', 'core', 'asm.py'),
+    ]
+ASM_VERSION = [ ]               # fingerprint of the above; computed on demand
+                                # None if any of them cannot be read
+
+OBJMOD_EXT = '.objmod'
+MACLIB_EXT = '.maclib'
+MACLIB_PER_OBJMOD = 16          # macro entries kept per object module
+### End of Supporting Definition
+
+
+def asm_cache_key(spi):
+    '''
+    compute the cache key of the source in the input SPOOL
+
+    return ( key, line_cnt, ), where line_cnt is the number of lines pass 1
+    would consume (up to and including the END statement); or None if the
+    source cannot be cached (e.g. it has no END statement)
+    '''
+    if not __ENABLED():
+        return None
+
+    line_cnt = __SCAN_SOURCE(spi)
+    if not line_cnt:
+        return None
+
+    digest = hashlib.sha1(__ASM_VERSION())
+    digest.update(strftime('%Y%j')) # assembly date; see __APPEND_END()
+    digest.update(repr(sorted([ # STATS only affects the reports
+                    (k, v) for (k, v) in ASM_PARM.iteritems()
+                    if k != 'STATS'
+                    ])))
+    digest.update(repr(sorted([ # MEM_POS only places the sketch memory
+                    (k, v) for (k, v) in ASM_CONFIG.iteritems()
+                    if k != 'MEM_POS'
+                    ])))
+    digest.update(repr(sorted(core_asm.pseudo))) # ASSIST pseudo-instructions
+    for indx in range(line_cnt):
+        digest.update('{0}\0{1}\n'.format(spi[indx], spi.deck_id(indx)))
+    return ( digest.hexdigest(), line_cnt, )
+
+
+def asm_cache_load(key):
+    '''return the cached entry of the key, or None if not cached'''
+    return __LOAD(__PATH(key, OBJMOD_EXT))
+
+def asm_cache_dump(key, entry):
+    '''store the entry under the key, and evict the least recently used'''
+    __DUMP(__PATH(key, OBJMOD_EXT), entry)
+    __EVICT(OBJMOD_EXT, Config['objmod_cache'])
+
+
+def asm_lib_load(src):
+    '''return the compiled macros of the source, or None if not cached'''
+    if not __ENABLED():
+        return None
+    return __LOAD(__PATH(__LIB_KEY(src), MACLIB_EXT))
+
+def asm_lib_dump(src, entry):
+    '''store the compiled macros of the source'''
+    if not __ENABLED():
+        return
+    __DUMP(__PATH(__LIB_KEY(src), MACLIB_EXT), entry)
+    __EVICT(MACLIB_EXT, Config['objmod_cache'] * MACLIB_PER_OBJMOD)
+
+
+### Supporting Functions
+def __ENABLED():
+    return ( Config.get('objmod_cache', 0)  and  not debug_mode()  and
+             __ASM_VERSION() != None
+             )
+
+def __ASM_VERSION():
+    if not ASM_VERSION:
+        try:
+            digest = hashlib.sha1(pkg_info().version)
+        except:                 # running from the source tree
+            digest = hashlib.sha1()
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+                    os.path.abspath(__file__)
+                    )))         # the zPE package
+        for src in ASM_SRC:
+            try:
+                digest.update(open(os.path.join(root, src), 'rb').read())
+            except IOError:     # cannot tell whether the source changed
+                digest = None
+                break
+        ASM_VERSION.append(digest and digest.hexdigest())
+    return ASM_VERSION[0]
+
+def __LIB_KEY(src):
+    digest = hashlib.sha1(__ASM_VERSION())
+    digest.update(src)
+    return digest.hexdigest()
+
+def __PATH(key, ext):
+    return os.path.join(CONFIG_PATH['objmod'], key + ext)
+
+def __LOAD(path):
+    try:
+        fp = open(path, 'rb')
+        try:
+            entry = pickle.load(fp)
+        finally:
+            fp.close()
+        os.utime(path, None)    # mark as recently used
+    except:                     # not cached, or broken entry
+        return None
+    return entry
+
+def __DUMP(path, entry):
+    if not os.path.isdir(CONFIG_PATH['objmod']):
+        os.makedirs(CONFIG_PATH['objmod'])
+
+    tmp = '{0}.{1}.tmp'.format(path, os.getpid()) # one per zsub process
+    fp = open(tmp, 'wb')
+    try:
+        pickle.dump(entry, fp, pickle.HIGHEST_PROTOCOL)
+    finally:
+        fp.close()
+    replace_file(tmp, path)     # never leave a partial entry
+
+def __EVICT(ext, limit):
+    entries = [ ]
+    for fn in os.listdir(CONFIG_PATH['objmod']):
+        if fn.endswith(ext):
+            try:
+                entries.append( ( os.path.getmtime(
+                            os.path.join(CONFIG_PATH['objmod'], fn)
+                            ), fn, ) )
+            except OSError:     # evicted by another zsub
+                pass
+    entries.sort()
+    for (mtime, fn) in entries[: max(len(entries) - limit, 0)]:
+        try:
+            os.remove(os.path.join(CONFIG_PATH['objmod'], fn))
+        except OSError:         # evicted by another zsub
+            pass
+
+def __SCAN_SOURCE(spi):
+    '''
+    return the number of lines up to the END statement (0 if no END)
+    '''
+    skip_until = None
+    for indx in range(len(spi)):
+        line = spi[indx]
+        res = re.match(r"(\S*)\s+(\S+)", line)
+        if res  and  "'" not in res.group():
+            op = res.group(2)
+        else:                   # let the pass 1 tokenizer decide
+            field = resplit_sq(r'\s+', line[:-1], 3)
+            if len(field) > 1:
+                op = field[1]
+            else:
+                op = None
+
+        # same as the checks in pass 1
+        if op == 'MACRO':
+            skip_until = 'MEND'
+        if skip_until:
+            if op == skip_until:
+                skip_until = None
+        elif line[0] != '*'  and  op == 'END':
+            return indx + 1
+    return 0
@@ -1,4 +1,68 @@
-from zPE.util.conv import *
+# this is the definition of the Object Module records
+#
+# each record is an 80-byte card image of raw bytes (EBCDIC for the text
+# fields); the assembler writes them directly with the formatters in
+# REC_FMT, and the loader reads them back with the parsers in REC_PARSE,
+# both of which use the struct layouts in REC_LAYOUT
+#
+# Note: the 3-byte addresses / lengths have no struct format code; they are
+#       kept as strings of raw bytes, see i2b3() and b32i()
+
+import struct
+from binascii import a2b_hex
+
+
+### Supporting Definition
+CARD_LEN  = 80                  # length of a record
+TEXT_LEN  = 56                  # max length of the data of a TXT / RLD record
+ESD_VF_SZ = 16                  # length of an ESD variable field item
+IDR_SZ    = 19                  # length of an END IDR item
+
+REC_LAYOUT = {                  # record type -> struct layout of the record
+    'ESD' : struct.Struct('>c3s6sH2s2s48s8s8s'),
+    'TXT' : struct.Struct('>c3sc3s2sH2sH56s8s'),
+    'RLD' : struct.Struct('>c3s6sH4s56s8s'),
+    'END' : struct.Struct('>c3sc3s6s2s8s4s4sc19s19sc8s'),
+    'SYM' : struct.Struct('>c3s6sH4s56s8s'),
+    }
+ESD_VF  = struct.Struct('>8sc3sc3s')    # ESD variable field item
+RLD_DF8 = struct.Struct('>HHc3s')       # RLD data field (full format)
+RLD_DF4 = struct.Struct('>c3s')         # RLD data field (pack format)
+
+def ebcdic(src, length = None):
+    '''encode the string into EBCDIC, padded with spaces to the length'''
+    if length == None:
+        length = len(src)
+    return '{0:<{1}}'.format(src, length)[:length].encode('EBCDIC-CP-US')
+
+REC_TP = {                      # record type -> EBCDIC of the type (byte 2-4)
+    'ESD' : ebcdic('ESD'),
+    'TXT' : ebcdic('TXT'),
+    'RLD' : ebcdic('RLD'),
+    'END' : ebcdic('END'),
+    'SYM' : ebcdic('SYM'),
+    }
+REC_ID = '\x02'                 # byte 1 of all records
+BLANK  = ebcdic(' ')            # EBCDIC space
+### End of Supporting Definition
+
+
+def i2b3(src):
+    '''encode an integer into 3 bytes, big endian'''
+    return struct.pack('>I', src)[1:]
+
+def b32i(src):
+    '''decode 3 bytes (big endian) into an integer'''
+    return struct.unpack('>I', '\0' + src)[0]
+
+def rec_type(rec):
+    '''return the type of the record, or None if not an object module record'''
+    if rec[:1] != REC_ID  or  len(rec) != CARD_LEN:
+        return None
+    for (k, v) in REC_TP.iteritems():
+        if rec[1:4] == v:
+            return k
+    return None
 
 
 # general
@@ -10,24 +74,24 @@ def deck_id(title, sequence):# 73-80 : Deck ID + sequence number
         Deck sequence number
     '''
     if len(title) == 8:
-        return c2x(title)
+        return ebcdic(title)
     else:                        # has room for sequence number
         # get the last `seq_len` digit of the sequence number
         seq_len = 8 - len(title)
         seq = '{0:0>{1}}'.format(sequence, seq_len)[-seq_len : ]
 
-        return c2x('{0}{1}'.format(title, seq))
+        return ebcdic('{0}{1}'.format(title, seq))
 
 
 # for ESD record
 def esd_id(sym):
     if sym.type == 'LD':
-        return c2x('  ')        # blank
-    return '{0:0>4}'.format(i2h(sym.id))
+        return BLANK * 2
+    return struct.pack('>H', sym.id)
 
 def esd_vf(vf, indx):
     if indx >= len(vf):
-        return c2x('{0:16}'.format('')) # 16 spaces
+        return BLANK * ESD_VF_SZ
 
     sym = vf[indx][1]
 
@@ -38,27 +102,23 @@ def esd_vf(vf, indx):
         addr = sym.addr
     # byte 14-16
     if sym.type == 'ER':
-        last = c2x(' ' * 3)
+        last = BLANK * 3
     elif sym.type == 'LD':
-        last = '{0:0>6}'.format(i2h(sym.id))
+        last = i2b3(sym.id)
     else:
-        last = '{0:0>6}'.format(i2h(sym.length))
+        last = i2b3(sym.length)
 
-    return ''.join([
-            c2x(vf[indx][0]),           # 01-08 : External symbol name
-            sym.type_code(),            # 09    : ESD type code
-            '{0:0>6}'.format(i2h(addr)),# 10-12 : Address
-            sym.flags(),                # 13    : Flag
-            last,                       # 14-16 : Length, LDID, or space
-            ])
+    return ESD_VF.pack(
+        ebcdic(vf[indx][0], 8),         # 01-08 : External symbol name
+        a2b_hex(sym.type_code()),       # 09    : ESD type code
+        i2b3(addr),                     # 10-12 : Address
+        a2b_hex(sym.flags()),           # 13    : Flag
+        last,                           # 14-16 : Length, LDID, or space
+        )
 
 # for TXT record
 def txt_ds(ds):
-    rv = ds
-    rv_len = len(ds) / 2
-    if rv_len < 56:       # fill with tailing spaces
-        rv += c2x('{0:{1}}'.format('', 56 - rv_len))
-    return rv
+    return '{0:{1}<{2}}'.format(ds, BLANK, TEXT_LEN) # fill with tailing spaces
 
 # for RLD record
 def rld_flag(df, indx):
@@ -70,120 +130,114 @@ def rld_flag(df, indx):
     if indx + 1 < len(df) and df[indx + 1][0] == 4:
         # next entry uses pack format
         bits += 1
-    return i2h(bits)[-1]
+    return chr(('AV'.index(df[indx][1].type) << 4) | (bits & 0x0F))
 
 def rld_df(df):
     df_list = []
     for indx in range(len(df)):
         if df[indx][0] == 8:
             # full record
-            df_list.append(             # 01-02 : Relocation ESDID
-                '{0:0>4}'.format(i2h(df[indx][3]))
-                )
-            df_list.append(             # 03-04 : Position ESDID
-                '{0:0>4}'.format(i2h(df[indx][2]))
-                )
-        df_list.append(                 # 05    : Flag
-            '{0}{1}'.format('AV'.index(df[indx][1].type), rld_flag(df, indx))
-            )
-        df_list.append(                 # 06-08 : Address
-            '{0:0>6}'.format(i2h(df[indx][1].addr))
-            )
-
-    rv = ''.join(df_list)
-    rv_len = len(rv) / 2
-    if rv_len < 56:       # fill with tailing spaces
-        rv += c2x('{0:{1}}'.format('', 56 - rv_len))
-    return rv
+            df_list.append(RLD_DF8.pack(
+                    df[indx][3],                # 01-02 : Relocation ESDID
+                    df[indx][2],                # 03-04 : Position ESDID
+                    rld_flag(df, indx),         # 05    : Flag
+                    i2b3(df[indx][1].addr),     # 06-08 : Address
+                    ))
+        else:
+            df_list.append(RLD_DF4.pack(
+                    rld_flag(df, indx),         # 05    : Flag
+                    i2b3(df[indx][1].addr),     # 06-08 : Address
+                    ))
+    return txt_ds(''.join(df_list))     # fill with tailing spaces
 
 # for END record
 def end_fill(src, length):
     if isinstance(src, int):
-        return '{0:0>{1}}'.format(i2h(src), length * 2)
+        return struct.pack('>Q', src)[-length:]
     else:
-        return c2x('{0:<{1}}'.format(src, length))
+        return ebcdic(src, length)
 
 def end_cnt_idr(idr):
     if len(idr):
-        return c2x('{0}'.format(len(idr))) # EBCDIC 1 or 2
+        return ebcdic(str(len(idr))) # EBCDIC 1 or 2
     else:
-        return c2x(' ')         # blank if not present
+        return BLANK            # blank if not present
 
 def end_idr(idr, indx):
     if indx >= len(idr):
-        return c2x('{0:19}'.format('')) # 19 spaces
+        return BLANK * IDR_SZ
 
-    return ''.join([
-            c2x(idr[indx]['translator id']), # 01-09 : Translator identification
-            c2x(' '),                        # 10    : Space
-            c2x(idr[indx]['ver + release']), # 11-14 : Version and release level
-            c2x(idr[indx]['assembly date']), # 15-19 : date of assembly (yyddd)
-            ])
+    return ebcdic(''.join([
+                idr[indx]['translator id'], # 01-09 : Translator identification
+                ' ',                        # 10    : Space
+                idr[indx]['ver + release'], # 11-14 : Version and release level
+                idr[indx]['assembly date'], # 15-19 : date of assembly (yyddd)
+                ]), IDR_SZ)
 
 # for SYM record
 def sym_vf(vf):
-    return c2x('{0:56}'.format('Need Information')) # need info
+    return ebcdic('Need Information', TEXT_LEN) # need info
 
 
+# Note: the deck ID (byte 73-80) is left blank by the formatters; it is
+#       filled in when the record is written out (see ASMA90.obj_mod_gen())
 REC_FMT = {                 # record formatter
     # External symbol dictionary records describe external symbols
     # used in the program
-    'ESD' : lambda vf : ''.join([
+    'ESD' : lambda vf : REC_LAYOUT['ESD'].pack(
             # vf  : variable field (1~3 [ Symbol, ExternalSymbol ] pair(s))
             # am  : AMODE (24, 31, or 64)
             # rm  : RMODE (24, 31, or 64)
-            '02',                       # 01    : X'02'
-            c2x('ESD'),                 # 02-04 : ESD
-            c2x('{0:6}'.format('')),    # 05-10 : Space
-            '{0:0>4}'.format(           # 11-12 : Variable field count
-                i2h(len(vf) * 16)       #         (number of bytes of vf)
-                ),
-            c2x('{0:2}'.format('')),    # 13-14 : Space
+            REC_ID,                     # 01    : X'02'
+            REC_TP['ESD'],              # 02-04 : ESD
+            BLANK * 6,                  # 05-10 : Space
+            len(vf) * ESD_VF_SZ,        # 11-12 : Variable field count
+                                        #         (number of bytes of vf)
+            BLANK * 2,                  # 13-14 : Space
             esd_id(vf[0][1]),           # 15-16 : ESDID of first SD, XD,
                                         #         CM, PC, ER, or WX in vf;
                                         #         blank for LD items
-            esd_vf(vf, 0),              # 17-32 : Variable field item 1
-            esd_vf(vf, 1),              # 33-48 : Variable field item 2
-            esd_vf(vf, 2),              # 49-64 : Variable field item 3
-            c2x('{0:8}'.format('')),    # 65-72 : Space
-            ]),
+            ''.join([                   # 17-64 : Variable field item 1 - 3
+                    esd_vf(vf, 0), esd_vf(vf, 1), esd_vf(vf, 2),
+                    ]),
+            BLANK * 8,                  # 65-72 : Space
+            BLANK * 8,                  # 73-80 : Deck ID
+            ),
     # Text records describe object code generated
-    'TXT' : lambda scp, loc, ds : ''.join([
+    'TXT' : lambda scp, loc, ds : REC_LAYOUT['TXT'].pack(
             # scp : ESDID (scope id)
             # loc : location of the first instruction
-            # ds  : Data stream
-            '02',                       # 01    : X'02'
-            c2x('TXT'),                 # 02-04 : TXT
-            c2x(' '),                   # 05    : Space
-            '{0:0>6}'.format(i2h(loc)), # 06-08 : Relative address of instrction
-            c2x('{0:2}'.format('')),    # 09-10 : Space
-            '{0:0>4}'.format(           # 11-12 : Byte count
-                i2h(len(ds) / 2)
-                ),
-            c2x('{0:2}'.format('')),    # 13-14 : Space
-            '{0:0>4}'.format(i2h(scp)), # 15-16 : ESDID (scope id)
+            # ds  : Data stream (raw bytes)
+            REC_ID,                     # 01    : X'02'
+            REC_TP['TXT'],              # 02-04 : TXT
+            BLANK,                      # 05    : Space
+            i2b3(loc),                  # 06-08 : Relative address of instrction
+            BLANK * 2,                  # 09-10 : Space
+            len(ds),                    # 11-12 : Byte count
+            BLANK * 2,                  # 13-14 : Space
+            scp,                        # 15-16 : ESDID (scope id)
             txt_ds(ds),                 # 17-72 : Data Stream
-            ]),
+            BLANK * 8,                  # 73-80 : Deck ID
+            ),
     # Relocation dictionary provide information required to relocate
     # address constants within the object module
-    'RLD' : lambda df : ''.join([
+    'RLD' : lambda df : REC_LAYOUT['RLD'].pack(
             # df  : data field ( 1~13 [ 8, RelocationEntry, pos_id, rel_id ]
             #                     or  [ 4, RelocationEntry ]
             #                    )
-            '02',                       # 01    : X'02'
-            c2x('RLD'),                 # 02-04 : RLD
-            c2x('{0:6}'.format('')),    # 05-10 : Space
-            '{0:0>4}'.format(           # 11-12 : Data field count
-                i2h(sum([               #         (number of bytes of df)
-                            entry[0] for entry in df
-                            ]))
-                ),
-            c2x('{0:4}'.format('')),    # 13-16 : Space
+            REC_ID,                     # 01    : X'02'
+            REC_TP['RLD'],              # 02-04 : RLD
+            BLANK * 6,                  # 05-10 : Space
+            sum([ entry[0]              # 11-12 : Data field count
+                  for entry in df       #         (number of bytes of df)
+                  ]),
+            BLANK * 4,                  # 13-16 : Space
             rld_df(df),                 # 17-72 : Data fields
-            ]),
+            BLANK * 8,                  # 73-80 : Deck ID
+            ),
     # End records terminate the object module and optionally provide
     # the entry point
-    'END' : lambda enty, scp, sym, csl, idr : ''.join([
+    'END' : lambda enty, scp, sym, csl, idr : REC_LAYOUT['END'].pack(
             # enty: Entry address from operand of END record in source deck
             # scp : ESDID of entry point (blank if no END operand)
             # sym : Symbolic entry point if specified and no END operand
@@ -192,32 +246,111 @@ REC_FMT = {                 # record formatter
             # idr : 0~2 IDR items contains translator identification,
             #       version and release level (e.g. 0101), and date of
             #       the assembly (yyddd)
-            '02',                       # 01    : X'02'
-            c2x('END'),                 # 02-04 : END
-            c2x(' '),                   # 05    : Space
+            REC_ID,                     # 01    : X'02'
+            REC_TP['END'],              # 02-04 : END
+            BLANK,                      # 05    : Space
             end_fill(enty, 3),          # 06-08 : Entry address from END
-            c2x('{0:6}'.format('')),    # 09-14 : Space
+            BLANK * 6,                  # 09-14 : Space
             end_fill(scp, 2),           # 15-16 : Type 1: ESDID of entry point
                                         #         Type 2: Blank
             end_fill(sym, 8),           # 17-24 : Type 1: Blank
                                         #         Type 2: Symbolic name or blank
-            c2x('{0:4}'.format('')),    # 25-28 : Blank
+            BLANK * 4,                  # 25-28 : Blank
             end_fill(csl, 4),           # 29-32 : Control section length
             end_cnt_idr(idr),           # 33    : Number of IDR items
             end_idr(idr, 0),            # 34-52 : IDR item 1
             end_idr(idr, 1),            # 53-71 : IDR item 2
-            c2x(' '),                   # 72    : Space 
-            ]),
+            BLANK,                      # 72    : Space
+            BLANK * 8,                  # 73-80 : Deck ID
+            ),
     # Symbol table records provide symbol information for TSO TEST
-    'SYM' : lambda vf : ''.join([
+    'SYM' : lambda vf : REC_LAYOUT['SYM'].pack(
             # vf  : variable field - need info
-            '02',                       # 01    : X'02'
-            c2x('SYM'),                 # 02-04 : SYM
-            c2x('{0:6}'.format('')),    # 05-10 : Space
-            '{0:0>4}'.format(           # 11-12 : Variable field byte count
-                i2h(len(vf) * 8)        #         (number of bytes of text)
-                ),
-            c2x('{0:4}'.format('')),    # 13-16 : Space
+            REC_ID,                     # 01    : X'02'
+            REC_TP['SYM'],              # 02-04 : SYM
+            BLANK * 6,                  # 05-10 : Space
+            len(vf) * 8,                # 11-12 : Variable field byte count
+                                        #         (number of bytes of text)
+            BLANK * 4,                  # 13-16 : Space
             sym_vf(vf),                 # 17-72 : Variable fields
-            ]),
+            BLANK * 8,                  # 73-80 : Deck ID
+            ),
+    }
+
+
+# parsers for the loader; the fields are unpacked from the record directly
+def esd_parse(rec):
+    '''
+    return ( esd_id, items, ), where esd_id is the ESDID of the first item
+    (None if blank), and items is a list of ( name, type_code, addr, length, )
+    of the variable field items; name is in EBCDIC, type_code is the hex
+    string of the type, and length is None if blank
+    '''
+    field = REC_LAYOUT['ESD'].unpack(rec)
+    if field[5] == BLANK * 2:
+        esd_id = None
+    else:
+        esd_id = struct.unpack('>H', field[5])[0]
+
+    items = []
+    for pos in range(16, 16 + field[3], ESD_VF_SZ):
+        ( name, code, addr, flag, length ) = ESD_VF.unpack_from(rec, pos)
+        if length == BLANK * 3:
+            length = None
+        else:
+            length = b32i(length)
+        items.append( ( name, '{0:0>2X}'.format(ord(code)), b32i(addr),
+                        length, ) )
+    return ( esd_id, items, )
+
+def txt_parse(rec):
+    '''
+    return ( addr, scope_id, ds, ), where ds is a memoryview of the data
+    stream within the record
+    '''
+    field = REC_LAYOUT['TXT'].unpack(rec)
+    return ( b32i(field[3]), field[7], memoryview(rec)[16 : 16 + field[5]], )
+
+def rld_parse(rec):
+    '''
+    return the data fields of the record as a list of
+    ( rel_id, pos_id, vcon, length, negative, addr, )
+    '''
+    rv = []
+    pos = 16
+    end = pos + REC_LAYOUT['RLD'].unpack(rec)[3]
+    same = False                # not the same ESDID
+    while pos < end:
+        if same:
+            ( flag, addr ) = RLD_DF4.unpack_from(rec, pos)
+            pos += RLD_DF4.size
+        else:
+            ( rel_id, pos_id, flag, addr ) = RLD_DF8.unpack_from(rec, pos)
+            pos += RLD_DF8.size
+        flag = ord(flag)
+        same = bool(flag & 0b0001)      # 2.4: same ESDID flag
+        rv.append( ( rel_id, pos_id,
+                     bool(flag >> 4),           # 1st hex-digit: v-con flag
+                     ((flag & 0x0F) >> 2) + 1,  # 2.1 - 2.2: length - 1
+                     bool(flag & 0b0010),       # 2.3: negative flag
+                     b32i(addr),
+                     ) )
+    return rv
+
+def end_parse(rec):
+    '''
+    return ( entry, scope_id, ), where entry is the entry address (None if
+    blank), and scope_id is the ESDID of the entry point
+    '''
+    field = REC_LAYOUT['END'].unpack(rec)
+    if field[3] == BLANK * 3:
+        return ( None, None, )
+    return ( b32i(field[3]), struct.unpack('>H', field[5])[0], )
+
+
+REC_PARSE = {               # record parser
+    'ESD' : esd_parse,
+    'TXT' : txt_parse,
+    'RLD' : rld_parse,
+    'END' : end_parse,
     }
@@ -38,12 +38,12 @@ PSEUDO_INS = {
 ### Pseudo-Instruction OP-Code Mapping
 
 PSEUDO_OP = {
-    '52'   : ( 'XDECO', 3, lambda s : __xdeco(s[0], s[1], s[2], s[3:6]) ),
-    '53'   : ( 'XDECI', 3, lambda s : __xdeci(s[0], s[1], s[2], s[3:6]) ),
-    'E000' : ( 'XREAD', 4, lambda s : __xread(s[0], s[1:4], s[4:]) ),
-    'E020' : ( 'XPRNT', 4, lambda s : __xprnt(s[0], s[1:4], s[4:]) ),
-    'E160' : ( 'XDUMP', 4, lambda s : __xdump_reg() ),
-    'E060' : ( 'XDUMP', 4, lambda s : __xdump(s[0], s[1:4], s[4:]) ),
+    0x52   : ( 'XDECO', 3, lambda s : __xdeco(s[0], s[1], s[2], s[3]) ),
+    0x53   : ( 'XDECI', 3, lambda s : __xdeci(s[0], s[1], s[2], s[3]) ),
+    0xE000 : ( 'XREAD', 4, lambda s : __xread(s[0], s[1], s[2]) ),
+    0xE020 : ( 'XPRNT', 4, lambda s : __xprnt(s[0], s[1], s[2]) ),
+    0xE160 : ( 'XDUMP', 4, lambda s : __xdump_reg() ),
+    0xE060 : ( 'XDUMP', 4, lambda s : __xdump(s[0], s[1], s[2]) ),
     }
 
 # internal functions supporting Pseudo-Instructions
@@ -66,8 +66,8 @@ def __xdump_reg():
     return
 
 def __xdump(base, disp, size):
-    addr_start = int(__addr(disp, '0', base))
-    addr_end   = int(addr_start + h2i(size))
+    addr_start = int(__addr(disp, 0, base))
+    addr_end   = int(addr_start + size)
     __xsnap_header('STORAGE')
     ctrl = '0'
     for line in Memory.dump_storage(addr_start, addr_end):
@@ -88,8 +88,8 @@ def __xsnap_header(xdump_type):
 def __xread(base, disp, size):
     try:
         line = __xin('XREAD')[:-1]
-        for offset in range(h2i(size)):
-            __ref(disp, '0', base, c2x(line[offset]), offset)
+        for offset in range(size):
+            __ref(disp, 0, base, c2x(line[offset]), offset)
         SPR['PSW'].CC = 0       # read success
 
         if debug_mode():
@@ -103,7 +103,7 @@ def __xread(base, disp, size):
 
 def __xprnt(base, disp, size):
     ctrl = ' '
-    line = x2c(__dump(disp, base, h2i(size)))
+    line = x2c(__dump(disp, base, size))
     if line[0] in ' 01-':
         ctrl = line[0]
     __xout('XPRNT', ctrl, line[1:], '\n')
@@ -111,7 +111,7 @@ def __xprnt(base, disp, size):
 
 
 def __xdeci(reg, base, indx, disp):
-    reg  = GPR[h2i(reg)]
+    reg  = GPR[reg]
     addr = __addr(disp, indx, base)
 
     pg_i = addr / 4096          # index of the page containing the address
@@ -155,7 +155,7 @@ def __xdeci(reg, base, indx, disp):
     return
 
 def __xdeco(reg, base, indx, disp):
-    num = '{0: >12}'.format(GPR[h2i(reg)].int)
+    num = '{0: >12}'.format(GPR[reg].int)
     for i in range(len(num)):
         __ref(disp, indx, base, c2x(num[i]), i)
     return
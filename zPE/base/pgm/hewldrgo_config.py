@@ -1,10 +1,17 @@
 
 ### Linkage-Editor config definition
 
+import re
+
+from zPE.util.global_config import Config, JCL, profile_mode
+from zPE.base.conf import POSSIBLE_EXEC_ENGINE
+
 LDR_PARM = {
     'AMODE'     : 31,
     'RMODE'     : 31,
     'PSWKEY'    : 8,            # 1st user-mode key
+    'ENGINE'    : None,         # execution engine; None => rc setting
+    'PROFILE'   : False,        # profile the execution; see `ldr_profile()`
 }
 def ldr_load_parm(parm_dic):
     for key in parm_dic:
@@ -13,13 +20,42 @@ def ldr_load_parm(parm_dic):
         else:
             raise KeyError('{0}: Invalid PARM key.'.format(key))
 
+def ldr_parse_parm(parm_str):
+    '''
+    pick up the options meant for the loader from the PARM of the step;
+    anything else is left to the program
+    '''
+    parm_dic = { 'ENGINE' : None, 'PROFILE' : False, }
+    for opt in re.split(',', parm_str.strip("'()")):
+        if opt[:7] == 'ENGINE=':
+            if opt[7:].lower() not in POSSIBLE_EXEC_ENGINE:
+                raise ValueError('{0}: Invalid execution engine.'.format(opt))
+            parm_dic['ENGINE'] = opt[7:].lower()
+        elif opt == 'PROFILE':
+            parm_dic['PROFILE'] = True
+    ldr_load_parm(parm_dic)
+
+def ldr_engine():
+    '''the execution engine selected by the PARM, or else the rc file'''
+    if LDR_PARM['ENGINE']:
+        return LDR_PARM['ENGINE']
+    return Config['exec_engine']
+
+def ldr_profile():
+    '''whether the execution is profiled, by the PARM or by `zsub -p`'''
+    return LDR_PARM['PROFILE']  or  profile_mode()
+
 LDR_CONFIG = {
     'MEM_POS'   : None,         # required; first available memory location
     'MEM_LEN'   : None,         # required; length of memory required
     'TIME'      : None,         # required; maximum execution time allowed
+    'INS_LIMIT' : None,         # required; maximum number of instructions
+                                # allowed; see `ldr_ins_limit()`
     'REGION'    : None,         # required; maximum length allowed
     'ENTRY_PT'  : None,         # entry point (specified by END)
     'EXIT_PT'   : None,         # return address
+    'TRACE_DEPTH' : 10,         # number of instructions / branches kept in
+                                # the history; ASSIST dumps the last 10
     }
 def ldr_load_config(conf_dic):
     for key in conf_dic:
@@ -28,24 +64,143 @@ def ldr_load_config(conf_dic):
         else:
             raise KeyError('{0}: Invalid configuration key.'.format(key))
 
+def ldr_ins_limit(step):
+    '''
+    the instruction budget of the step, derived from the TIME of the JOB
+    and the step (not from the wall clock), so that the same program
+    always stops at the same instruction; the instructions executed by the
+    previous steps are charged against the TIME of the JOB
+    '''
+    job_left = JCL['time'] * Config['ins_per_sec'] - JCL['ins_cnt']
+    return int(max(0, min(job_left, step.time * Config['ins_per_sec'])))
+
+WALL_CLOCK_FACTOR = 10          # the wall clock only stops the program after
+                                # this many times the TIME allowed; it is a
+                                # safety net for a slow / overloaded host
+WALL_CLOCK_CHECK  = 1024        # check the wall clock every this many
+                                # instructions
+
 
 ### resource definition
 
-INSTRUCTION = [                 # Instruction history
-    # [ PSW, MNEMONIC ]
-    ]
-BRANCHING = [                   # Branching history
-    # [ PSW, MNEMONIC ]
-    ]
+from array import array
+from binascii import b2a_hex
+class History(object):
+    '''
+    fixed-capacity ring buffer of executed instructions; each entry is
+    kept in parallel columns:
+        bits    - PSW bits 32-39 (ILC,CC,MASK) before the instruction
+                  is decoded
+        addr    - the instruction address
+        code    - the raw instruction, up to 6 bytes
+        length  - the number of bytes of the instruction
+    the memory used only depends on the depth, no matter how many
+    instructions get recorded
+    '''
+    def __init__(self, depth):
+        self.reset(depth)
+
+    def __len__(self):
+        return min(self.count, self.depth)
+
+    def reset(self, depth = None):
+        if depth != None:
+            self.depth = max(depth, 1)
+        self.bits   = array('B', [ 0 ] * self.depth)
+        self.addr   = array('L', [ 0 ] * self.depth)
+        self.code   = bytearray(6 * self.depth)
+        self.length = array('B', [ 0 ] * self.depth)
+        self.count  = 0         # total number of entries ever recorded
+
+    def append(self, bits, addr, raw):
+        indx = self.count % self.depth
+        self.bits[indx] = bits
+        self.addr[indx] = addr
+        self.code[indx * 6 : indx * 6 + len(raw)] = raw
+        self.length[indx] = len(raw)
+        self.count += 1
+
+    def last(self, n):
+        '''
+        return the last (at most) n entries, oldest first, as a list of
+        ( bits, addr, code ), where `bits` is the bit-string of PSW bits
+        32-38 and `code` is the hex string of the instruction
+        '''
+        rv = [ ]
+        for i in range(max(self.count - min(n, self.depth), 0), self.count):
+            indx = i % self.depth
+            rv.append((
+                    '{0:0>8}'.format(bin(self.bits[indx])[2:])[:7],
+                    self.addr[indx],
+                    b2a_hex(
+                        self.code[indx * 6 : indx * 6 + self.length[indx]]
+                        ).upper()
+                    ))
+        return rv
+# end of History class definition
+
+INSTRUCTION = History(LDR_CONFIG['TRACE_DEPTH']) # Instruction history
+BRANCHING   = History(LDR_CONFIG['TRACE_DEPTH']) # Branching history
+
+class Profile(object):
+    '''
+    execution statistics of a profiled run:
+        op      - per op-code [ count, total time (in seconds) ]
+        addr    - per instruction address, the number of executions
+    '''
+    def __init__(self):
+        self.reset()
+
+    def __len__(self):
+        return sum([ stat[0] for stat in self.op.itervalues() ])
+
+    def reset(self):
+        self.op   = { }
+        self.addr = { }
+
+    def add(self, op_code, addr, elapsed):
+        if op_code in self.op:
+            stat = self.op[op_code]
+            stat[0] += 1
+            stat[1] += elapsed
+        else:
+            self.op[op_code] = [ 1, elapsed ]
+        if addr in self.addr:
+            self.addr[addr] += 1
+        else:
+            self.addr[addr] = 1
+
+    def by_op(self):
+        '''
+        return [ ( mnemonic, count, total time, mean time ) ], the most
+        time consuming first
+        '''
+        rv = [ ( decode_op(op_code), stat[0], stat[1], stat[1] / stat[0] )
+               for ( op_code, stat ) in self.op.iteritems()
+               ]
+        rv.sort(key = lambda t: ( - t[2], t[0] ))
+        return rv
+
+    def hot_addr(self, n):
+        '''return the n most executed [ ( addr, count ) ]'''
+        rv = sorted(self.addr.iteritems(), key = lambda t: ( - t[1], t[0] ))
+        return rv[:n]
+# end of Profile class definition
+
+PROFILE = Profile()             # Execution profile
+PROFILE_HOT_ADDR = 20           # number of hot addresses reported
+
 from zPE.base.core.cpu import decode_op
 from zPE.base.core.asm import is_branching
-def RECORD_INS(psw, ins):
-    INSTRUCTION.append([ psw, ''.join(ins) ])
-    if is_branching( decode_op(ins[0]) ):
-        RECORD_BR(psw, ins)
+def RECORD_INS(bits, addr, ins, is_br = None):
+    INSTRUCTION.append(bits, addr, ins[3])
+    if is_br == None:
+        is_br = is_branching( decode_op(ins[0]) )
+    if is_br:
+        BRANCHING.append(bits, addr, ins[3])
     return ins
-def RECORD_BR(psw, ins):
-    BRANCHING.append([ psw, ''.join(ins) ])
+def RECORD_BR(bits, addr, ins):
+    BRANCHING.append(bits, addr, ins[3])
     return ins
 
 MEM_DUMP = [ ]                  # the entire memory dump at ABEND
@@ -65,10 +220,24 @@ EXREF = {
     # ( OBJMOD_id, ESD_ID ) : ( 0x000000, ExternalSymbol, ESD_name )
     }
 
+def ldr_locate(addr):
+    '''
+    map an address back to the CSECT containing it
+
+    return ( ESD_name, offset into the CSECT ), or ( None, None )
+    '''
+    for ( key, val ) in SCOPE.iteritems():
+        start = key[0] + key[1]
+        if start <= addr < start + key[2]:
+            return ( CSECT[val][2], addr - start )
+    return ( None, None )
+
 
 def ldr_init_res():
-    del INSTRUCTION[:]          # clear Instruction history
-    del BRANCHING[:]            # clear Branching history
+    INSTRUCTION.reset(LDR_CONFIG['TRACE_DEPTH']) # clear Instruction history
+    BRANCHING.reset(LDR_CONFIG['TRACE_DEPTH'])   # clear Branching history
+
+    PROFILE.reset()             # clear execution profile
 
     CSECT.clear()               # clear Control SECTion records
     SCOPE.clear()               # clear scope records
@@ -1,13 +1,18 @@
 from zPE import pkg_info
-from zPE.util import spool_decode
+from zPE.util import spool_unpack
 from zPE.util.global_config import CONFIG_PATH
 
+import zPE.base.conf
+
 import os, sys
 
 import argparse
 import sqlite3
 
 
+JOB_PAGE = 256                  # number of JOBs fetched at a time
+
+
 def main(argv = sys.argv):
     prog_name = os.path.basename(argv[0])
     parser = prepare_option(prog_name)
@@ -22,9 +27,12 @@ def main(argv = sys.argv):
     if args.list and args.purge:
         sys.stderr.write('Error: argument -l conflicting with -p!\n')
         return -1
+    if args.stats and (args.list or args.purge):
+        sys.stderr.write('Error: argument -s conflicting with -l or -p!\n')
+        return -1
     if args.output:
-        if args.list or args.purge:
-            sys.stderr.write('Error: argument -o conflicting with -l or -p!\n')
+        if args.list or args.purge or args.stats:
+            sys.stderr.write('Error: argument -o conflicting with -l, -p or -s!\n')
             return -1
         fetch_out = open(args.output[0], 'w')
     else:
@@ -32,14 +40,13 @@ def main(argv = sys.argv):
 
     # fetch information
     conn = connect_db()
-    job_listing = fetch_job_list(conn)
 
     # parse alias
     if args.job_id == 'first':
-        job_id = job_listing[0][0]
+        job_id = fetch_first_job(conn)
         job_pttn = None
     elif args.job_id == 'last':
-        job_id = job_listing[-1][0]
+        job_id = fetch_last_job(conn)
         job_pttn = None
     elif args.job_id == 'all':
         job_id = None
@@ -57,6 +64,13 @@ def main(argv = sys.argv):
         job_id = None
         job_pttn = None
 
+    if args.job_id in ( 'first', 'last', )  and  not job_id:
+        sys.stderr.write(''.join([
+                    'Error: ', args.job_id,
+                    ': JOB not found inside the JOB queue\n'
+                    ]))
+        return -1
+
     if args.dd_pttn:
         dd_pttn = args.dd_pttn.replace('*', '%').replace('?', '_')
     else:
@@ -65,7 +79,7 @@ def main(argv = sys.argv):
 
     # check exact match if a pattern is offered
     if job_pttn:
-        job_listing_pttn = fetch_job_list_by(conn, job_pttn)
+        job_listing_pttn = fetch_job_list(conn, job_pttn, limit = 2)
         if len(job_listing_pttn) == 1:
             # exact match, switch to JOB ID
             job_id = job_listing_pttn[0][0]
@@ -75,10 +89,12 @@ def main(argv = sys.argv):
     # start processing
     if job_id:
         # JOB ID offered, try to process it
-        if job_id in [ r[0] for r in job_listing ]:
+        if fetch_job(conn, job_id):
             # JOB ID is valid
             if args.list:
                 print_dd_list(sys.stdout, job_id, fetch_dd_list(conn, job_id))
+            elif args.stats:
+                print_stats(sys.stdout, fetch_stats(conn, job_id))
             elif args.purge:
                 delete_jobs(conn, job_id)
             else:
@@ -95,7 +111,9 @@ def main(argv = sys.argv):
     elif job_pttn:
         # JOB pattern is offered, process it
         if args.list:
-            print_job_list(sys.stdout, job_listing_pttn)
+            print_job_list(sys.stdout, iter_job_list(conn, job_pttn))
+        elif args.stats:
+            print_stats(sys.stdout, fetch_stats(conn, job_pttn))
         elif args.purge:
             delete_jobs(conn, job_pttn)
         else:
@@ -104,7 +122,9 @@ def main(argv = sys.argv):
     else:
         # no JOB ID nor JOB pattern offered, fetch all
         if args.list:
-            print_job_list(sys.stdout, job_listing)
+            print_job_list(sys.stdout, iter_job_list(conn))
+        elif args.stats:
+            print_stats(sys.stdout, fetch_stats(conn, '%'))
         elif args.purge:
             delete_jobs(conn, '%')
         else:
@@ -125,6 +145,7 @@ def main(argv = sys.argv):
 
 
 def connect_db():
+    zPE.base.conf.upgrade_spool() # migrate the SPOOLs of an older version
     conn = sqlite3.connect(CONFIG_PATH['SPOOL'])
     conn.execute('''PRAGMA foreign_keys = ON''')
     conn.text_factory = str     # map TEXT to str instead of unicode
@@ -132,7 +153,7 @@ def connect_db():
 
 
 def check_n_jobs(conn):
-    if len(fetch_job_list(conn)) >= 15:
+    if len(fetch_job_list(conn, limit = 15)) >= 15:
         # according to the current design of printing, 15 is the threshold
         # of displaying the full listing on a 24-line terminal
         # ( 24 = 3 separaters + 1 header + 15 JOBs + 2 empty lines +
@@ -150,33 +171,92 @@ def delete_jobs(conn, job_pttn):
 
 
 def fetch_content(conn, job_id, dd_pttn = '%'):
-    stmt = '''SELECT  Content
+    '''generate the content of the matched SPOOLs, piece by piece'''
+    stmt = '''SELECT  Codec, Data
                 FROM  SPOOL
+                JOIN  SPOOL_CHUNK  ON  Spool_Row_ID = row_id
                WHERE  Job_ID = ?
                  AND  Spool_key LIKE ?
-            ORDER BY  row_id
+            ORDER BY  row_id, Seq
            '''
-    return [ spool_decode(row[0])
-             for row in conn.execute(stmt, (job_id, dd_pttn))
-             ]
+    for row in conn.execute(stmt, (job_id, dd_pttn)):
+        for piece in spool_unpack(* row):
+            yield piece
 
 def fetch_dd_list(conn, job_id):
     stmt = '''SELECT  Spool_key, Step_Name
                 FROM  SPOOL
-               WHERE  Job_ID LIKE ?
+               WHERE  Job_ID = ?
             ORDER BY  row_id
            '''
     return [ row for row in conn.execute(stmt, (job_id,)) ]
 
-def fetch_job_list(conn):
-    return [ row for row in conn.execute('''SELECT * FROM JOB''') ]
+def fetch_stats(conn, job_pttn):
+    '''
+    Return ( n_job, n_spool, n_chunk, n_compressed, raw_size, stored_size, )
+    of the matched JOBs
+    '''
+    stmt = '''SELECT  COUNT(DISTINCT Job_ID),
+                      COUNT(DISTINCT row_id),
+                      COUNT(Seq),
+                      TOTAL(Codec != 0),
+                      TOTAL(Raw_Size),
+                      TOTAL(length(CAST(Data AS BLOB)))
+                FROM  SPOOL
+           LEFT JOIN  SPOOL_CHUNK  ON  Spool_Row_ID = row_id
+               WHERE  Job_ID LIKE ?
+           '''
+    return tuple(int(v) for v in conn.execute(stmt, (job_pttn,)).fetchone())
+
+def fetch_job(conn, job_id):
+    stmt = '''SELECT  Job_ID, Job_Name, Job_OWNER
+                FROM  JOB
+               WHERE  Job_ID = ?
+           '''
+    return conn.execute(stmt, (job_id,)).fetchone()
 
-def fetch_job_list_by(conn, job_pttn):
-    stmt = '''SELECT  *
+def fetch_first_job(conn):
+    stmt = '''SELECT  Job_ID
+                FROM  JOB
+            ORDER BY  Job_ID
+               LIMIT  1
+           '''
+    row = conn.execute(stmt).fetchone()
+    return row and row[0]
+
+def fetch_last_job(conn):
+    stmt = '''SELECT  Job_ID
+                FROM  JOB
+            ORDER BY  Job_ID DESC
+               LIMIT  1
+           '''
+    row = conn.execute(stmt).fetchone()
+    return row and row[0]
+
+def fetch_job_list(conn, job_pttn = '%', after = '', limit = -1):
+    '''
+    Return at most `limit` (-1 for no limit) matched JOBs with a JOB ID
+    greater than `after`, in the order of the JOB ID
+    '''
+    stmt = '''SELECT  Job_ID, Job_Name, Job_OWNER
                 FROM  JOB
                WHERE  Job_ID LIKE ?
+                 AND  Job_ID > ?
+            ORDER BY  Job_ID
+               LIMIT  ?
            '''
-    return [ row for row in conn.execute(stmt, (job_pttn,)) ]
+    return [ row for row in conn.execute(stmt, (job_pttn, after, limit)) ]
+
+def iter_job_list(conn, job_pttn = '%'):
+    '''generate the matched JOBs, fetching JOB_PAGE of them at a time'''
+    after = ''
+    while True:
+        job_listing = fetch_job_list(conn, job_pttn, after, JOB_PAGE)
+        for row in job_listing:
+            yield row
+        if len(job_listing) < JOB_PAGE:
+            break               # last page
+        after = job_listing[-1][0]
 
 
 def print_dd_list(out, job_id, dd_list):
@@ -186,17 +266,36 @@ def print_dd_list(out, job_id, dd_list):
     for r in dd_list:
         out.write('    {0:<8}    {1}\n'.format(r[0], r[1]))
 
+def print_stats(out, stats):
+    ( n_job, n_spool, n_chunk, n_compressed, raw_sz, stored_sz, ) = stats
+    out.write('\n  SPOOL statistics of the matched JOBs:\n')
+    out.write('    JOBs                 {0:>12}\n'.format(n_job))
+    out.write('    SPOOLs               {0:>12}\n'.format(n_spool))
+    out.write('    chunks (compressed)  {0:>12}  ({1})\n'.format(
+            n_chunk, n_compressed
+            ))
+    out.write('    raw size             {0:>12} bytes\n'.format(raw_sz))
+    out.write('    stored size          {0:>12} bytes\n'.format(stored_sz))
+    if stored_sz:
+        out.write('    compression ratio    {0:>12.2f} : 1\n'.format(
+                float(raw_sz) / stored_sz
+                ))
+
 def print_job_list(out, job_listing):
     out.write('\n')
 
-    # no JOB ID offered, fetch all JOBs
-    if job_listing:
-        # there is at least one JOB in the queue
-        out.write('  +----------+--------------+---------+\n')
-        out.write('  | JOB Name | ** JOB ID ** |  Owner  |\n')
-        out.write('  +----------+--------------+---------+\n')
-        for r in job_listing:
-            out.write('  | {0} | < {1} > | {2} |\n'.format(r[1], r[0], r[2]))
+    # job_listing can be a generator; print the header on the first JOB
+    found = False
+    for r in job_listing:
+        if not found:
+            # there is at least one JOB in the queue
+            out.write('  +----------+--------------+---------+\n')
+            out.write('  | JOB Name | ** JOB ID ** |  Owner  |\n')
+            out.write('  +----------+--------------+---------+\n')
+            found = True
+        out.write('  | {0} | < {1} > | {2} |\n'.format(r[1], r[0], r[2]))
+
+    if found:
         out.write('  +----------+--------------+---------+\n')
     else:
         # no JOB in the queue
@@ -207,7 +306,7 @@ def prepare_option(prog):
     parser = argparse.ArgumentParser(
         prog = prog, usage =
 '''
-    %(prog)s  -l | -p [JOB_ID_PATTERN]
+    %(prog)s  -l | -p | -s [JOB_ID_PATTERN]
     %(prog)s [-o OUTPUT_FILE]  JOB_ID [DD_PATTERN]
 
     %(prog)s  -h | -v
@@ -280,6 +379,16 @@ def prepare_option(prog):
         help = 'perge the indicated JOB(s) from the JOB queue',
         dest = 'purge'
         )
+    parser.add_argument(
+        '-s', '--stats',
+        action = 'store_true',
+        default = False,
+        help = ''.join([
+                'show the SPOOL statistics (including the compression ',
+                'ratio) of the indicated JOB(s), or the entire JOB queue'
+                ]),
+        dest = 'stats'
+        )
     parser.add_argument(
         '-v', '--version',
         action = 'store_true',
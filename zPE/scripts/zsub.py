@@ -28,11 +28,14 @@ def main(argv = sys.argv):
 
     zPE.base.conf.read_rc()
     debug_mode(args.debug)
+    profile_mode(args.profile)
 
     rc = submit(args.job_file)
 
     if args.output:
-        zPE.scripts.zfetch.main(['zfetch', '-o', args.output[0], 'last'])
+        # fetch by the job ID; 'last' may be the job of another zsub
+        zPE.scripts.zfetch.main(['zfetch', '-o', args.output[0],
+                                 JCL['jobid']])
 
     return rc
 
@@ -89,7 +92,7 @@ def prepare_option(prog):
     parser = argparse.ArgumentParser(
         prog = prog, usage =
 '''
-    %(prog)s  [-o OUTPUT_FILE]  [--debug]  JOB_FILE
+    %(prog)s  [-o OUTPUT_FILE]  [--debug]  [--profile]  JOB_FILE
 
     %(prog)s  -l
     %(prog)s  -h | -v
@@ -102,6 +105,13 @@ def prepare_option(prog):
 
     With `--debug` option, diagnostic infomation of the simulator itself
     will be generated (on STDOUT).
+
+    With `--profile` option, the execution of each loaded program will be
+    profiled per instruction; the report goes to the SYSPROF SPOOL of the
+    step, and to a JSON file under ~/.zPE/data/profile/ ; in addition, the
+    statistics of each assembly (time spent in each phase and number of
+    statements, symbols, etc.) are summarized in the JESYSMSG SPOOL, and
+    written to a JSON file under ~/.zPE/data/stats/ .
 '''
         )
 
@@ -142,6 +152,17 @@ def prepare_option(prog):
         metavar='OUTPUT_FILE',
         dest = 'output'
         )
+    parser.add_argument(
+        '-p', '--profile',
+        action = 'store_true',
+        default = False,
+        help = ''.join([
+                'profile the execution of the loaded program(s), and ',
+                'report the statistics of the assembly; same as ',
+                "PARM='PROFILE,STATS' on each step",
+                ]),
+        dest = 'profile'
+        )
     parser.add_argument(
         '-v', '--version',
         action = 'store_true',
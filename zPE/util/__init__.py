@@ -2,6 +2,7 @@
 
 import os
 import re
+import zlib
 
 
 ### JCL argument parser
@@ -96,6 +97,16 @@ def is_dir(dsn):
 def is_pds(dsn):                # PDS is currently mapped to flat directory
     return is_dir(dsn)
 
+def replace_file(src, dst):
+    '''Renames `src` to `dst`, replacing `dst` if it exists'''
+    if os.name == 'nt'  and  os.path.isfile(dst):
+        # os.rename() does not replace an existing file on Windows
+        try:
+            os.remove(dst)
+        except OSError:         # removed by another process
+            pass
+    os.rename(src, dst)
+
 
 
 
@@ -287,39 +298,87 @@ def __SKIP_SPLIT(pattern, string, skip_l, skip_r, maxsplit = 0):
 
 
 # spool encoding / decoding
+#   '\0' is escaped as '^@', and '^' (the escape char) as '^^'
 
-SPOOL_ENCODE_MAP = {
-    '\0' : '^@',
-    '^'  : '^^',
-    }
 def spool_encode(src):
-    rv = []
-    while True:
-        res = re.search(r'[\0^]', src)
-        if res != None:         # search succeed
-            rv.append(src[:res.start()])
-            rv.append(SPOOL_ENCODE_MAP[src[res.start():res.end()]])
-            src = src[res.end():]
-        else:                   # search failed
-            rv.append(src)
-            break
-    return ''.join(rv)
+    # '^' first, so that the escapes of '\0' are not escaped again
+    return src.replace('^', '^^').replace('\0', '^@')
 
 SPOOL_DECODE_MAP = {
     '^@' : '\0',
     '^^' : '^',
     }
+SPOOL_DECODE_RE = re.compile(r'\^[@^]')
 def spool_decode(src):
-    rv = []
-    while True:
-        res = re.search(r'\^[@^]', src)
-        if res != None:         # search succeed
-            rv.append(src[:res.start()])
-            rv.append(SPOOL_DECODE_MAP[src[res.start():res.end()]])
-            src = src[res.end():]
-        else:                   # search failed
-            rv.append(src)
-            break
-    return ''.join(rv)
+    if '^' not in src:
+        return src              # nothing escaped, early return
+    return SPOOL_DECODE_RE.sub(lambda m: SPOOL_DECODE_MAP[m.group()], src)
+
+def spool_decode_stream(chunks):
+    '''
+    decode the encoded text given chunk by chunk, split at any position; an
+    escape split by the chunk boundary is completed by the next chunk
+    '''
+    carry = ''
+    for chunk in chunks:
+        if carry:
+            chunk = carry + chunk
+        # the escapes in a run of '^' pair up from its left; an odd run at
+        # the end leaves the last '^' waiting for the char it escapes
+        if ( len(chunk) - len(chunk.rstrip('^')) ) % 2:
+            ( chunk, carry, ) = ( chunk[:-1], chunk[-1:], )
+        else:
+            carry = ''
+        yield spool_decode(chunk)
+    if carry:
+        yield carry             # dangling escape char, kept as is
+
+SPOOL_UNPRINTABLE_RE = re.compile(r'[^\x20-\x7e\n]')
+def spool_printable(src):
+    return SPOOL_UNPRINTABLE_RE.sub(u'\u220e', src)
 def spool_decode_printable(src):
-    return re.sub(r'[^\x20-\x7e\n]', u'\u220e', spool_decode(src))
+    return spool_printable(spool_decode(src))
+
+# spool chunk packing / unpacking
+#   a chunk of a SPOOL is stored as its encoded text, optionally compressed
+#   by zlib; the codec is stored along with the chunk
+
+SPOOL_CODEC_TEXT = 0            # the encoded text
+SPOOL_CODEC_ZLIB = 1            # the encoded text, compressed by zlib
+
+SPOOL_INFLATE_SZ = 16384        # max size of a piece decompressed at a time
+
+def spool_pack(src, level = 0):
+    '''
+    Return ( codec, data, raw_size, ) of the chunk holding `src`, where
+    `raw_size` is the size of the encoded text; the text is compressed if
+    `level` (1-9) is given and the compression does save some space
+    '''
+    text = spool_encode(src)
+    if level:
+        data = zlib.compress(text, level)
+        if len(data) < len(text):
+            return ( SPOOL_CODEC_ZLIB, data, len(text), )
+    return ( SPOOL_CODEC_TEXT, text, len(text), )
+
+def spool_unpack(codec, data):
+    '''
+    generate the content of a chunk stored by spool_pack(), piece by piece;
+    a compressed chunk is never decompressed as a whole
+    '''
+    if codec == SPOOL_CODEC_ZLIB:
+        return spool_decode_stream(__INFLATE(data))
+    return ( spool_decode(data), )
+def spool_unpack_printable(codec, data):
+    for piece in spool_unpack(codec, data):
+        yield spool_printable(piece)
+
+def __INFLATE(data):
+    inflater = zlib.decompressobj()
+    piece = inflater.decompress(data, SPOOL_INFLATE_SZ)
+    while piece:
+        yield piece
+        piece = inflater.decompress(inflater.unconsumed_tail, SPOOL_INFLATE_SZ)
+    piece = inflater.flush()
+    if piece:
+        yield piece
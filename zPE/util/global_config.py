@@ -21,6 +21,13 @@ def debug_mode(enable_debug = None):
     else:
         DEBUG_MODE[0] = enable_debug
 
+PROFILE_MODE = [ False ]
+def profile_mode(enable_profile = None):
+    if enable_profile == None:
+        return PROFILE_MODE[0]
+    else:
+        PROFILE_MODE[0] = enable_profile
+
 def warn(*msg):
     sys.stderr.write(''.join(msg))
 
@@ -58,6 +65,9 @@ CONFIG_PATH = {
     'data'      : os.path.join(HOME_PATH, '.zPE', 'data'),
     'ICH70001I' : os.path.join(HOME_PATH, '.zPE', 'data', 'ICH70001I'),
     'SPOOL'     : os.path.join(HOME_PATH, '.zPE', 'data', 'SPOOL.sqlite'),
+    'profile'   : os.path.join(HOME_PATH, '.zPE', 'data', 'profile'),
+    'stats'     : os.path.join(HOME_PATH, '.zPE', 'data', 'stats'),
+    'objmod'    : os.path.join(HOME_PATH, '.zPE', 'data', 'objmod'),
     }
 
 
@@ -137,6 +147,7 @@ JCL = {
     'step'      : [],           # each item is of type "JobStep"
     'read_cnt'  : 0,            # lines read in
     'card_cnt'  : 0,            # cards read in
+    'ins_cnt'   : 0,            # instructions executed by the steps so far
     }
 
 DD_STATUS = { 'init' : 0, 'normal' : 1, 'abnormal' : 2 }